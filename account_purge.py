@@ -0,0 +1,147 @@
+"""
+Account deletion.
+
+Deleting a heavy account touches thousands of rows (orders, messages,
+reviews...). ``delete_account`` marks the user disabled straight away (and
+records the closure, which ends their open sessions, see closed_accounts.py), then
+removes their data with set-based ``IN (subquery)`` deletes in bounded
+chunks, committing after each chunk so the SQLite write lock is only held
+briefly. The purge runs either in the request (``sync``) or on a background
+worker thread (``background``, the default), see ``ACCOUNT_PURGE_MODE``.
+
+Purging is idempotent: a purge interrupted by a restart leaves a disabled
+user behind, which ``flask purge-disabled-accounts`` finishes off.
+"""
+
+import queue
+import threading
+
+from flask import current_app
+from sqlalchemy import delete, or_, select
+
+from models import db, User, Customer, Cook, Administrator, Menu, ShoppingCartItem, Order, OrderItem, \
+    Friendship, Message, DishReview, ChefReply, Conversation, UserBan, CookDailySales
+from menu_cache import bump_menu_version
+from closed_accounts import close_account, refresh as refresh_closed_accounts
+
+PURGE_CHUNK_SIZE = 500  # Rows deleted per transaction
+
+
+def _delete_in_chunks(model, key, condition, chunk_size):
+    """Delete rows matching ``condition`` at most ``chunk_size`` at a time; return the row count."""
+    total = 0
+    while True:
+        chunk = select(key).where(condition).limit(chunk_size).scalar_subquery()
+        deleted = db.session.execute(
+            delete(model).where(key.in_(chunk)).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        total += deleted
+        if deleted < chunk_size:
+            return total
+
+
+def _purge_customer(customer_id, chunk_size):
+    reviews = select(DishReview.review_id).where(DishReview.customer_id == customer_id)
+    orders = select(Order.order_id).where(Order.customer_id == customer_id)
+    steps = [
+        (ShoppingCartItem, ShoppingCartItem.cart_item_id, ShoppingCartItem.customer_id == customer_id),
+        (Conversation, Conversation.conversation_id,
+         or_(Conversation.customer_low_id == customer_id, Conversation.customer_high_id == customer_id)),
+        (Message, Message.message_id, Message.sender_id == customer_id),
+        (Message, Message.message_id, Message.receiver_id == customer_id),
+        (Friendship, Friendship.friendship_id, Friendship.customer_id == customer_id),
+        (Friendship, Friendship.friendship_id, Friendship.friend_id == customer_id),
+        (ChefReply, ChefReply.reply_id, ChefReply.review_id.in_(reviews)),
+        (DishReview, DishReview.review_id, DishReview.customer_id == customer_id),
+        (OrderItem, OrderItem.order_item_id, OrderItem.order_id.in_(orders)),
+        (Order, Order.order_id, Order.customer_id == customer_id),
+        (Customer, Customer.customer_id, Customer.customer_id == customer_id),
+    ]
+    for model, key, condition in steps:
+        _delete_in_chunks(model, key, condition, chunk_size)
+
+
+def _purge_cook(cook_id, chunk_size):
+    reviews = select(DishReview.review_id).where(DishReview.cook_id == cook_id)
+    steps = [
+        (Menu, Menu.menu_id, Menu.cook_id == cook_id),
+        (ChefReply, ChefReply.reply_id, ChefReply.cook_id == cook_id),
+        (ChefReply, ChefReply.reply_id, ChefReply.review_id.in_(reviews)),
+        (DishReview, DishReview.review_id, DishReview.cook_id == cook_id),
+        (OrderItem, OrderItem.order_item_id, OrderItem.cook_id == cook_id),
+        (Cook, Cook.cook_id, Cook.cook_id == cook_id),
+    ]
+    # At most one sales rollup row per day, small enough to delete in one go
+    db.session.execute(delete(CookDailySales).where(CookDailySales.cook_id == cook_id))
+    for model, key, condition in steps:
+        _delete_in_chunks(model, key, condition, chunk_size)
+    bump_menu_version()
+    db.session.commit()
+
+
+def purge_account(user_id, chunk_size=PURGE_CHUNK_SIZE):
+    """Delete a user and everything that references them, in chunked transactions."""
+    customer_ids = db.session.scalars(select(Customer.customer_id).where(Customer.user_id == user_id)).all()
+    cook_ids = db.session.scalars(select(Cook.cook_id).where(Cook.user_id == user_id)).all()
+
+    for customer_id in customer_ids:
+        _purge_customer(customer_id, chunk_size)
+    for cook_id in cook_ids:
+        _purge_cook(cook_id, chunk_size)
+    _delete_in_chunks(Administrator, Administrator.admin_id, Administrator.user_id == user_id, chunk_size)
+    _delete_in_chunks(UserBan, UserBan.user_id, UserBan.user_id == user_id, chunk_size)
+    _delete_in_chunks(User, User.user_id, User.user_id == user_id, chunk_size)
+
+
+class PurgeWorker:
+    """Single background thread that purges queued accounts one at a time."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, app, user_id):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='account-purge', daemon=True)
+                self._thread.start()
+        self._queue.put((app, user_id))
+
+    def _run(self):
+        while True:
+            app, user_id = self._queue.get()
+            try:
+                with app.app_context():
+                    purge_account(user_id)
+            except Exception as e:
+                # The user stays disabled; 'flask purge-disabled-accounts' can finish the job
+                print(f"Account purge for user {user_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every queued purge has finished."""
+        self._queue.join()
+
+
+purge_worker = PurgeWorker()
+
+
+def delete_account(user):
+    """Disable the account immediately, then purge it synchronously or in the background.
+
+    Returns True if the data is already gone, False if the purge was queued.
+    """
+    user.is_disabled = True
+    close_account(user.user_id)  # Also ends the user's open sessions
+    db.session.commit()
+    refresh_closed_accounts()
+    user_id = user.user_id
+
+    if current_app.config.get('ACCOUNT_PURGE_MODE') == 'sync':
+        purge_account(user_id)
+        return True
+    purge_worker.submit(current_app._get_current_object(), user_id)
+    return False
@@ -1,31 +1,96 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g, Response, stream_with_context
 from models import db, migrate, User, Customer, Cook, Administrator, Dish, Menu, ShoppingCartItem, Order, OrderItem, \
-    Friendship, Message, DishReview, ChefReply
+    Friendship, Message, DishReview, ChefReply, Conversation, price_to_cents, cents_to_price
 import re
 import os
-import uuid
-from werkzeug.utils import secure_filename
+import time
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime, date, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+from metrics import init_metrics
+from sqlite_tuning import init_sqlite_tuning
+from assets import init_assets
+from pubsub import get_broker, publish, customer_channel, stream_slots
+import json
+import click
+from dish_search import index_dish, unindex_dish, rebuild_dish_index, search_dishes
+from menu_cache import dishes_for_today, dishes_for_today_with_cooks, menu_grouped_by_cook, bump_menu_version, \
+    bump_dish_version, content_versions
+from account_purge import delete_account, purge_account
+from ban_registry import is_banned, ban_user, unban_user
+from closed_accounts import is_closed_session
+from image_pipeline import picture, submit_dish_image, submit_avatar, render_variants, variant_urls, images_available, \
+    stored_variants, DISH_SIZES, AVATAR_SIZES
+from upload_storage import save_upload, collect_garbage, UploadTooLarge
+from data_seed import seed_database, SEED_PASSWORD
+from order_admission import admit_orders, order_batcher
+from identity import login_identity, role_required, current_user, current_customer, current_cook
+from sales_rollup import rebuild_sales_rollups, sales_series, top_sellers, ROLLUPS, METRICS
 
 
 app = Flask(__name__, static_folder='static')
 app.secret_key = 'your_secret_key'  # Set security key
 
 # Configure the SQLite database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('PARROT_DATABASE_URI', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER_AVATARS'] = os.path.join('static', 'uploads', 'avatars')
 app.config['UPLOAD_FOLDER_DISHES'] = os.path.join('static', 'uploads', 'dishes')
+app.config['MAX_UPLOAD_BYTES'] = int(os.environ.get('PARROT_MAX_UPLOAD_MB', 10)) * 1024 * 1024
+# Hard cap on any request body; uploads are checked against MAX_UPLOAD_BYTES while streaming
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_BYTES'] + 1024 * 1024
+# Per-endpoint latency/SQL metrics at /metrics (off unless PARROT_METRICS=1)
+app.config['METRICS_ENABLED'] = os.environ.get('PARROT_METRICS') == '1'
+# Deleted accounts are purged on a background thread ('background') or inside the request ('sync')
+app.config['ACCOUNT_PURGE_MODE'] = os.environ.get('PARROT_ACCOUNT_PURGE', 'background')
+# Serve CSS/JS from the sources instead of the `flask build-assets` output
+app.config['ASSETS_DEBUG'] = os.environ.get('PARROT_ASSETS_DEBUG') == '1'
+# Processes rendering resized upload variants (see image_pipeline.py)
+app.config['IMAGE_PIPELINE_WORKERS'] = int(os.environ.get('PARROT_IMAGE_WORKERS', 2))
+# Orders are admitted in micro-batches by one thread per process ('batched') or one per request ('direct')
+app.config['ORDER_ADMISSION'] = os.environ.get('PARROT_ORDER_ADMISSION', 'batched')
+app.config['ORDER_BATCH_WINDOW_MS'] = float(os.environ.get('PARROT_ORDER_BATCH_MS', 5))
+app.config['ORDER_BATCH_MAX'] = int(os.environ.get('PARROT_ORDER_BATCH_MAX', 100))
+# /events 每个连接占用一个线程：连接到时关闭（浏览器自动重连），每个进程最多同时保持的连接数（0 为不限）
+app.config['EVENT_STREAM_MAX_SECONDS'] = int(os.environ.get('PARROT_EVENT_STREAM_SECONDS', 300))
+app.config['EVENT_STREAM_LIMIT'] = int(os.environ.get('PARROT_EVENT_STREAMS', 0))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 # Initialize the database and migration tool
 db.init_app(app)
 migrate.init_app(app, db)
+init_sqlite_tuning(app, db)  # WAL, synchronous=NORMAL, busy_timeout, mmap_size
+init_metrics(app, db)
+init_assets(app)
+app.add_template_global(picture)  # {{ picture(url, variants, alt, sizes) }} renders a responsive <img>
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def store_image(file, folder_key, url_prefix):
+    """Save an uploaded image under its content hash; return ``(url, path)``."""
+    extension = file.filename.rsplit('.', 1)[1]
+    return save_upload(file, app.config[folder_key], url_prefix, extension, app.config['MAX_UPLOAD_BYTES'])
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"message": "Upload too large"}), 413
+
+def versioned_json(etag, build):
+    """JSON response with a strong ETag; ``build()`` only runs if the client's copy is stale.
+
+    ``etag`` must change whenever the payload can, e.g. by including ``content_versions()``.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Revalidate on every use
+    return response
+
 @app.route('/')
 def login_page():
     return render_template('login.html')
@@ -39,23 +104,21 @@ def login():
     username = request.form.get('username')
     password = request.form.get('password')
 
-    # Check if user exists
-    user = User.query.filter_by(username=username).first()
+    # Check if user exists (role rows loaded in the same query)
+    user = User.query.options(
+        joinedload(User.customer), joinedload(User.cook), joinedload(User.administrator)
+    ).filter_by(username=username).first()
     if user and check_password_hash(user.password, password):
-        if user.user_id in banned_users:
+        if user.is_disabled:
+            return jsonify({"message": "This account has been deleted."}), 403
+        if is_banned(user.user_id):
             return jsonify({"message": "This account has been banned."}), 403
-        # Determine user role
-        role = None
-        if user.customer:
-            role = "Customer"
-        elif user.cook:
-            role = "Cook"
-        elif user.administrator:
-            role = "Administrator"
-
-        session['user'] = {"username": user.username, "role": role, "user_id": user.user_id}  # Store user information in session
+        # Role and the id of the customer/cook/administrator row, so requests need no lookup
+        identity = login_identity(user)
+        session['user'] = identity
         session['user_id'] = user.user_id  # Directly store user_id in session
-        return jsonify({"message": "Login Success", "role": role})
+        session['login_at'] = time.time()  # Sessions opened before an account was deleted are rejected
+        return jsonify({"message": "Login Success", "role": identity['role']})
 
     return jsonify({"message": "Invalid username or password"}), 401
 
@@ -119,83 +182,20 @@ def register():
 
 @app.route('/unlog_dashboard')
 def unlog_dashboard():
-    # Get today's date
-    today = date.today()
-
-    # Query all available menu items today
-    menus = Menu.query.filter_by(date=today).all()
-
-    # Extract menu information from menu items and count the total number of each menu item
-    dish_quantities = {}
-    for menu_item in menus:
-        dish_id = menu_item.dish_id
-        if dish_id in dish_quantities:
-            dish_quantities[dish_id]['quantity'] += menu_item.quantity
-        else:
-            dish = Dish.query.get(dish_id)
-            dish_quantities[dish_id] = {
-                'dish_id': dish.dish_id,
-                'name': dish.dish_name,
-                'image_url': dish.image_url,
-                'category': dish.category,
-                'price': dish.price,
-                'description': dish.description,
-                'quantity': menu_item.quantity
-            }
-
-    # Pass the menu list to the template
-    dishes = list(dish_quantities.values())
+    # Today's dishes with their total available quantity, served from the menu read model
+    dishes = dishes_for_today()
 
     return render_template('unlog_dashboard.html', dishes=dishes)
 
 @app.route('/delete_profile', methods=['POST'])
+@role_required(denied=({"message": "User not logged in"}, 403))
 def delete_profile():
-    if 'user' not in session:
-        return jsonify({"message": "User not logged in"}), 403
-
-    user_id = session['user']['user_id']
-    user = User.query.filter_by(user_id=user_id).first()
-
+    user = current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
 
     try:
-        # Delete customer-related records
-        if user.customer:
-            customer_id = user.customer.customer_id
-            # Clear shopping cart items
-            ShoppingCartItem.query.filter_by(customer_id=customer_id).delete()
-            #Cleaning messages (as sender or receiver)
-            Message.query.filter_by(sender_id=customer_id).delete()
-            Message.query.filter_by(receiver_id=customer_id).delete()
-            #Unfriending (as initiator or recipient)
-            Friendship.query.filter_by(customer_id=customer_id).delete()
-            Friendship.query.filter_by(friend_id=customer_id).delete()
-            #Clean up Order items (delete OrderItem and then Order)
-            order_ids = [o.order_id for o in Order.query.filter_by(customer_id=customer_id).all()]
-            for oid in order_ids:
-                OrderItem.query.filter_by(order_id=oid).delete()
-            #Clearing order
-            Order.query.filter_by(customer_id=customer_id).delete()
-            # Clean-up evaluation
-            DishReview.query.filter_by(customer_id=customer_id).delete()
-            db.session.delete(user.customer)
-
-        # Delete records related to the chef
-        if user.cook:
-            cook_id = user.cook.cook_id
-            Menu.query.filter_by(cook_id=cook_id).delete()
-            OrderItem.query.filter_by(cook_id=cook_id).delete()
-            DishReview.query.filter_by(cook_id=cook_id).delete()
-            ChefReply.query.filter_by(cook_id=cook_id).delete()
-            db.session.delete(user.cook)
-
-        # Delete records related to administrators
-        if user.administrator:
-            db.session.delete(user.administrator)
-
-        db.session.delete(user)
-        db.session.commit()
+        delete_account(user)
 
         # Clear session
         session.pop('user', None)
@@ -206,60 +206,29 @@ def delete_profile():
         return jsonify({"success": False, "message": f"Error deleting account: {e}"}), 500
 
 @app.route('/admin_dashboard')
+@role_required('Administrator')
 def admin_dashboard():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return redirect(url_for('login_page'))
     return render_template('admin_dashboard.html')
 
 
 @app.route('/admin_menu', methods=['GET'])
+@role_required('Administrator')
 def admin_menu():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return redirect(url_for('login_page'))
-
-    # Get today's date
-    today = date.today()
-    # Query all available menu items today
-    menus = Menu.query.filter_by(date=today).all()
-
-    # Extract menu information from menu items and count the total number of each menu item
-    dish_quantities = {}
-    for menu_item in menus:
-        dish_id = menu_item.dish_id
-        cook_id = menu_item.cook_id
-        if (dish_id, cook_id) in dish_quantities:
-            dish_quantities[(dish_id, cook_id)]['quantity'] += menu_item.quantity
-        else:
-            dish = Dish.query.get(dish_id)
-            cook = Cook.query.get(cook_id)
-            dish_quantities[(dish_id, cook_id)] = {
-                'menu_id': menu_item.menu_id,
-                'dish_id': dish.dish_id,
-                'name': dish.dish_name,
-                'image_url': dish.image_url,
-                'category': dish.category,
-                'price': dish.price,
-                'description': dish.description,
-                'quantity': menu_item.quantity,
-                'cook_name': cook.user.username
-            }
-
-    # Pass the menu list to the template
-    dishes = list(dish_quantities.values())
+    # Today's menu items per dish and cook, served from the menu read model
+    dishes = dishes_for_today_with_cooks()
 
     return render_template('admin_menu.html', dishes=dishes)
 
 @app.route('/admin_delete_menu_item/<int:menu_id>', methods=['POST'])
+@role_required('Administrator', denied=({"message": "Permission denied"}, 403))
 def admin_delete_menu_item(menu_id):
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({"message": "Permission denied"}), 403
-
     menu_item = Menu.query.get(menu_id)
     if not menu_item:
         return jsonify({"message": "Menu item not found"}), 404
 
     try:
         db.session.delete(menu_item)
+        bump_menu_version()
         db.session.commit()
         return redirect(url_for('admin_menu'))
     except Exception as e:
@@ -269,37 +238,70 @@ def admin_delete_menu_item(menu_id):
 
 # Render HTML pages
 @app.route('/admin_accounts', methods=['GET'])
+@role_required('Administrator')
 def admin_accounts_page():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return redirect(url_for('login_page'))
     return render_template('admin_accounts.html')  # Render HTML page
 
+ACCOUNTS_PER_PAGE = 50  # Accounts returned per page of /api/admin_accounts
+MAX_ACCOUNTS_PER_PAGE = 200
+
+
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def prefix_range(column, prefix):
+    """Case-insensitive 'starts with' as a range on lower(column), so it can use the lower() index.
+
+    SQLite's lower() only folds ASCII letters, so the prefix is folded the same way: other
+    characters (e.g. 'É') must match exactly instead of being lowered to something never stored.
+    """
+    prefix = prefix.translate(ASCII_LOWER)
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    expr = db.func.lower(column)
+    return (expr >= prefix) & (expr < upper)
+
+
 # apis that provide user data
 @app.route('/api/admin_accounts', methods=['GET'])
+@role_required('Administrator', denied=({'error': 'Unauthorized'}, 401))
 def admin_accounts_api():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({'error': 'Unauthorized'}), 401
-
     # Query parameter
     role_filter = request.args.get('role')  # Customer, Cook, Administrator, None
-    search_query = request.args.get('search')  # Search criteria
-
-    # Build query
-    query = User.query
-    if role_filter:
-        if role_filter == "Customer":
-            query = query.join(Customer)
-        elif role_filter == "Cook":
-            query = query.join(Cook)
-        elif role_filter == "Administrator":
-            query = query.join(Administrator)
+    search_query = (request.args.get('search') or '').strip()  # Username or email prefix
+    after = request.args.get('after', type=int)  # Cursor: last user_id of the previous page
+    limit = min(max(request.args.get('limit', ACCOUNTS_PER_PAGE, type=int), 1), MAX_ACCOUNTS_PER_PAGE)
+
+    # Build query; the role is resolved in the same query through outer joins
+    role = db.case(
+        (Customer.customer_id.isnot(None), 'Customer'),
+        (Cook.cook_id.isnot(None), 'Cook'),
+        else_='Administrator'
+    )
+    query = db.session.query(
+        User.user_id, User.username, User.email, User.avatar_url, role.label('role')
+    ).outerjoin(
+        Customer, Customer.user_id == User.user_id
+    ).outerjoin(
+        Cook, Cook.user_id == User.user_id
+    ).outerjoin(
+        Administrator, Administrator.user_id == User.user_id
+    ).filter(User.is_disabled.is_(False))
+    if role_filter == "Customer":
+        query = query.filter(Customer.customer_id.isnot(None))
+    elif role_filter == "Cook":
+        query = query.filter(Cook.cook_id.isnot(None))
+    elif role_filter == "Administrator":
+        query = query.filter(Administrator.admin_id.isnot(None))
 
     if search_query:
-        query = query.filter(
-            (User.username.contains(search_query)) | (User.email.contains(search_query))
-        )
+        query = query.filter(prefix_range(User.username, search_query) | prefix_range(User.email, search_query))
+
+    if after:
+        query = query.filter(User.user_id > after)
 
-    users = query.all()
+    users = query.order_by(User.user_id).limit(limit + 1).all()
+    has_more = len(users) > limit
+    users = users[:limit]
 
     # Return user data
     user_data = [
@@ -307,20 +309,92 @@ def admin_accounts_api():
             "user_id": user.user_id,
             "username": user.username,
             "email": user.email,
-            "role": "Customer" if user.customer else "Cook" if user.cook else "Administrator",
-            "avatar_url": user.avatar_url if hasattr(user, 'avatar_url') and user.avatar_url else "/static/images/default_avatar.png"
+            "role": user.role,
+            "avatar_url": user.avatar_url or "/static/images/default_avatar.png"
         }
         for user in users
     ]
-    return jsonify(user_data)
+    return jsonify({"users": user_data, "next_after": users[-1].user_id if has_more else None})
+
+ANALYTICS_DEFAULT_DAYS = 30  # Range of /api/admin/analytics/* when no start is given
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_MAX_TOP = 100
+
+
+def analytics_range():
+    """Parse the start/end query parameters (ISO dates, inclusive); raise ValueError if invalid."""
+    end = request.args.get('end')
+    end = date.fromisoformat(end) if end else datetime.utcnow().date()
+    start = request.args.get('start')
+    start = date.fromisoformat(start) if start else end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end or (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise ValueError(f'start must be on or before end, at most {ANALYTICS_MAX_DAYS} days apart')
+    return start, end
+
+
+# Sales time series of one dish, cook or category, served from the daily rollups
+@app.route('/api/admin/analytics/timeseries', methods=['GET'])
+@role_required('Administrator', denied=({'error': 'Unauthorized'}, 401))
+def admin_analytics_timeseries():
+    level = request.args.get('level')
+    key = request.args.get('key')
+    if level not in ROLLUPS or not key:
+        return jsonify({'error': f"level must be one of {', '.join(ROLLUPS)} and key is required"}), 400
+    if level != 'category':
+        try:
+            key = int(key)
+        except ValueError:
+            return jsonify({'error': 'key must be a dish or cook id'}), 400
+    try:
+        start, end = analytics_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'level': level, 'key': key, 'start': start.isoformat(), 'end': end.isoformat(),
+                    'series': sales_series(level, key, start, end)})
+
+
+# Best-selling dishes, cooks or categories over a date range
+@app.route('/api/admin/analytics/top', methods=['GET'])
+@role_required('Administrator', denied=({'error': 'Unauthorized'}, 401))
+def admin_analytics_top():
+    level = request.args.get('level', 'dish')
+    metric = request.args.get('metric', 'revenue_cents')
+    if level not in ROLLUPS or metric not in METRICS:
+        return jsonify({'error': f"level must be one of {', '.join(ROLLUPS)}, metric one of {', '.join(METRICS)}"}), 400
+    limit = min(max(request.args.get('limit', 10, type=int), 1), ANALYTICS_MAX_TOP)
+    try:
+        start, end = analytics_range()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'level': level, 'metric': metric, 'start': start.isoformat(), 'end': end.isoformat(),
+                    'top': top_sellers(level, start, end, metric=metric, limit=limit)})
 
-banned_users = set()  # Global set to store banned user IDs
+
+@app.before_request
+def reject_banned_session():
+    # A ban or an account deletion also ends sessions that were opened before it
+    # (checked against the per-worker ban and closed-account caches)
+    if 'user' not in session:
+        return None
+    user_id = session['user']['user_id']
+    if is_closed_session(user_id, session.get('login_at')):
+        message = "This account has been deleted."
+    elif is_banned(user_id):
+        message = "This account has been banned."
+    else:
+        return None
+    session.pop('user', None)
+    session.pop('user_id', None)
+    session.pop('login_at', None)
+    if request.method == 'GET' and not request.path.startswith('/api/'):
+        return redirect(url_for('login_page'))
+    return jsonify({"message": message}), 403
 
 @app.route('/admin_ban_user/<int:user_id>', methods=['POST'])
+@role_required('Administrator', denied=({"message": "Permission denied"}, 403))
 def admin_ban_user(user_id):
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({"message": "Permission denied"}), 403
-
     user = User.query.get(user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -329,11 +403,10 @@ def admin_ban_user(user_id):
     action = data.get('action')  # Could be 'ban' or 'unban'
 
     if action == 'ban':
-        banned_users.add(user_id)
+        ban_user(user_id)
         return jsonify({"message": f"User banned successfully"}), 200
     elif action == 'unban':
-        if user_id in banned_users:
-            banned_users.discard(user_id)
+        unban_user(user_id)
         return jsonify({"message": f"User unbanned successfully"}), 200
     else:
         return jsonify({"message": "Invalid action"}), 400
@@ -342,59 +415,20 @@ def admin_ban_user(user_id):
 @app.route('/logout')
 def logout():
     session.pop('user', None)
+    session.pop('login_at', None)
     return redirect(url_for('login_page'))
 
 
 @app.route('/admin_account/<int:user_id>', methods=['GET', 'DELETE', 'POST'])
+@role_required('Administrator')
 def admin_user_details(user_id):
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return redirect(url_for('login_page'))
-
     user = User.query.filter_by(user_id=user_id).first()
     if not user:
         return "User not found", 404
 
     if request.method == 'DELETE':
         try:
-
-            if user.cook:
-                cook_id = user.cook.cook_id
-                Menu.query.filter_by(cook_id=cook_id).delete()
-                OrderItem.query.filter_by(cook_id=cook_id).delete()
-                DishReview.query.filter_by(cook_id=cook_id).delete()
-                ChefReply.query.filter_by(cook_id=cook_id).delete()
-
-            # If it's a Customer account, clean up Customer-related records
-            if user.customer:
-                customer_id = user.customer.customer_id
-                # Clean up shopping cart items
-                ShoppingCartItem.query.filter_by(customer_id=customer_id).delete()
-                # Clean up messages (as sender or receiver)
-                Message.query.filter_by(sender_id=customer_id).delete()
-                Message.query.filter_by(receiver_id=customer_id).delete()
-                # Clean up friendships (as initiator or receiver)
-                Friendship.query.filter_by(customer_id=customer_id).delete()
-                Friendship.query.filter_by(friend_id=customer_id).delete()
-                # Clean up order items (need to delete OrderItem before Order)
-                order_ids = [o.order_id for o in Order.query.filter_by(customer_id=customer_id).all()]
-                for oid in order_ids:
-                    OrderItem.query.filter_by(order_id=oid).delete()
-                # Clean up orders
-                Order.query.filter_by(customer_id=customer_id).delete()
-                # Clean up reviews
-                DishReview.query.filter_by(customer_id=customer_id).delete()
-
-            # Delete user-related role records
-            if user.customer:
-                db.session.delete(user.customer)
-            elif user.cook:
-                db.session.delete(user.cook)
-            elif user.administrator:
-                db.session.delete(user.administrator)
-
-            # Finally delete the User itself
-            db.session.delete(user)
-            db.session.commit()
+            delete_account(user)
             return jsonify({"message": "User deleted successfully"})
         except Exception as e:
             db.session.rollback()
@@ -424,6 +458,7 @@ def admin_user_details(user_id):
                 user=user,
                 cook=cook,
                 categories=categories,
+                is_banned=is_banned(user_id),
                 message=f"Category '{category}' assigned successfully!"
             )
         except Exception as e:
@@ -437,17 +472,16 @@ def admin_user_details(user_id):
         'admin_user_details.html',
         user=user,
         cook=cook,
-        categories=categories
+        categories=categories,
+        is_banned=is_banned(user_id)
     )
 
 
 @app.route('/admin_profile', methods=['GET', 'POST'])
+@role_required('Administrator')
 def admin_profile():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return redirect(url_for('login_page'))
-
     # Get current logged-in user data
-    user_data = User.query.filter_by(user_id=session['user']['user_id']).first()
+    user_data = current_user()
     if not user_data:
         return redirect(url_for('login_page'))  # If user not found, redirect to login page
 
@@ -462,101 +496,79 @@ def admin_profile():
 
 
 @app.route('/customer_dashboard', methods=['GET'])
+@role_required('Customer')
 def customer_dashboard():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
-
-    # 获取今天的日期
-    today = date.today()
-
-    # 查询今日所有可用的菜单项
-    menus = Menu.query.filter_by(date=today).all()
-
-    # 从菜单项中提取菜品信息，并统计每个菜品的总数量
-    dish_quantities = {}
-    for menu_item in menus:
-        dish_id = menu_item.dish_id
-        if dish_id in dish_quantities:
-            dish_quantities[dish_id]['quantity'] += menu_item.quantity
-        else:
-            dish = Dish.query.get(dish_id)
-            dish_quantities[dish_id] = {
-                'dish_id': dish.dish_id,
-                'name': dish.dish_name,
-                'image_url': dish.image_url,
-                'category': dish.category,
-                'price': dish.price,
-                'description': dish.description,
-                'quantity': menu_item.quantity  # 可用数量
-            }
-
-    # 将菜品列表传递给模板
-    dishes = list(dish_quantities.values())
+    # 今日菜品及其可用总数量，来自今日菜单缓存
+    dishes = dishes_for_today()
 
     return render_template('customer_dashboard.html', dishes=dishes)
 
 @app.route('/api/customer_menu', methods=['GET'])
+@role_required('Customer', denied=({"message": "Unauthorized"}, 403))
 def api_customer_menu():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return jsonify({"message": "Unauthorized"}), 403
+    menu_version, dish_version = content_versions()
+    etag = f'customer-menu-{date.today().isoformat()}-{menu_version}-{dish_version}'
+    return versioned_json(etag, menu_grouped_by_cook)
 
-    today = date.today()
-    menus = Menu.query.filter_by(date=today).all()
-
-    cook_dishes_map = {}
-    for menu_item in menus:
-        dish = menu_item.dish
-        cook = menu_item.cook.user.username  # 获取厨师的用户名
-        if cook not in cook_dishes_map:
-            cook_dishes_map[cook] = []
-        cook_dishes_map[cook].append({
-            'dish_id': dish.dish_id,
-            'dish_name': dish.dish_name,
-            'image_url': dish.image_url,
-            'category': dish.category,
-            'price': dish.price,
-            'description': dish.description,
-            'quantity': menu_item.quantity,
-            'cook_name': cook
-        })
+REVIEWS_PER_PAGE = 20  # Reviews shown per page on dish_detail and cook_comments
 
-    result = []
-    for cook_name, dishes in cook_dishes_map.items():
-        result.append({
-            'cook_name': cook_name,
-            'dishes': dishes
-        })
 
-    return jsonify(result), 200
+def review_page(query, cursor, *options):
+    """Return one page of ``query``'s reviews, newest first, and the cursor of the next page.
+
+    Pages are keyed on (created_at, review_id), which the (dish_id|cook_id, created_at)
+    indexes serve without scanning older reviews.
+    """
+    if cursor:
+        before_date, before_id = cursor
+        query = query.filter(
+            (DishReview.created_at < before_date) |
+            ((DishReview.created_at == before_date) & (DishReview.review_id < before_id))
+        )
+    reviews = query.options(*options).order_by(
+        DishReview.created_at.desc(), DishReview.review_id.desc()
+    ).limit(REVIEWS_PER_PAGE + 1).all()
+
+    next_cursor = None
+    if len(reviews) > REVIEWS_PER_PAGE:
+        reviews = reviews[:REVIEWS_PER_PAGE]
+        next_cursor = f"{reviews[-1].created_at.isoformat()}_{reviews[-1].review_id}"
+    return reviews, next_cursor
+
 
 @app.route('/dish/<int:dish_id>', methods=['GET'])
+@role_required('Customer')
 def dish_detail(dish_id):
-    # Ensure the user is logged in and is a customer
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
-
     # Fetch dish information
     dish = Dish.query.get(dish_id)
     if not dish:
         return "Dish not found", 404  # Handle the case where the dish does not exist
 
-    # Fetch all reviews related to the dish, ordered by creation date
-    reviews = DishReview.query.filter_by(dish_id=dish_id).order_by(DishReview.created_at.desc()).all()
+    # One page of reviews, newest first; reviewers, replies and their cooks are loaded in batch
+    cursor = parse_cursor(request.args.get('before'))
+    reviews, next_cursor = review_page(
+        DishReview.query.filter_by(dish_id=dish_id),
+        cursor,
+        joinedload(DishReview.customer).joinedload(Customer.user),
+        selectinload(DishReview.replies).joinedload(ChefReply.cook).joinedload(Cook.user)
+    )
 
     # Prepare data for reviews, including replies from chefs
     reviews_data = []
     for review in reviews:
         customer = review.customer.user  # Accessing the user object of the customer
-        replies = ChefReply.query.filter_by(review_id=review.review_id).all()
+        replies = review.replies
         review_data = {
             'username': customer.username,
             'avatar_url': customer.avatar_url or '/static/images/default_avatar.png',
+            'avatar_variants': customer.avatar_variants,
             'comment_text': review.comment_text,
             'created_at': review.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'replies': [{
                 'cook': {
                     'username': reply.cook.user.username,  # Accessing username through the user relationship
-                    'avatar_url': reply.cook.user.avatar_url or '/static/images/default_avatar.png'
+                    'avatar_url': reply.cook.user.avatar_url or '/static/images/default_avatar.png',
+                    'avatar_variants': reply.cook.user.avatar_variants
                 },
                 'reply_text': reply.reply_text,
                 'created_at': reply.created_at.strftime('%Y-%m-%d %H:%M:%S')
@@ -565,15 +577,14 @@ def dish_detail(dish_id):
         reviews_data.append(review_data)
 
     # Render the dish detail page with dish info and reviews
-    return render_template('dish_detail.html', dish=dish, reviews=reviews_data)
+    return render_template('dish_detail.html', dish=dish, reviews=reviews_data,
+                           next_cursor=next_cursor, paged=cursor is not None)
 
 
 # Add dishes to cart
 @app.route('/add_to_cart', methods=['POST'])
+@role_required('Customer', denied=({"message": "Is not logged in or has no permissions"}, 403))
 def add_to_cart():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return jsonify({"message": "Is not logged in or has no permissions"}), 403
-
     data = request.get_json()
     dish_id = data.get('dish_id')
     quantity = data.get('quantity', 1)
@@ -581,7 +592,11 @@ def add_to_cart():
     if not dish_id:
         return jsonify({"message": "Missing menu ID"}), 400
 
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
+    # The session may outlive the account: never write a cart row for a missing customer
+    customer = current_customer()
+    if not customer:
+        return jsonify({"message": "Customer not found"}), 404
+    customer_id = customer.customer_id
 
     # Get today's date
     today = date.today()
@@ -593,7 +608,7 @@ def add_to_cart():
     available_quantity = menu_item.quantity
 
     # 获取购物车中已选择的该菜品数量
-    cart_item = ShoppingCartItem.query.filter_by(customer_id=customer.customer_id, dish_id=dish_id).first()
+    cart_item = ShoppingCartItem.query.filter_by(customer_id=customer_id, dish_id=dish_id).first()
     current_cart_quantity = cart_item.quantity if cart_item else 0
 
     if quantity + current_cart_quantity > available_quantity:
@@ -603,7 +618,7 @@ def add_to_cart():
         cart_item.quantity += quantity  # 更新数量
     else:
         # 添加新购物车项
-        cart_item = ShoppingCartItem(customer_id=customer.customer_id, dish_id=dish_id, quantity=quantity)
+        cart_item = ShoppingCartItem(customer_id=customer_id, dish_id=dish_id, quantity=quantity)
         db.session.add(cart_item)
 
     db.session.commit()
@@ -612,23 +627,25 @@ def add_to_cart():
 
 # 查看购物车
 @app.route('/view_cart')
+@role_required('Customer')
 def view_cart():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
-
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
-    cart_items = ShoppingCartItem.query.filter_by(customer_id=customer.customer_id).all()
+    customer_id = g.identity.customer_id
+    cart_items = ShoppingCartItem.query.options(joinedload(ShoppingCartItem.dish)).filter_by(
+        customer_id=customer_id
+    ).all()
 
-    total_price = sum(float(item.dish.price) * item.quantity for item in cart_items)
+    total_cents = db.session.query(
+        db.func.coalesce(db.func.sum(Dish.price_cents * ShoppingCartItem.quantity), 0)
+    ).select_from(ShoppingCartItem).join(Dish, Dish.dish_id == ShoppingCartItem.dish_id).filter(
+        ShoppingCartItem.customer_id == customer_id
+    ).scalar()
 
-    return render_template('view_cart.html', cart_items=cart_items, total_price=total_price)
+    return render_template('view_cart.html', cart_items=cart_items, total_price=total_cents / 100)
 
 # 更新购物车项数量
 @app.route('/update_cart_item', methods=['POST'])
+@role_required('Customer', denied=({"message": "Is not logged in or has no permissions"}, 403))
 def update_cart_item():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return jsonify({"message": "Is not logged in or has no permissions"}), 403
-
     data = request.get_json()
     cart_item_id = data.get('cart_item_id')
     new_quantity = data.get('quantity')
@@ -641,8 +658,8 @@ def update_cart_item():
         return jsonify({"message": "Shopping cart item does not exist"}), 404
 
     # 验证购物车项属于当前用户
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
-    if cart_item.customer_id != customer.customer_id:
+    customer_id = g.identity.customer_id
+    if cart_item.customer_id != customer_id:
         return jsonify({"message": "Do not have permission to modify this shopping cart item"}), 403
 
     if new_quantity <= 0:
@@ -658,7 +675,7 @@ def update_cart_item():
         available_quantity = menu_item.quantity
 
         # 获取购物车中已选择的该菜品的其他数量
-        other_cart_items = ShoppingCartItem.query.filter_by(customer_id=customer.customer_id, dish_id=cart_item.dish_id).all()
+        other_cart_items = ShoppingCartItem.query.filter_by(customer_id=customer_id, dish_id=cart_item.dish_id).all()
         other_cart_quantity = sum(item.quantity for item in other_cart_items if item.cart_item_id != cart_item_id)
 
         if new_quantity + other_cart_quantity > available_quantity:
@@ -672,10 +689,8 @@ def update_cart_item():
 
 # 从购物车中移除菜品
 @app.route('/remove_from_cart', methods=['POST'])
+@role_required('Customer', denied=({"message": "Is not logged in or has no permissions"}, 403))
 def remove_from_cart():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return jsonify({"message": "Is not logged in or has no permissions"}), 403
-
     data = request.get_json()
     cart_item_id = data.get('cart_item_id')
 
@@ -687,8 +702,8 @@ def remove_from_cart():
         return jsonify({"message": "Shopping cart item does not exist"}), 404
 
     # 验证购物车项属于当前用户
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
-    if cart_item.customer_id != customer.customer_id:
+    customer_id = g.identity.customer_id
+    if cart_item.customer_id != customer_id:
         return jsonify({"message": "Do not have permission to delete this shopping cart item"}), 403
 
     db.session.delete(cart_item)
@@ -698,96 +713,70 @@ def remove_from_cart():
 
 # 提交订单
 @app.route('/submit_order', methods=['POST'])
+@role_required('Customer', denied=({"message": "Is not logged in or has no permissions", "success": False}, 403))
 def submit_order():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return jsonify({"message": "Is not logged in or has no permissions", "success": False}), 403
+    customer = current_customer()
+    if not customer:
+        return jsonify({"message": "Customer not found", "success": False}), 404
 
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
-    cart_items = ShoppingCartItem.query.filter_by(customer_id=customer.customer_id).all()
+    # 'batched'：与同时到达的订单合并为一个事务提交；'direct'：在本请求内单独提交
+    if app.config['ORDER_ADMISSION'] == 'batched':
+        status, body = order_batcher.submit(app, customer.customer_id)
+    else:
+        status, body = admit_orders([customer.customer_id])[0]
+    return jsonify(body), status
 
-    if not cart_items:
-        return jsonify({"message": "Shopping cart is empty", "success": False}), 400
 
-    try:
-        total_price = 0
-        today = date.today()  # 确保在循环外获取today
-        for cart_item in cart_items:
-            menu_item = Menu.query.filter_by(dish_id=cart_item.dish_id, date=today).first()
-            if not menu_item:
-                raise Exception(f"dish {cart_item.dish.dish_name} not available today")
-
-            available_quantity = menu_item.quantity
-            current_cart_quantity = cart_item.quantity
-
-            if current_cart_quantity > available_quantity:
-                raise Exception(f"dish {cart_item.dish.dish_name} The available quantity is insufficient. Available quantity：{available_quantity}")
-
-            total_price += float(cart_item.dish.price) * cart_item.quantity
-
-        # 创建新订单
-        new_order = Order(
-            customer_id=customer.customer_id,
-            date=datetime.utcnow(),
-            total_price=total_price
-        )
-        db.session.add(new_order)
-        db.session.flush()  # 获取新订单的ID
-
-        # 创建订单项并更新菜单的可用数量
-        for cart_item in cart_items:
-            menu_item = Menu.query.filter_by(dish_id=cart_item.dish_id, date=today).first()
-            menu_item.quantity -= cart_item.quantity
-            if menu_item.quantity < 0:
-                raise Exception(f"dish {cart_item.dish.dish_name} The available quantity is insufficient. ")
-
-            # 从菜单项中获取 cook_id
-            cook_id = menu_item.cook_id
-
-            order_item = OrderItem(
-                order_id=new_order.order_id,
-                dish_id=cart_item.dish_id,
-                quantity=cart_item.quantity,
-                cook_id=cook_id  # 设置厨师ID
-            )
-            db.session.add(order_item)
 
-        # 清空购物车
-        for item in cart_items:
-            db.session.delete(item)
+ORDERS_PER_PAGE = 20  # Orders shown per page of the order history
 
-        db.session.commit()
-        return jsonify({"message": "Order submitted", "success": True})
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"message": f"Order submission failure: {str(e)}", "success": False}), 500
 
+def parse_cursor(cursor):
+    """Parse a keyset cursor of the form '<iso datetime>_<id>' (order history, review feeds)."""
+    try:
+        order_date, order_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(order_date), int(order_id)
+    except (AttributeError, ValueError):
+        return None
 
 
 @app.route('/customer_profile')
+@role_required('Customer')
 def customer_profile():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
-
     # Get current logged-in user data
-    user_data = User.query.filter_by(user_id=session['user']['user_id']).first()
+    user_data = current_user()
     if not user_data:
         return redirect(url_for('login_page'))
 
-    # 获取客户的订单历史
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
-    orders = Order.query.filter_by(customer_id=customer.customer_id).order_by(Order.date.desc()).all()
+    # 获取客户的订单历史（按日期分页，订单项、菜品和评价一次性批量加载）
+    query = Order.query.filter_by(customer_id=g.identity.customer_id)
+
+    cursor = parse_cursor(request.args.get('before'))
+    if cursor:
+        before_date, before_id = cursor
+        query = query.filter(
+            (Order.date < before_date) | ((Order.date == before_date) & (Order.order_id < before_id))
+        )
+
+    orders = query.options(
+        selectinload(Order.order_items).selectinload(OrderItem.dish),
+        selectinload(Order.order_items).selectinload(OrderItem.review)
+    ).order_by(Order.date.desc(), Order.order_id.desc()).limit(ORDERS_PER_PAGE + 1).all()
+
+    next_cursor = None
+    if len(orders) > ORDERS_PER_PAGE:
+        orders = orders[:ORDERS_PER_PAGE]
+        next_cursor = f"{orders[-1].date.isoformat()}_{orders[-1].order_id}"
 
     # 准备订单数据
     orders_data = []
     for order in orders:
-        order_items = OrderItem.query.filter_by(order_id=order.order_id).all()
         items = []
-        for item in order_items:
-            dish = Dish.query.get(item.dish_id)
-            review = DishReview.query.filter_by(order_item_id=item.order_item_id).first()
+        for item in order.order_items:
+            review = item.review
             items.append({
                 'order_item_id': item.order_item_id,
-                'dish_name': dish.dish_name,
+                'dish_name': item.dish.dish_name,
                 'quantity': item.quantity,
                 'reviewed': True if review else False,
                 'review_text': review.comment_text if review else None
@@ -799,20 +788,19 @@ def customer_profile():
             'total_price': order.total_price
         })
 
-    return render_template('customer_profile.html', user=user_data, orders=orders_data)
+    return render_template('customer_profile.html', user=user_data, orders=orders_data,
+                           next_cursor=next_cursor, paged=cursor is not None)
 
 @app.route('/add_review/<int:order_item_id>', methods=['GET', 'POST'])
+@role_required('Customer')
 def add_review(order_item_id):
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
-
     order_item = OrderItem.query.get(order_item_id)
     if not order_item:
         return "Order item not found", 404
 
     # 验证订单是否属于当前顾客
-    customer = Customer.query.filter_by(user_id=session['user']['user_id']).first()
-    if order_item.order.customer_id != customer.customer_id:
+    customer_id = g.identity.customer_id
+    if order_item.order.customer_id != customer_id:
         return "You do not have permission to review this item", 403
 
     if request.method == 'POST':
@@ -826,7 +814,7 @@ def add_review(order_item_id):
         else:
             review = DishReview(
                 order_item_id=order_item_id,
-                customer_id=customer.customer_id,
+                customer_id=customer_id,
                 cook_id=order_item.cook_id,
                 dish_id=order_item.dish_id,
                 comment_text=comment_text
@@ -840,78 +828,83 @@ def add_review(order_item_id):
 
 
 @app.route('/customer_messages')
+@role_required('Customer')
 def customer_messages():
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
-
-    # Get current logged-in user data
-    user_data = User.query.filter_by(user_id=session['user']['user_id']).first()
-    if not user_data:
-        return redirect(url_for('login_page'))  # If user not found, redirect to login page
-
-    # 从 session 中获取 user_id
-    user_id = session['user_id']
-
-    # 从数据库中查找对应的 customer_id
-    user = User.query.get(user_id)
-    if not user or not user.customer:
+    customer = current_customer()
+    if not customer:
         return "Customer not found or user is not a customer", 400
-
-    # 获取 customer_id
-    customer_id = user.customer.customer_id
+    customer_id = customer.customer_id
     print(f"Customer ID for messages: {customer_id}")  # 调试信息
 
     # 将 customer_id 传递到模板
     return render_template('customer_message.html', customer_id=customer_id)
 
-# 获取用户的消息列表
+def message_preview(content):
+    return content[:50] + ('...' if len(content) > 50 else '')
+
+
+def record_conversation_message(message):
+    """Upsert the conversation row of a flushed message in the current transaction."""
+    sender_id, receiver_id = int(message.sender_id), int(message.receiver_id)
+    low_id, high_id = min(sender_id, receiver_id), max(sender_id, receiver_id)
+    stmt = sqlite_insert(Conversation).values(
+        customer_low_id=low_id,
+        customer_high_id=high_id,
+        last_message_id=message.message_id,
+        last_message_preview=message_preview(message.content),
+        last_message_at=message.created_at,
+        low_unread_count=1 if receiver_id == low_id else 0,
+        high_unread_count=1 if receiver_id == high_id and low_id != high_id else 0
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['customer_low_id', 'customer_high_id'],
+        set_={
+            'last_message_id': stmt.excluded.last_message_id,
+            'last_message_preview': stmt.excluded.last_message_preview,
+            'last_message_at': stmt.excluded.last_message_at,
+            'low_unread_count': Conversation.low_unread_count + stmt.excluded.low_unread_count,
+            'high_unread_count': Conversation.high_unread_count + stmt.excluded.high_unread_count
+        }
+    )
+    db.session.execute(stmt)
+
+
+# 获取用户的消息列表（每个会话一行，来自 Conversation 表）
 @app.route('/messages/<int:customer_id>', methods=['GET'])
 def get_messages(customer_id):
     try:
-        # 正确处理 coalesce 和 case，调整 whens 参数为位置参数
-        subquery = db.session.query(
-            db.case(
-                (Message.sender_id == customer_id, Message.receiver_id),
-                else_=Message.sender_id
-            ).label('friend_id'),
-            db.func.max(Message.created_at).label('latest_time')
+        is_low = Conversation.customer_low_id == customer_id
+        friend_id = db.case((is_low, Conversation.customer_high_id), else_=Conversation.customer_low_id)
+        conversations = db.session.query(
+            friend_id.label('friend_id'),
+            User.username,
+            User.avatar_url,
+            Conversation.last_message_preview,
+            Conversation.last_message_at,
+            db.case((is_low, Conversation.low_unread_count), else_=Conversation.high_unread_count).label('unread_count')
+        ).join(
+            Customer, Customer.customer_id == friend_id
+        ).join(
+            User, User.user_id == Customer.user_id
         ).filter(
-            (Message.sender_id == customer_id) | (Message.receiver_id == customer_id)
-        ).group_by(
-            db.case(
-                (Message.sender_id == customer_id, Message.receiver_id),
-                else_=Message.sender_id
-            )
-        ).subquery()
-
-        # 获取最新一条消息的数据
-        messages = db.session.query(Message).join(
-            subquery,
-            (Message.created_at == subquery.c.latest_time) &
-            (
-                (Message.sender_id == customer_id) |
-                (Message.receiver_id == customer_id)
-            )
-        ).order_by(Message.created_at.desc()).all()
+            is_low | (Conversation.customer_high_id == customer_id)
+        ).order_by(Conversation.last_message_at.desc()).all()
 
-        if not messages:
+        if not conversations:
             return jsonify({'messages': [], 'empty': True})
 
         # 构造响应
         response = {
             'messages': [
                 {
-                    'friend_id': msg.receiver_id if msg.sender_id == customer_id else msg.sender_id,
-                    'friend_avatar': (
-                        msg.receiver.user.avatar_url if msg.sender_id == customer_id else msg.sender.user.avatar_url
-                    ) or '/static/images/default_avatar.png',
-                    'friend_username': (
-                        msg.receiver.user.username if msg.sender_id == customer_id else msg.sender.user.username
-                    ),
-                    'content': msg.content[:50] + ('...' if len(msg.content) > 50 else ''),
-                    'created_at': msg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    'friend_id': conversation.friend_id,
+                    'friend_avatar': conversation.avatar_url or '/static/images/default_avatar.png',
+                    'friend_username': conversation.username,
+                    'content': conversation.last_message_preview,
+                    'created_at': conversation.last_message_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    'unread_count': conversation.unread_count,
                 }
-                for msg in messages
+                for conversation in conversations
             ],
             'empty': False
         }
@@ -922,51 +915,165 @@ def get_messages(customer_id):
         print(f"Error in /messages/<customer_id>: {e}")
         return jsonify({'error': 'Internal Server Error', 'message': str(e)}), 500
 
-@app.route('/message_details/<int:friend_id>', methods=['GET'])
-def message_details(friend_id):
-    if 'user' not in session or session['user']['role'] != 'Customer':
-        return redirect(url_for('login_page'))
+MESSAGES_PER_PAGE = 50  # Messages returned per page of a conversation
+MAX_MESSAGES_PER_PAGE = 200
 
-    # 从 session 中获取 user_id
-    user_id = session['user_id']
 
-    # 从数据库中查找对应的 customer_id
-    user = User.query.get(user_id)
-    if not user or not user.customer:
+@app.route('/message_details/<int:friend_id>', methods=['GET'])
+@role_required('Customer')
+def message_details(friend_id):
+    customer = current_customer()
+    if not customer:
         return "Customer not found or user is not a customer", 400
-
-    # 获取 customer_id
-    customer_id = user.customer.customer_id
-
-    # Debugging output
-    print(f"Customer ID (logged in): {customer_id}, Friend ID: {friend_id}")
-
-    messages = Message.query.filter(
-        ((Message.sender_id == customer_id) & (Message.receiver_id == friend_id)) |
-        ((Message.sender_id == friend_id) & (Message.receiver_id == customer_id))
-    ).order_by(Message.created_at.asc()).all()
+    customer_id = customer.customer_id
+
+    # Keyset pagination: newest page first, ?before=<message_id> walks back in time
+    limit = min(max(request.args.get('limit', MESSAGES_PER_PAGE, type=int), 1), MAX_MESSAGES_PER_PAGE)
+    before_id = request.args.get('before', type=int)
+
+    # Each direction is one indexed range read on (sender_id, receiver_id, created_at)
+    newest_first = (Message.created_at.desc(), Message.message_id.desc())
+    cursor_filter = []
+    if before_id:
+        cursor = db.session.query(Message.created_at).filter_by(message_id=before_id).first()
+        if not cursor:
+            # The cursor message is gone: ignoring it would serve the newest page again
+            return jsonify({'messages': [], 'has_more': False, 'next_before': None, 'empty': True})
+        cursor_filter.append(
+            (Message.created_at < cursor.created_at) |
+            ((Message.created_at == cursor.created_at) & (Message.message_id < before_id))
+        )
+    messages = []
+    for sender_id, receiver_id in ((customer_id, friend_id), (friend_id, customer_id)):
+        messages += Message.query.filter(
+            Message.sender_id == sender_id, Message.receiver_id == receiver_id, *cursor_filter
+        ).order_by(*newest_first).limit(limit + 1).all()
+        if sender_id == receiver_id:
+            break
+    messages.sort(key=lambda msg: (msg.created_at, msg.message_id), reverse=True)
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
 
     if not messages:
-        print(f"No messages found for Customer ID {customer_id} and Friend ID {friend_id}")
         return jsonify({'messages': [], 'empty': True})
 
+    # Both participants' user info in one query
+    participants = {
+        row.customer_id: row for row in db.session.query(
+            Customer.customer_id, User.username, User.avatar_url
+        ).join(User, User.user_id == Customer.user_id).filter(
+            Customer.customer_id.in_([customer_id, friend_id])
+        )
+    }
+    friend = participants[friend_id]
+
     response = {
-        'friend_username': messages[0].sender.user.username if messages[0].sender_id == friend_id else messages[0].receiver.user.username,
-        'friend_avatar': messages[0].sender.user.avatar_url if messages[0].sender_id == friend_id else messages[0].receiver.user.avatar_url,
+        'friend_username': friend.username,
+        'friend_avatar': friend.avatar_url,
         'messages': [
             {
-                'sender_avatar': msg.sender.user.avatar_url,
-                'sender_username': msg.sender.user.username,
+                'message_id': msg.message_id,
+                'sender_avatar': participants[msg.sender_id].avatar_url,
+                'sender_username': participants[msg.sender_id].username,
                 'content': msg.content,
                 'created_at': msg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             }
             for msg in messages
         ],
+        'has_more': has_more,
+        'next_before': messages[0].message_id if has_more else None,
         'empty': False
     }
-    print(f"Response Data: {response}")  # Debugging
+
+    if not before_id:
+        # 打开会话即视为已读；没有未读消息时不写库，免得只读请求也去抢 SQLite 的写锁
+        unread_column = 'low_unread_count' if customer_id < friend_id else 'high_unread_count'
+        conversation = Conversation.query.filter_by(
+            customer_low_id=min(customer_id, friend_id), customer_high_id=max(customer_id, friend_id)
+        )
+        unread = conversation.with_entities(getattr(Conversation, unread_column)).scalar()
+        if unread:
+            conversation.update({unread_column: 0}, synchronize_session=False)
+            Message.query.filter_by(sender_id=friend_id, receiver_id=customer_id, is_read=False).update(
+                {'is_read': True}, synchronize_session=False
+            )
+            db.session.commit()
     return jsonify(response)
 
+def publish_message(message):
+    """Push a committed message to both participants' event streams and return its payload."""
+    sender = db.session.query(User.username, User.avatar_url).join(
+        Customer, Customer.user_id == User.user_id
+    ).filter(Customer.customer_id == message.sender_id).first()
+    if not sender:
+        return None
+
+    payload = {
+        'message_id': message.message_id,
+        'sender_id': int(message.sender_id),
+        'receiver_id': int(message.receiver_id),
+        'content': message.content,
+        'created_at': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'sender_avatar': sender.avatar_url or '/static/images/default_avatar.png',
+        'sender_username': sender.username
+    }
+    publish(customer_channel(message.receiver_id), 'message', payload)
+    if payload['receiver_id'] != payload['sender_id']:
+        publish(customer_channel(message.sender_id), 'message', payload)
+    return payload
+
+
+EVENT_STREAM_HEARTBEAT = 25  # Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_BUSY_RETRY = 30  # Retry-After seconds when this worker has no free event stream slot
+
+
+# 推送新消息和好友请求（Server-Sent Events）
+@app.route('/events')
+@role_required('Customer', denied=({"message": "Unauthorized"}, 403))
+def event_stream():
+    customer = current_customer()
+    if not customer:
+        return jsonify({"message": "Customer not found"}), 404
+
+    # Each open stream holds a worker thread: refuse rather than starve ordinary requests
+    if not stream_slots.acquire(app.config['EVENT_STREAM_LIMIT']):
+        response = jsonify({"message": "Too many open event streams, retry later"})
+        response.headers['Retry-After'] = str(EVENT_STREAM_BUSY_RETRY)
+        return response, 503
+
+    broker = get_broker()
+    subscription = broker.subscribe(customer_channel(customer.customer_id))
+    # Release the pooled connection before the stream starts idling
+    db.session.remove()
+    # The stream ends after EVENT_STREAM_MAX_SECONDS so its thread is given back; EventSource reconnects
+    deadline = time.monotonic() + app.config['EVENT_STREAM_MAX_SECONDS']
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                event = subscription.get(timeout=min(EVENT_STREAM_HEARTBEAT, remaining))
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                event_type, data = event
+                yield f'event: {event_type}\ndata: {json.dumps(data)}\n\n'
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Also runs if the client goes away before the stream starts
+    response.call_on_close(stream_slots.release)
+    return response
+
+
 @app.route('/send_message', methods=['POST'])
 def send_message():
     data = request.json
@@ -984,20 +1091,22 @@ def send_message():
         content=content
     )
     db.session.add(message)
+    db.session.flush()
+    record_conversation_message(message)
     db.session.commit()
 
-    sender = User.query.get(sender_id)
-    if not sender:
+    payload = publish_message(message)
+    if not payload:
         return jsonify({'success': False, 'message': 'Sender not found'}), 404
 
     # 返回新消息信息
     return jsonify({
         'success': True,
         'message': 'Message sent successfully!',
-        'content': message.content,
-        'created_at': message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        'sender_avatar': sender.avatar_url or '/static/images/default_avatar.png',
-        'sender_username': sender.username  # 返回发送者的用户名
+        'content': payload['content'],
+        'created_at': payload['created_at'],
+        'sender_avatar': payload['sender_avatar'],
+        'sender_username': payload['sender_username']  # 返回发送者的用户名
     })
 
 @app.route('/get_customer_avatar/<int:customer_id>', methods=['GET'])
@@ -1037,6 +1146,17 @@ def add_friend():
     friendship = Friendship(customer_id=customer_id, friend_id=friend_id, status='Pending')
     db.session.add(friendship)
     db.session.commit()
+
+    requester = db.session.query(User.username, User.avatar_url).join(
+        Customer, Customer.user_id == User.user_id
+    ).filter(Customer.customer_id == customer_id).first()
+    if requester:
+        publish(customer_channel(friend_id), 'friend_request', {
+            'friendship_id': friendship.friendship_id,
+            'username': requester.username,
+            'avatar': requester.avatar_url or '/static/images/default_avatar.png',
+            'status': 'Pending'
+        })
     return jsonify({'message': 'Friend request sent successfully!'})
 
 # 获取新朋友请求列表
@@ -1066,7 +1186,6 @@ def accept_friend(friendship_id):
 
     # Update friendship status
     friendship.status = 'Accepted'
-    db.session.commit()
 
     # Send message to the requester (customer_id)
     sender_id = friendship.friend_id  # Current user accepting the request
@@ -1080,8 +1199,13 @@ def accept_friend(friendship_id):
         content=content
     )
     db.session.add(message)
+    db.session.flush()
+    record_conversation_message(message)
     db.session.commit()
 
+    publish(customer_channel(receiver_id), 'friend_accepted', {'friendship_id': friendship_id, 'friend_id': sender_id})
+    publish_message(message)
+
     return jsonify({'message': 'Friend request accepted successfully!', 'status': 'Accepted'})
 
 
@@ -1105,12 +1229,13 @@ def get_friends(customer_id):
         })
     return jsonify({'friends': friends})
 
+MENU_PUBLISH_BATCH_SIZE = 500  # Rows per multi-row INSERT when publishing a menu
+
+
 @app.route('/cook_dashboard', methods=['GET', 'POST'])
+@role_required('Cook')
 def cook_dashboard():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return redirect(url_for('login_page'))
-
-    cook = Cook.query.filter_by(user_id=session['user']['user_id']).first()
+    cook = current_cook()  # The category can change, so it is not kept in the session
     if not cook:
         return "Cook profile not found", 404
 
@@ -1122,101 +1247,124 @@ def cook_dashboard():
         if not dish_ids or not quantities or len(dish_ids) != len(quantities):
             return jsonify({'message': 'Invalid data submitted'}), 400
 
-        today = date.today()
-
-        # Delete the chef's previous menu for the day
-        Menu.query.filter_by(cook_id=cook.cook_id, date=today).delete()
-
-        # Add new menu items
+        # Parse the submission first; invalid or non-positive quantities are skipped
+        submitted = {}
         for dish_id, quantity in zip(dish_ids, quantities):
             try:
-                quantity = int(quantity)
-                if quantity <= 0:
-                    continue
-
-                existing_item = Menu.query.filter_by(dish_id=int(dish_id), date=today).first()
-                if existing_item and existing_item.cook_id != cook.cook_id:
-                    return jsonify({'message': f'Dish with ID {dish_id} is already taken by another cook for today.'}), 400
-                elif existing_item and existing_item.cook_id == cook.cook_id:
-                    # 更新同一厨师的菜品数量
-                    existing_item.quantity = quantity
-                else:
-                    # 添加新的菜品
-                    menu_item = Menu(
-                        cook_id=cook.cook_id,
-                        dish_id=int(dish_id),
-                        date=today,
-                        quantity=quantity
-                    )
-                    db.session.add(menu_item)
+                dish_id, quantity = int(dish_id), int(quantity)
             except ValueError:
                 continue
-        db.session.commit()
+            if quantity > 0:
+                submitted[dish_id] = quantity
+
+        today = date.today()
+
+        # One query for dishes already taken by another cook today; nothing is written on conflict
+        taken = db.session.query(Menu.dish_id).filter(
+            Menu.date == today, Menu.dish_id.in_(submitted.keys()), Menu.cook_id != cook.cook_id
+        ).order_by(Menu.dish_id).first() if submitted else None
+        if taken:
+            return jsonify({'message': f'Dish with ID {taken.dish_id} is already taken by another cook for today.'}), 400
+
+        try:
+            # Remove the chef's dishes that are no longer on today's menu
+            Menu.query.filter(
+                Menu.cook_id == cook.cook_id, Menu.date == today, Menu.dish_id.notin_(submitted.keys())
+            ).delete(synchronize_session=False)
+
+            # Insert new dishes and update quantities of existing ones on the _dish_date_uc constraint.
+            # The update only applies to this cook's rows, so a dish claimed concurrently is not taken over.
+            rows = [
+                {'cook_id': cook.cook_id, 'dish_id': dish_id, 'date': today, 'quantity': quantity}
+                for dish_id, quantity in submitted.items()
+            ]
+            for start in range(0, len(rows), MENU_PUBLISH_BATCH_SIZE):
+                batch = rows[start:start + MENU_PUBLISH_BATCH_SIZE]
+                stmt = sqlite_insert(Menu).values(batch)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['dish_id', 'date'],
+                    set_={'quantity': stmt.excluded.quantity},
+                    where=Menu.cook_id == stmt.excluded.cook_id
+                )
+                if db.session.execute(stmt).rowcount != len(batch):
+                    db.session.rollback()
+                    return jsonify({'message': 'Some dishes were taken by another cook for today. Please reload and try again.'}), 409
+            bump_menu_version()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'message': f'Error submitting menu: {e}'}), 500
+
         return jsonify({'message': 'Menu submitted successfully'}), 200
 
     dishes = Dish.query.filter_by(category=cook.category).all()
     return render_template('cook_dashboard.html', dishes=dishes)
 
 @app.route('/api/cook_dashboard', methods=['GET'])
+@role_required('Cook', denied=({"message": "Unauthorized"}, 403))
 def api_cook_dashboard():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return jsonify({"message": "Unauthorized"}), 403
-
-    cook = Cook.query.filter_by(user_id=session['user']['user_id']).first()
+    cook = current_cook()
     if not cook:
         return jsonify({"message": "Cook profile not found"}), 404
 
-    dishes = Dish.query.filter_by(category=cook.category).all()
-    return jsonify([{
-        'dish_id': dish.dish_id,
-        'dish_name': dish.dish_name,
-        'image_url': dish.image_url,
-        'category': dish.category,
-        'price': dish.price,
-        'description': dish.description
-    } for dish in dishes])
+    def build():
+        dishes = Dish.query.filter_by(category=cook.category).all()
+        return [{
+            'dish_id': dish.dish_id,
+            'dish_name': dish.dish_name,
+            'image_url': dish.image_url,
+            'image_variants': dish.image_variants,
+            'category': dish.category,
+            'price': dish.price,
+            'description': dish.description
+        } for dish in dishes]
+
+    _, dish_version = content_versions()
+    # The category is part of the tag because an admin can reassign it
+    return versioned_json(f'cook-dishes-{dish_version}-{cook.category}', build)
 
 
 @app.route('/api/cook_menu', methods=['GET'])
+@role_required('Cook', denied=({"message": "Unauthorized"}, 403))
 def api_cook_menu():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return jsonify({"message": "Unauthorized"}), 403
-
-    cook = Cook.query.filter_by(user_id=session['user']['user_id']).first()
+    cook = current_cook()
     if not cook:
         return jsonify({"message": "Cook profile not found"}), 404
-
+    cook_id = cook.cook_id
     today = date.today()
-    menus = Menu.query.filter_by(
-        cook_id=cook.cook_id,
-        date=today
-    ).all()
 
-    dishes_with_quantities = [{
-        'dish_id': menu_item.dish.dish_id,
-        'dish_name': menu_item.dish.dish_name,
-        'image_url': menu_item.dish.image_url,
-        'category': menu_item.dish.category,
-        'price': menu_item.dish.price,
-        'description': menu_item.dish.description,
-        'quantity': menu_item.quantity
-    } for menu_item in menus]
-
-    return jsonify(dishes_with_quantities)
+    def build():
+        menus = Menu.query.options(joinedload(Menu.dish)).filter_by(
+            cook_id=cook_id,
+            date=today
+        ).all()
+
+        return [{
+            'dish_id': menu_item.dish.dish_id,
+            'dish_name': menu_item.dish.dish_name,
+            'image_url': menu_item.dish.image_url,
+            'image_variants': menu_item.dish.image_variants,
+            'category': menu_item.dish.category,
+            'price': menu_item.dish.price,
+            'description': menu_item.dish.description,
+            'quantity': menu_item.quantity
+        } for menu_item in menus]
+
+    menu_version, dish_version = content_versions()
+    etag = f'cook-menu-{cook_id}-{today.isoformat()}-{menu_version}-{dish_version}'
+    return versioned_json(etag, build)
 
 @app.route('/cook_menu', methods=['GET'])
+@role_required('Cook')
 def cook_menu():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return redirect(url_for('login_page'))
-
-    cook = Cook.query.filter_by(user_id=session['user']['user_id']).first()
+    cook = current_cook()
     if not cook:
         return "Cook profile not found", 404
-
+    cook_id = cook.cook_id
     today = date.today()
 
     menus = Menu.query.filter_by(
-        cook_id=cook.cook_id,
+        cook_id=cook_id,
         date=today
     ).all()
 
@@ -1224,6 +1372,7 @@ def cook_menu():
         'dish_id': menu_item.dish.dish_id,
         'dish_name': menu_item.dish.dish_name,
         'image_url': menu_item.dish.image_url,
+        'image_variants': menu_item.dish.image_variants,
         'category': menu_item.dish.category,
         'price': menu_item.dish.price,
         'description': menu_item.dish.description,
@@ -1236,15 +1385,20 @@ def cook_menu():
 
 
 @app.route('/cook_comments')
+@role_required('Cook')
 def cook_comments():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return redirect(url_for('login_page'))
-
-    cook = Cook.query.filter_by(user_id=session['user']['user_id']).first()
+    cook = current_cook()
     if not cook:
         return "Cook profile not found", 404
-
-    reviews = DishReview.query.filter_by(cook_id=cook.cook_id).order_by(DishReview.created_at.desc()).all()
+    cook_id = cook.cook_id
+    cursor = parse_cursor(request.args.get('before'))
+    reviews, next_cursor = review_page(
+        DishReview.query.filter_by(cook_id=cook_id),
+        cursor,
+        joinedload(DishReview.dish),
+        joinedload(DishReview.customer).joinedload(Customer.user),
+        selectinload(DishReview.replies)
+    )
 
     reviews_data = []
     for r in reviews:
@@ -1257,20 +1411,20 @@ def cook_comments():
             'comment_text': r.comment_text,
             'created_at': r.created_at,
             'dish_image_url': dish_img,
+            'dish_image_variants': r.dish.image_variants if r.dish else None,
             'replies': replies
         })
 
-    return render_template('cook_comments.html', reviews=reviews_data)
+    return render_template('cook_comments.html', reviews=reviews_data,
+                           next_cursor=next_cursor, paged=cursor is not None)
 
 @app.route('/add_reply', methods=['POST'])
+@role_required('Cook', denied=({'status': 'error', 'message': 'Unauthorized'}, 403))
 def add_reply():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
-
-    cook = Cook.query.filter_by(user_id=session['user']['user_id']).first()
+    cook = current_cook()
     if not cook:
         return jsonify({'status': 'error', 'message': 'Cook not found'}), 404
-
+    cook_id = cook.cook_id
     data = request.get_json()
     review_id = data.get('review_id')
     reply_text = data.get('reply_text')
@@ -1282,7 +1436,7 @@ def add_reply():
     if not review:
         return jsonify({'status': 'error', 'message': 'Review not found'}), 404
 
-    reply = ChefReply(review_id=review_id, cook_id=cook.cook_id, reply_text=reply_text)
+    reply = ChefReply(review_id=review_id, cook_id=cook_id, reply_text=reply_text)
     db.session.add(reply)
     db.session.commit()
 
@@ -1298,12 +1452,9 @@ def add_reply():
 
 
 @app.route('/cook_profile')
+@role_required('Cook')
 def cook_profile():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return redirect(url_for('login_page'))
-
-    user_id = session['user']['user_id']
-    cook = Cook.query.filter_by(user_id=user_id).first()
+    cook = current_cook()
     if not cook:
         return jsonify({"message": "Cook profile not found"}), 404
 
@@ -1334,6 +1485,8 @@ def update_user_field(user_id, field, value):
             user.password = generate_password_hash(value, method='pbkdf2:sha256')
         else:
             setattr(user, field, value)
+            if field == 'username' and user.cook:
+                bump_menu_version()  # Cook names are part of the menu
 
         # Commit transaction
         db.session.commit()
@@ -1345,10 +1498,8 @@ def update_user_field(user_id, field, value):
         return {"message": f"Database update failed: {e}"}, 500
 
 @app.route('/change_password', methods=['POST'])# No use for the moment, this is to confirm the password
+@role_required(denied=({"message": "User not logged in"}, 403))
 def change_password():
-    if 'user' not in session:
-        return jsonify({"message": "User not logged in"}), 403
-
     data = request.get_json()
     current_password = data.get('current_password')
     new_password = data.get('new_password')
@@ -1356,9 +1507,7 @@ def change_password():
     if not current_password or not new_password:
         return jsonify({"message": "Missing current or new password"}), 400
 
-    user_id = session['user']['user_id']
-    user = User.query.filter_by(user_id=user_id).first()
-
+    user = current_user()
     if not user or not check_password_hash(user.password, current_password):
         return jsonify({"message": "Current password is incorrect"}), 400
 
@@ -1375,31 +1524,24 @@ def change_password():
 
 
 @app.route('/update_profile_field', methods=['POST'])
+@role_required(denied=({"message": "User not logged in"}, 403))
 def update_profile_field():
-    if 'user' not in session:
-        return jsonify({"message": "User not logged in"}), 403
-
     data = request.get_json()
     field = data.get('field')
     value = data.get('value')
 
     # 获取当前用户信息
-    user_id = session['user']['user_id']
-    role = session['user']['role']  # 获取角色信息
-
     # 检查权限
-    if role not in ['Customer', 'Cook', 'Administrator']:
+    if g.identity.role not in ['Customer', 'Cook', 'Administrator']:
         return jsonify({"message": "Permission denied"}), 403
 
     # 调用通用函数处理更新
-    response, status_code = update_user_field(user_id, field, value)
+    response, status_code = update_user_field(g.identity.user_id, field, value)
     return jsonify(response), status_code
 
 @app.route('/admin_update_field', methods=['POST'])
+@role_required('Administrator', denied=({"message": "Permission denied"}, 403))
 def admin_update_field():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({"message": "Permission denied"}), 403
-
     data = request.get_json()
     user_id = data.get('user_id')  # 被操作用户的 ID
     field = data.get('field')
@@ -1410,13 +1552,9 @@ def admin_update_field():
     return jsonify(response), status_code
 
 @app.route('/update_avatar', methods=['POST'])
+@role_required(denied=({"message": "User not logged in"}, 403))
 def update_avatar():
-    if 'user' not in session:
-        return jsonify({"message": "User not logged in"}), 403
-
-    user_id = session['user']['user_id']
-    user = User.query.filter_by(user_id=user_id).first()
-
+    user = current_user()
     if not user:
         return jsonify({"message": "User not found"}), 404
 
@@ -1429,19 +1567,20 @@ def update_avatar():
 
     if avatar_file and allowed_file(avatar_file.filename):
         try:
-            # 保存头像文件到静态目录中
-            filename = secure_filename(f'{user_id}_{avatar_file.filename}')
-            avatar_path = os.path.join(app.config['UPLOAD_FOLDER_AVATARS'], filename)
-
-            # 确保目录存在
-            os.makedirs(app.config['UPLOAD_FOLDER_AVATARS'], exist_ok=True)
-            avatar_file.save(avatar_path)
+            # 按内容哈希保存头像文件，相同图片只存一份
+            avatar_url, avatar_path = store_image(avatar_file, 'UPLOAD_FOLDER_AVATARS', '/static/uploads/avatars')
 
             # 更新数据库中的头像 URL
-            user.avatar_url = f'/static/uploads/avatars/{filename}'  # 保存相对路径
+            variants = stored_variants(User.avatar_url, User.avatar_variants, avatar_url)
+            user.avatar_url = avatar_url  # 保存相对路径
+            user.avatar_variants = variants
             db.session.commit()
+            if variants is None:
+                submit_avatar(app, user.user_id, user.avatar_url, avatar_path)
 
             return jsonify({"success": True, "message": "Avatar updated successfully", "new_avatar_url": user.avatar_url})
+        except UploadTooLarge as e:
+            return jsonify({"success": False, "message": str(e)}), 413
         except Exception as e:
             db.session.rollback()
             return jsonify({"success": False, "message": f"Failed to update avatar: {str(e)}"}), 500
@@ -1449,11 +1588,8 @@ def update_avatar():
     return jsonify({"message": "Invalid file type"}), 400
 
 @app.route('/admin_update_avatar/<int:user_id>', methods=['POST'])
+@role_required('Administrator', denied=({"message": "Permission denied"}, 403))
 def admin_update_avatar(user_id):
-    # 验证是否为管理员权限
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({"message": "Permission denied"}), 403
-
     # 查找目标用户
     user = User.query.filter_by(user_id=user_id).first()
     if not user:
@@ -1466,31 +1602,32 @@ def admin_update_avatar(user_id):
     avatar_file = request.files['avatar']
     if avatar_file.filename == '':
         return jsonify({"message": "No selected file"}), 400
+    if not allowed_file(avatar_file.filename):
+        return jsonify({"message": "Invalid file type"}), 400
 
     try:
-        # 保存头像文件到静态目录中
-        filename = secure_filename(f'{user_id}_{avatar_file.filename}')
-        avatar_path = os.path.join(app.config['UPLOAD_FOLDER_AVATARS'], filename)
-
-        # 确保目录存在
-        os.makedirs(app.config['UPLOAD_FOLDER_AVATARS'], exist_ok=True)
-        avatar_file.save(avatar_path)
+        # 按内容哈希保存头像文件，相同图片只存一份
+        avatar_url, avatar_path = store_image(avatar_file, 'UPLOAD_FOLDER_AVATARS', '/static/uploads/avatars')
 
         # 更新数据库中的头像 URL
-        user.avatar_url = f'/static/uploads/avatars/{filename}'  # 保存相对路径
+        variants = stored_variants(User.avatar_url, User.avatar_variants, avatar_url)
+        user.avatar_url = avatar_url  # 保存相对路径
+        user.avatar_variants = variants
         db.session.commit()
+        if variants is None:
+            submit_avatar(app, user.user_id, user.avatar_url, avatar_path)
 
         return jsonify({"success": True, "message": "Avatar updated successfully", "new_avatar_url": user.avatar_url})
+    except UploadTooLarge as e:
+        return jsonify({"success": False, "message": str(e)}), 413
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "message": f"Failed to update avatar: {str(e)}"}), 500
 
 
 @app.route('/add_dish', methods=['POST'])
+@role_required('Administrator', denied=({"message": "Permission denied"}, 403))
 def add_dish():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({"message": "Permission denied"}), 403
-
     if 'image' not in request.files:
         return jsonify({"message": "No image file uploaded"}), 400
 
@@ -1501,29 +1638,37 @@ def add_dish():
 
     if file and allowed_file(file.filename):
         try:
-            # Save the file with a unique name
-            filename = secure_filename(file.filename)
-            # Generate a unique filename by appending a UUID
-            unique_filename = str(uuid.uuid4()) + "_" + filename
-            dish_image_path = os.path.join(app.config['UPLOAD_FOLDER_DISHES'], unique_filename)
+            # Read and check the form before the upload touches the disk, so a bad request leaves no file behind
+            data = request.form
+            dish_name, category, price, description = \
+                data['dish_name'], data['category'], data['price'], data['description']
+            price_to_cents(price)
 
-            # Ensure the upload directory exists
-            os.makedirs(app.config['UPLOAD_FOLDER_DISHES'], exist_ok=True)
-            file.save(dish_image_path)
+            # Save the file under its content hash (identical images share one file)
+            image_url, dish_image_path = store_image(file, 'UPLOAD_FOLDER_DISHES', '/static/uploads/dishes')
 
             # Create the dish
-            data = request.form
             new_dish = Dish(
-                dish_name=data['dish_name'],
-                image_url=f'/static/uploads/dishes/{unique_filename}',  # Store the unique filename
-                category=data['category'],
-                price=data['price'],
-                description=data['description']
+                dish_name=dish_name,
+                image_url=image_url,
+                image_variants=stored_variants(Dish.image_url, Dish.image_variants, image_url),
+                category=category,
+                price=price,
+                description=description
             )
 
             db.session.add(new_dish)
+            db.session.flush()
+            index_dish(new_dish)
+            bump_dish_version()
             db.session.commit()
+            if new_dish.image_variants is None:
+                submit_dish_image(app, new_dish.dish_id, new_dish.image_url, dish_image_path)
             return jsonify({'message': 'Added a new dish successfully'}), 201
+        except UploadTooLarge as e:
+            return jsonify({"message": str(e)}), 413
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
         except Exception as e:
             db.session.rollback()
             return jsonify({"message": "Error adding dish: " + str(e)}), 500
@@ -1540,27 +1685,38 @@ def update_dish(dish_id):
     category = request.json.get('category', dish.category)
     price = request.json.get('price', dish.price)
     description = request.json.get('description', dish.description)
+    try:
+        price_cents = price_to_cents(price)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
     # Check if a new image is uploaded
+    dish_image_path = None
     if 'image' in request.files:
         file = request.files['image']
         if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Generate a unique filename for the new image
-            unique_filename = str(uuid.uuid4()) + "_" + filename
-            dish_image_path = os.path.join(app.config['UPLOAD_FOLDER_DISHES'], unique_filename)
-            os.makedirs(app.config['UPLOAD_FOLDER_DISHES'], exist_ok=True)
-            file.save(dish_image_path)
-            dish.image_url = f'/static/uploads/dishes/{unique_filename}'  # Update image URL
+            try:
+                image_url, dish_image_path = store_image(file, 'UPLOAD_FOLDER_DISHES', '/static/uploads/dishes')
+            except UploadTooLarge as e:
+                return jsonify({"message": str(e)}), 413
+            variants = stored_variants(Dish.image_url, Dish.image_variants, image_url)
+            dish.image_url = image_url  # Update image URL
+            dish.image_variants = variants
+            if variants is not None:
+                dish_image_path = None  # Nothing to render
 
     # Update other dish details
     dish.dish_name = dish_name
     dish.category = category
-    dish.price = price
+    dish.price_cents = price_cents
     dish.description = description
 
     try:
+        index_dish(dish)
+        bump_dish_version()
         db.session.commit()
+        if dish_image_path:
+            submit_dish_image(app, dish.dish_id, dish.image_url, dish_image_path)
         return jsonify({"message": "Dish updated successfully"})
     except Exception as e:
         db.session.rollback()
@@ -1568,15 +1724,150 @@ def update_dish(dish_id):
 
 @app.route('/menu', methods=['GET'])
 def get_menu():
-    dishes = Dish.query.all()
-    return jsonify([{
-        'dish_id': dish.dish_id,
-        'dish_name': dish.dish_name,
-        'image_url': dish.image_url,
-        'category': dish.category,
-        'price': dish.price,
-        'description': dish.description
-    } for dish in dishes])
+    def build():
+        return [{
+            'dish_id': dish.dish_id,
+            'dish_name': dish.dish_name,
+            'image_url': dish.image_url,
+            'image_variants': dish.image_variants,
+            'category': dish.category,
+            'price': dish.price,
+            'description': dish.description
+        } for dish in Dish.query.all()]
+
+    _, dish_version = content_versions()
+    return versioned_json(f'dishes-{dish_version}', build)
+
+
+DISH_SEARCH_PAGE_SIZE = 20
+MAX_DISH_SEARCH_PAGE_SIZE = 100
+
+
+# Full-text dish search: ?q=<text>&page=<n>&per_page=<n>&today=1
+@app.route('/api/dishes/search', methods=['GET'])
+def api_search_dishes():
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', DISH_SEARCH_PAGE_SIZE, type=int), 1), MAX_DISH_SEARCH_PAGE_SIZE)
+    today_only = request.args.get('today') in ('1', 'true')
+
+    # Fetch one extra row to know whether there is a next page
+    rows, engine = search_dishes(query, limit=per_page + 1, offset=(page - 1) * per_page, today_only=today_only)
+    results = [{
+        'dish_id': row.dish_id,
+        'dish_name': row.dish_name,
+        'image_url': row.image_url,
+        'category': row.category,
+        'price': cents_to_price(row.price_cents),
+        'description': row.description,
+        **({'quantity': row.quantity} if today_only else {})
+    } for row in rows[:per_page]]
+
+    return jsonify({
+        'results': results,
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(rows) > per_page,
+        'engine': engine
+    })
+
+
+@app.cli.command('reindex-dishes')
+def reindex_dishes_command():
+    """Rebuild the dish full-text search index."""
+    if rebuild_dish_index():
+        db.session.commit()
+        print('Dish search index rebuilt.')
+    else:
+        print('No dish_fts table (SQLite without FTS5, or migrations not applied); dish search uses LIKE matching.')
+
+
+@app.cli.command('purge-disabled-accounts')
+def purge_disabled_accounts_command():
+    """Finish purging accounts that were deleted but not fully removed (e.g. after a restart)."""
+    user_ids = db.session.scalars(db.select(User.user_id).where(User.is_disabled.is_(True))).all()
+    for user_id in user_ids:
+        purge_account(user_id)
+    print(f'Purged {len(user_ids)} disabled account(s).')
+
+
+@app.cli.command('build-image-variants')
+def build_image_variants_command():
+    """Render missing responsive variants for uploaded dish photos and avatars."""
+    if not images_available():
+        print('Pillow is not installed; uploads are served without variants.')
+        return
+
+    jobs = [
+        (dish, 'image_url', 'image_variants', app.config['UPLOAD_FOLDER_DISHES'], DISH_SIZES)
+        for dish in Dish.query.filter(Dish.image_url.isnot(None), Dish.image_variants.is_(None))
+    ] + [
+        (user, 'avatar_url', 'avatar_variants', app.config['UPLOAD_FOLDER_AVATARS'], AVATAR_SIZES)
+        for user in User.query.filter(User.avatar_url.isnot(None), User.avatar_variants.is_(None))
+    ]
+    built = 0
+    for row, url_field, variants_field, folder, sizes in jobs:
+        url = getattr(row, url_field)
+        path = os.path.join(folder, url.rsplit('/', 1)[-1])
+        if not os.path.isfile(path):
+            continue
+        try:
+            variants = render_variants(path, sizes)
+        except Exception as e:
+            print(f'Skipping {path}: {e}')
+            continue
+        setattr(row, variants_field, variant_urls(variants, url))
+        built += 1
+    bump_dish_version()
+    db.session.commit()
+    print(f'Built variants for {built} image(s).')
+
+
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be removed.')
+@click.option('--grace-minutes', default=60, show_default=True, help='Keep files modified more recently than this.')
+def gc_uploads_command(dry_run, grace_minutes):
+    """Delete uploaded files that no dish or user references any more."""
+    removed = collect_garbage(
+        [app.config['UPLOAD_FOLDER_DISHES'], app.config['UPLOAD_FOLDER_AVATARS']],
+        grace_seconds=grace_minutes * 60,
+        dry_run=dry_run
+    )
+    for path in removed:
+        print(path)
+    print(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} unreferenced file(s).")
+
+
+@app.cli.command('rebuild-sales-rollups')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), help='Only recompute days from this date (UTC) on.')
+def rebuild_sales_rollups_command(since):
+    """Recompute the daily dish/cook/category sales rollups from the order items."""
+    counts = rebuild_sales_rollups(since.date() if since else None)
+    for table, count in counts.items():
+        print(f'{table}: {count} row(s)')
+
+
+@app.cli.command('seed')
+@click.option('--customers', default=10000, show_default=True)
+@click.option('--cooks', default=30, show_default=True)
+@click.option('--admins', default=3, show_default=True)
+@click.option('--dishes', default=300, show_default=True)
+@click.option('--days', default=60, show_default=True, help='Days of menu and order history, ending today.')
+@click.option('--orders', default=150000, show_default=True)
+@click.option('--messages', default=300000, show_default=True)
+@click.option('--friends', default=8, show_default=True, help='Average friendships per customer.')
+@click.option('--zipf', default=1.1, show_default=True, help='Zipf exponent of dish popularity.')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per executemany batch.')
+@click.option('--seed', default=1, show_default=True, help='Random seed; the same seed gives the same data.')
+def seed_command(customers, cooks, admins, dishes, days, orders, messages, friends, zipf, batch_size, seed):
+    """Bulk-load synthetic users, menus, orders, reviews and messages for benchmarking."""
+    counts = seed_database(
+        customers=customers, cooks=cooks, admins=admins, dishes=dishes, days=days, orders=orders,
+        messages=messages, friends_per_customer=friends, zipf_exponent=zipf, batch_size=batch_size, seed=seed
+    )
+    for table, count in sorted(counts.items()):
+        print(f'{table}: {count}')
+    print(f'Inserted {sum(counts.values())} rows; every account\'s password is {SEED_PASSWORD!r}.')
 
 
 @app.route('/delete_dish/<int:dish_id>', methods=['DELETE'])
@@ -1587,15 +1878,15 @@ def delete_dish(dish_id):
         return jsonify({'message': 'Dish not found'}), 404
 
     db.session.delete(dish)
+    unindex_dish(dish_id)
+    bump_dish_version()
     db.session.commit()
     return jsonify({'message': 'Dish deleted successfully'}), 200
 
 
 @app.route('/submit_dish', methods=['POST'])
+@role_required('Cook', denied=({"message": "Unauthorized"}, 403))
 def submit_dish():
-    if 'user' not in session or session['user']['role'] != 'Cook':
-        return jsonify({"message": "Unauthorized"}), 403
-
     data = request.get_json()
     dish_id = data.get('dishId')
     quantity = data.get('quantity')
@@ -1604,10 +1895,8 @@ def submit_dish():
     return jsonify({"message": "Dish submitted successfully"})
 
 @app.route('/admin_assign_category', methods=['POST'])
+@role_required('Administrator', denied=({"message": "Permission denied"}, 403))
 def admin_assign_category():
-    if 'user' not in session or session['user']['role'] != 'Administrator':
-        return jsonify({"message": "Permission denied"}), 403
-
     data = request.get_json()
     user_id = data.get('user_id')
     category = data.get('category')
@@ -1631,35 +1920,8 @@ def admin_assign_category():
 
 @app.route('/unlog_menu', methods=['GET'])
 def unlog_menu():
-    # 获取今天的日期
-    today = date.today()
-    # 查询今日所有可用的菜单项
-    menus = Menu.query.filter_by(date=today).all()
-
-    # 从菜单项中提取菜品信息，并统计每个菜品的总数量
-    dish_quantities = {}
-    for menu_item in menus:
-        dish_id = menu_item.dish_id
-        cook_id = menu_item.cook_id  # 记录厨师 ID
-        if (dish_id, cook_id) in dish_quantities:
-            dish_quantities[(dish_id, cook_id)]['quantity'] += menu_item.quantity
-        else:
-            dish = Dish.query.get(dish_id)
-            cook = Cook.query.get(cook_id)
-            dish_quantities[(dish_id, cook_id)] = {
-                'menu_id': menu_item.menu_id,
-                'dish_id': dish.dish_id,
-                'name': dish.dish_name,
-                'image_url': dish.image_url,
-                'category': dish.category,
-                'price': dish.price,
-                'description': dish.description,
-                'quantity': menu_item.quantity,
-                'cook_name': cook.user.username  # 获取厨师的用户名
-            }
-
-    # 将菜品列表传递给模板
-    dishes = list(dish_quantities.values())
+    # 今日菜单（按菜品和厨师），来自今日菜单缓存
+    dishes = dishes_for_today_with_cooks()
 
     return render_template('unlog_menu.html', dishes=dishes)
 
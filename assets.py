@@ -0,0 +1,279 @@
+"""
+Static asset bundles.
+
+Each page loads one CSS and at most one JS bundle, defined in ``BUNDLES`` as
+a list of files under ``static/``. ``flask build-assets`` concatenates and
+minifies every bundle, writes it to ``static/dist/<name>.<hash>.<ext>`` with
+a precompressed ``.gz`` copy next to it, and records the names in
+``static/dist/manifest.json``.
+
+Templates reference bundles through ``asset_url('<name>')``. With a manifest,
+it returns the fingerprinted file, served from ``/static/dist/`` with
+immutable far-future caching (and the ``.gz`` copy to clients accepting
+gzip). Without one, or with ``PARROT_ASSETS_DEBUG=1``, it points at
+``/assets/<name>``, which concatenates the sources on every request.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from flask import Response, abort, request, send_from_directory, url_for
+
+BUNDLES = {
+    # CSS
+    'auth.css': ['css/styles.css'],
+    'customer.css': ['css/customer_styles.css'],
+    'dish_detail.css': ['css/customer_styles.css', 'css/dish_styles.css'],
+    'customer_message.css': ['css/customer_message.css'],
+    'cook.css': ['css/cook_styles.css'],
+    'cook_profile.css': ['css/cook_profile.css'],
+    'admin.css': ['css/admin_styles.css'],
+    'admin_accounts.css': ['css/admin_accounts.css'],
+    'admin_profile.css': ['css/admin_profile.css'],
+    'admin_user_details.css': ['css/admin_user_details.css'],
+    'unlog.css': ['css/unlog_styles.css'],
+    # JS
+    'login.js': ['js/login.js'],
+    'register.js': ['js/register.js'],
+    'customer_dashboard.js': ['js/responsive_image.js', 'js/customer_dashboard.js'],
+    'customer_profile.js': ['js/customer_profile.js', 'js/theme-switcher.js'],
+    'customer_message.js': ['js/customer_message.js'],
+    'cook_dashboard.js': ['js/responsive_image.js', 'js/cook_dashboard.js'],
+    'cook_comments.js': ['js/cook_comments.js'],
+    'cook_profile.js': ['js/cook_profile.js'],
+    'admin_dashboard.js': ['js/responsive_image.js', 'js/admin_dashboard.js'],
+    'admin_accounts.js': ['js/admin_accounts.js'],
+    'admin_profile.js': ['js/admin_profile.js'],
+    'admin_user_details.js': ['js/admin_user_details.js'],
+    'unlog_dashboard.js': ['js/responsive_image.js', 'js/unlog_dashboard.js'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+
+_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+
+
+def minify_css(source):
+    """Drop comments and redundant whitespace; string contents are left untouched."""
+    keep_string = lambda m: m.group(1) or ''
+    css = re.sub(rf'({_STRING})|/\*.*?\*/', keep_string, source, flags=re.S)
+    css = re.sub(rf'({_STRING})|\s+', lambda m: m.group(1) or ' ', css)
+    css = re.sub(rf'({_STRING})|\s*([{{}};,>])\s*', lambda m: m.group(1) or m.group(2), css)
+    css = re.sub(rf'({_STRING})|;(}})', lambda m: m.group(1) or m.group(2), css)
+    return css.strip()
+
+
+_IDENT = re.compile(r'[\w$]')
+_WORD = re.compile(r'[\w$]+')
+# After these characters (or keywords) a '/' starts a regex literal rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'throw', 'new'}
+
+
+def _skip_quoted(source, i, quote):
+    """Return the index just past the string starting at ``i``."""
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == '\\' else 1
+    return i + 1
+
+
+def _skip_regex(source, i):
+    i += 1
+    in_class = False
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            break
+        i += 1
+    i += 1
+    while i < len(source) and source[i].isalpha():  # Flags
+        i += 1
+    return i
+
+
+def _skip_template(source, i):
+    """Scan template text from ``i``; return ``(index, True)`` when a ``${`` opens, else ``(index past the closing backtick, False)``."""
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+        elif c == '`':
+            return i + 1, False
+        elif c == '$' and source[i + 1:i + 2] == '{':
+            return i + 2, True
+        else:
+            i += 1
+    return i, False
+
+
+def minify_js(source):
+    """Conservative JS minifier: drops comments and indentation, keeps line breaks.
+
+    Keeping one newline wherever the source had one leaves automatic semicolon
+    insertion unchanged, so no parsing is needed beyond strings, template
+    literals, regex literals and comments.
+    """
+    out = []
+    last = ''          # Last emitted significant character
+    last_word = ''     # Last emitted identifier, to recognise `return /re/`
+    pending = None     # Whitespace seen since the last token: None, ' ' or '\n'
+    templates = []     # Open `${` nesting depth for each template literal we are inside
+    i, n = 0, len(source)
+
+    def emit(text):
+        nonlocal last
+        out.append(text)
+        last = text[-1]
+
+    while i < n:
+        c = source[i]
+        two = source[i:i + 2]
+        if c in ' \t\r\n\f\v':
+            pending = '\n' if c == '\n' or pending == '\n' else ' '
+            i += 1
+            continue
+        if two == '//':
+            while i < n and source[i] != '\n':
+                i += 1
+            continue
+        if two == '/*':
+            end = source.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            pending = '\n' if '\n' in source[i:end] or pending == '\n' else (pending or ' ')
+            i = end
+            continue
+
+        if pending == '\n' and out:
+            emit('\n')
+        elif pending == ' ' and (
+            (_IDENT.match(last) and _IDENT.match(c)) or (last in '+-' and c == last)
+        ):
+            emit(' ')
+        pending = None
+
+        if c in '"\'':
+            end = _skip_quoted(source, i, c)
+            emit(source[i:end])
+            i = end
+        elif c == '`' or (c == '}' and templates and templates[-1] == 0):
+            if c == '}':
+                templates.pop()
+            end, opened = _skip_template(source, i + 1)
+            emit(source[i:end])
+            if opened:
+                templates.append(0)
+            i = end
+        elif c == '/' and (last in _REGEX_PRECEDERS or last in ('', '\n') or last_word in _REGEX_KEYWORDS):
+            end = _skip_regex(source, i)
+            emit(source[i:end])
+            i = end
+        elif _IDENT.match(c):
+            match = _WORD.match(source, i)
+            last_word = match.group()
+            emit(last_word)
+            i = match.end()
+            continue
+        else:
+            if templates:
+                if c == '{':
+                    templates[-1] += 1
+                elif c == '}':
+                    templates[-1] -= 1
+            emit(c)
+            i += 1
+        last_word = ''
+    return ''.join(out).strip() + '\n'
+
+
+def bundle_source(static_folder, name):
+    parts = []
+    for path in BUNDLES[name]:
+        with open(os.path.join(static_folder, path), encoding='utf-8') as f:
+            parts.append(f.read())
+    # ';' guards against a script that ends without a semicolon
+    return ('\n' if name.endswith('.css') else '\n;\n').join(parts)
+
+
+def build_assets(static_folder):
+    """Build every bundle into ``static/dist``; return the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name in BUNDLES:
+        source = bundle_source(static_folder, name)
+        minified = (minify_css if name.endswith('.css') else minify_js)(source).encode('utf-8')
+        stem, ext = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha256(minified).hexdigest()[:12]}{ext}'
+        with open(os.path.join(dist, filename), 'wb') as f:
+            f.write(minified)
+        # mtime=0 keeps the .gz byte-identical between builds
+        with open(os.path.join(dist, filename + '.gz'), 'wb') as raw, \
+                gzip.GzipFile(filename=filename, fileobj=raw, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(minified)
+        manifest[name] = filename
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def init_assets(app):
+    """Register ``asset_url``, the asset routes and the ``build-assets`` command on ``app``."""
+    manifest = {} if app.config.get('ASSETS_DEBUG') else load_manifest(app.static_folder)
+
+    @app.template_global()
+    def asset_url(name):
+        if name in manifest:
+            return url_for('dist_asset', filename=manifest[name])
+        return url_for('source_asset', name=name)
+
+    @app.route('/static/dist/<path:filename>')
+    def dist_asset(filename):
+        directory = os.path.join(app.static_folder, DIST_DIR)
+        ext = os.path.splitext(filename)[1]
+        gz_path = os.path.join(directory, filename + '.gz')
+        if ext in MIMETYPES and 'gzip' in request.accept_encodings and os.path.isfile(gz_path):
+            response = send_from_directory(directory, filename + '.gz', mimetype=MIMETYPES[ext])
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = send_from_directory(directory, filename)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.route('/assets/<name>')
+    def source_asset(name):
+        if name not in BUNDLES:
+            abort(404)
+        ext = os.path.splitext(name)[1]
+        response = Response(bundle_source(app.static_folder, name), mimetype=MIMETYPES[ext])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Bundle, minify, fingerprint and gzip the CSS/JS bundles into static/dist."""
+        built = build_assets(app.static_folder)
+        for name, filename in sorted(built.items()):
+            print(f'{name} -> {DIST_DIR}/{filename}')
+        print(f'Built {len(built)} bundle(s); restart the app to serve them.')
@@ -0,0 +1,60 @@
+"""
+Banned users.
+
+Bans are stored in the ``user_ban`` table, so they survive restarts and apply
+to every worker. Each worker keeps the set of banned user ids in memory and
+trusts it for ``BAN_CACHE_TTL`` seconds; after that, one primary-key lookup of
+the ``bans`` counter in ``content_version`` tells whether the set must be
+reloaded. ``is_banned`` therefore costs a set lookup on almost every request,
+and a ban made on another worker takes effect within ``BAN_CACHE_TTL``.
+"""
+
+import threading
+import time
+
+from models import db, UserBan, ContentVersion
+
+BAN_VERSION = 'bans'
+BAN_CACHE_TTL = 5.0  # Seconds a worker trusts its cached ban list without checking the version
+
+_lock = threading.Lock()
+_cache = None  # (checked_at, version, frozenset of user ids)
+
+
+def _load():
+    global _cache
+    (version,) = ContentVersion.current(BAN_VERSION)
+    cache = _cache
+    if cache is not None and cache[1] == version:
+        banned = cache[2]
+    else:
+        banned = frozenset(db.session.scalars(db.select(UserBan.user_id)).all())
+    with _lock:
+        _cache = (time.monotonic(), version, banned)
+    return banned
+
+
+def banned_user_ids():
+    cache = _cache
+    if cache is not None and time.monotonic() - cache[0] < BAN_CACHE_TTL:
+        return cache[2]
+    return _load()
+
+
+def is_banned(user_id):
+    return user_id in banned_user_ids()
+
+
+def ban_user(user_id):
+    if db.session.get(UserBan, user_id) is None:
+        db.session.add(UserBan(user_id=user_id))
+    ContentVersion.bump(BAN_VERSION)
+    db.session.commit()
+    _load()  # This worker sees the change immediately
+
+
+def unban_user(user_id):
+    db.session.query(UserBan).filter_by(user_id=user_id).delete()
+    ContentVersion.bump(BAN_VERSION)
+    db.session.commit()
+    _load()
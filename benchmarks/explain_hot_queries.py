@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Print SQLite's EXPLAIN QUERY PLAN for the hot lookup queries.
+
+Without arguments a scratch database is built from the models and every
+query is explained twice: once with the secondary indexes dropped (the old
+schema) and once with them in place. With --database, the plans for that
+database are printed as-is.
+
+    python benchmarks/explain_hot_queries.py
+    python benchmarks/explain_hot_queries.py --database instance/users.db
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def hot_queries():
+    from sqlalchemy import select, or_, and_
+    from models import Customer, Cook, Menu, ShoppingCartItem, Order, OrderItem, DishReview, Friendship, Message
+
+    today = date.today()
+    return [
+        ("cook's menu for today",
+         select(Menu).where(Menu.date == today, Menu.cook_id == 1)),
+        ('cart line for a dish',
+         select(ShoppingCartItem).where(ShoppingCartItem.customer_id == 1, ShoppingCartItem.dish_id == 1)),
+        ('items of an order',
+         select(OrderItem).where(OrderItem.order_id == 1)),
+        ('order history page',
+         select(Order).where(Order.customer_id == 1).order_by(Order.date.desc(), Order.order_id.desc()).limit(21)),
+        ('reviews of a dish',
+         select(DishReview).where(DishReview.dish_id == 1).order_by(DishReview.created_at.desc())),
+        ('reviews of a cook',
+         select(DishReview).where(DishReview.cook_id == 1).order_by(DishReview.created_at.desc())),
+        ('conversation between two customers',
+         select(Message).where(or_(
+             and_(Message.sender_id == 1, Message.receiver_id == 2),
+             and_(Message.sender_id == 2, Message.receiver_id == 1)
+         )).order_by(Message.created_at)),
+        ('pending friend requests',
+         select(Friendship).where(Friendship.friend_id == 1, Friendship.status == 'Pending')),
+        ('customer by user',
+         select(Customer).where(Customer.user_id == 1)),
+        ('cook by user',
+         select(Cook).where(Cook.user_id == 1)),
+    ]
+
+
+def explain(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect)
+    params = tuple(
+        str(value) if isinstance(value, (date, datetime)) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def print_plans(conn, title):
+    print(f'== {title} ==')
+    for label, statement in hot_queries():
+        print(f'-- {label}')
+        for step in explain(conn, statement):
+            print(f'   {step}')
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='explain against an existing SQLite file instead of a scratch one')
+    args = parser.parse_args()
+
+    if args.database:
+        path = os.path.abspath(args.database)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix='parrot_explain_'), 'explain.db')
+    os.environ['PARROT_DATABASE_URI'] = 'sqlite:///' + path
+
+    from app import app
+    from models import db
+
+    with app.app_context():
+        if args.database:
+            with db.engine.connect() as conn:
+                print_plans(conn, args.database)
+            return
+
+        db.create_all()
+        indexes = [index for table in db.metadata.sorted_tables for index in table.indexes]
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+            print_plans(conn, 'before: primary keys and unique constraints only')
+            for index in indexes:
+                index.create(conn)
+            print_plans(conn, 'after: with hot lookup indexes')
+
+
+if __name__ == '__main__':
+    main()
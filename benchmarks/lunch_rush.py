@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Lunch-rush load test against a locally started server.
+
+Seeds a scratch SQLite database with customers, cooks, an administrator and
+today's menu, starts the app with ``run.py --prod`` (gunicorn) on it, and
+drives the real routes over HTTP from concurrent virtual users for a fixed
+duration:
+
+- customers (most users): log in, load /api/customer_menu, add dishes to the
+  cart, view it, submit the order and sometimes message another customer;
+- cooks: log in, load /api/cook_dashboard and republish their menu
+  (cook_dashboard POST);
+- administrators: log in and browse /api/admin_accounts and /admin_menu.
+
+Every visit starts with a fresh login. Latency percentiles, requests/sec and
+error rates per endpoint are printed and written to a JSON file that can be
+diffed between releases.
+
+    python benchmarks/lunch_rush.py --duration 30 --customers 40 --cooks 4 --admins 1
+    python benchmarks/lunch_rush.py --threads 16 --output rush-v2.json
+
+Without --output, results go to benchmarks/results/ (ignored by git), one
+file per run named after the time and git revision.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import date, datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'rush-password'
+CATEGORIES = ['Hot Dishes', 'Cold Dishes', 'Staple Food', 'Soup', 'Dessert', 'Drinks']
+STOCK = 1_000_000  # Large enough that nothing sells out; the test measures throughput, not stock-outs
+
+
+def seed(args, database):
+    """Create the scratch database; return the accounts each virtual user logs in with."""
+    os.environ['PARROT_DATABASE_URI'] = 'sqlite:///' + database
+
+    from werkzeug.security import generate_password_hash
+    from app import app
+    from models import db, User, Customer, Cook, Administrator, Dish, Menu
+
+    rng = random.Random(args.seed)
+    password_hash = generate_password_hash(PASSWORD)  # Hashing is slow; every account shares one hash
+    accounts = {'customer': [], 'cook': [], 'admin': []}
+
+    def add_user(name):
+        user = User(username=name, password=password_hash, email=f'{name}@rush.test', telephone='0')
+        db.session.add(user)
+        db.session.flush()
+        return user
+
+    with app.app_context():
+        db.create_all()
+        categories = CATEGORIES[:max(1, min(args.cooks, len(CATEGORIES)))]
+        for i in range(args.cooks):
+            user = add_user(f'rush_cook_{i}')
+            db.session.add(Cook(user_id=user.user_id, category=categories[i % len(categories)]))
+            accounts['cook'].append({'username': user.username})
+        db.session.flush()
+
+        # The first cook of each category puts every dish of that category on today's menu
+        owners = {cook.category: cook for cook in reversed(Cook.query.order_by(Cook.cook_id).all())}
+        for i in range(args.dishes):
+            category = categories[i % len(categories)]
+            dish = Dish(dish_name=f'rush dish {i}', category=category, price=f'{rng.randint(8, 40)}',
+                        description='Lunch rush dish')
+            db.session.add(dish)
+            db.session.flush()
+            if category in owners:
+                db.session.add(Menu(cook_id=owners[category].cook_id, dish_id=dish.dish_id,
+                                    date=date.today(), quantity=STOCK))
+
+        for i in range(args.admins):
+            user = add_user(f'rush_admin_{i}')
+            db.session.add(Administrator(user_id=user.user_id))
+            accounts['admin'].append({'username': user.username})
+
+        for i in range(args.accounts):
+            user = add_user(f'rush_customer_{i}')
+            customer = Customer(user_id=user.user_id)
+            db.session.add(customer)
+            db.session.flush()
+            accounts['customer'].append({'username': user.username, 'customer_id': customer.customer_id})
+        db.session.commit()
+        db.engine.dispose()
+    return accounts
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, database, log_path):
+    port = free_port()
+    env = dict(os.environ, PARROT_DATABASE_URI='sqlite:///' + database, PYTHONUNBUFFERED='1')
+    command = [sys.executable, 'run.py', '--prod', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--threads', str(args.threads), '--max-requests', '0']
+    log = open(log_path, 'w')
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'server exited with code {server.returncode}; see {log_path}')
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=1).close()
+            return server, base_url
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f'server did not start within 30s; see {log_path}')
+
+
+class Recorder:
+    def __init__(self, measure_from):
+        self.measure_from = measure_from  # Requests finishing earlier are warm-up and not recorded
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [(latency, ok, status)]
+
+    def add(self, endpoint, latency, ok, status):
+        if time.monotonic() < self.measure_from:
+            return
+        with self.lock:
+            self.samples[endpoint].append((latency, ok, status))
+
+
+class Client:
+    """One browser session: a cookie jar plus timing of every request."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.etags = {}
+
+    def request(self, endpoint, method, path, form=None, json_body=None, conditional=False):
+        headers = {}
+        data = None
+        if form is not None:
+            data = urllib.parse.urlencode(form, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        if conditional and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                status, body = response.status, response.read()
+                if conditional and response.headers.get('ETag'):
+                    self.etags[path] = response.headers['ETag']
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        except OSError:
+            status, body = 0, b''
+        latency = time.perf_counter() - started
+
+        payload = None
+        if body[:1] in (b'{', b'['):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                pass
+        ok = 200 <= status < 400 and not (isinstance(payload, dict) and payload.get('success') is False)
+        self.recorder.add(endpoint, latency, ok, status)
+        return status, payload
+
+    def login(self, username):
+        status, _ = self.request('POST /login', 'POST', '/login', form={'username': username, 'password': PASSWORD})
+        return status == 200
+
+
+def customer_visit(client, rng, account, accounts):
+    if not client.login(account['username']):
+        return
+    status, menu = client.request('GET /api/customer_menu', 'GET', '/api/customer_menu', conditional=True)
+    if status == 200:
+        client.menu = [dish['dish_id'] for cook in menu for dish in cook['dishes']]
+    dish_ids = getattr(client, 'menu', None)
+    if not dish_ids:
+        return
+    for dish_id in rng.sample(dish_ids, min(len(dish_ids), rng.randint(1, 3))):
+        client.request('POST /add_to_cart', 'POST', '/add_to_cart',
+                       json_body={'dish_id': dish_id, 'quantity': rng.randint(1, 2)})
+    client.request('GET /view_cart', 'GET', '/view_cart')
+    client.request('POST /submit_order', 'POST', '/submit_order')
+    if len(accounts['customer']) > 1 and rng.random() < 0.3:
+        friend = rng.choice([a for a in accounts['customer'] if a is not account])
+        client.request('POST /send_message', 'POST', '/send_message', json_body={
+            'sender_id': account['customer_id'], 'receiver_id': friend['customer_id'],
+            'content': 'Lunch at noon?'})
+
+
+def cook_visit(client, rng, account, accounts):
+    if not client.login(account['username']):
+        return
+    status, dishes = client.request('GET /api/cook_dashboard', 'GET', '/api/cook_dashboard', conditional=True)
+    if status == 200:
+        client.dishes = [dish['dish_id'] for dish in dishes]
+    dish_ids = getattr(client, 'dishes', None)
+    if dish_ids:
+        client.request('POST /cook_dashboard', 'POST', '/cook_dashboard', form={
+            'dish_ids[]': dish_ids, 'quantities[]': [STOCK - rng.randint(0, 100) for _ in dish_ids]})
+
+
+def admin_visit(client, rng, account, accounts):
+    if not client.login(account['username']):
+        return
+    client.request('GET /api/admin_accounts', 'GET', '/api/admin_accounts')
+    client.request('GET /admin_menu', 'GET', '/admin_menu')
+
+
+SCENARIOS = {'customer': customer_visit, 'cook': cook_visit, 'admin': admin_visit}
+
+
+def virtual_user(role, index, args, base_url, accounts, recorder, deadline):
+    rng = random.Random(f'{args.seed}-{role}-{index}')
+    # Cooks and admins keep their own account; customers arrive as a stream of different people,
+    # each session drawing from its own slice so two sessions never share a cart
+    if role == 'customer':
+        pool = accounts['customer'][index::args.customers]
+    else:
+        pool = [accounts[role][index % len(accounts[role])]]
+    client = None
+    while time.monotonic() < deadline:
+        account = rng.choice(pool)
+        if client is None or role == 'customer':
+            client = Client(base_url, recorder)
+        SCENARIOS[role](client, rng, account, accounts)
+        if args.think_ms:
+            time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for latency, _, _ in samples)
+    errors = sum(1 for _, ok, _ in samples if not ok)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'rps': round(len(samples) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'status_codes': dict(sorted(Counter(str(status) for _, _, status in samples).items())),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load after warm-up')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of load before measuring')
+    parser.add_argument('--customers', type=int, default=40, help='concurrent customer sessions')
+    parser.add_argument('--cooks', type=int, default=4, help='concurrent cook sessions (one category each)')
+    parser.add_argument('--admins', type=int, default=1, help='concurrent administrator sessions')
+    parser.add_argument('--accounts', type=int, default=500, help='customer accounts the sessions log in as')
+    parser.add_argument('--dishes', type=int, default=60)
+    parser.add_argument('--think-ms', type=float, default=50, help='mean pause between visits')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='gunicorn worker processes (run.py keeps 1 while the in-process event broker is used)')
+    parser.add_argument('--threads', type=int, default=8, help='threads per worker')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON results file (default: a new file in benchmarks/results/)')
+    args = parser.parse_args()
+    if args.cooks < 1 or args.accounts < args.customers:
+        parser.error('--cooks must be at least 1 and --accounts at least --customers')
+
+    workdir = tempfile.mkdtemp(prefix='parrot_rush_')
+    database = os.path.join(workdir, 'rush.db')
+    accounts = seed(args, database)
+    server, base_url = start_server(args, database, os.path.join(workdir, 'server.log'))
+
+    try:
+        roles = [('customer', i) for i in range(args.customers)] + [('cook', i) for i in range(args.cooks)]
+        roles += [('admin', i) for i in range(args.admins if accounts['admin'] else 0)]
+
+        measure_from = time.monotonic() + args.warmup
+        deadline = measure_from + args.duration
+        recorder = Recorder(measure_from)
+
+        threads = [threading.Thread(target=virtual_user, daemon=True,
+                                    args=(role, i, args, base_url, accounts, recorder, deadline))
+                   for role, i in roles]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - measure_from
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    report = {
+        'run': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'duration_s': round(elapsed, 2),
+            'warmup_s': args.warmup,
+            'sessions': {'customer': args.customers, 'cook': args.cooks, 'admin': args.admins},
+            'customer_accounts': args.accounts,
+            'dishes': args.dishes,
+            'think_ms': args.think_ms,
+            'server': {'workers': args.workers, 'threads': args.threads},
+            'seed': args.seed,
+        },
+        'total': summarize(all_samples, elapsed),
+        'endpoints': {name: summarize(samples, elapsed) for name, samples in sorted(recorder.samples.items())},
+    }
+    if args.output is None:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        args.output = os.path.join(RESULTS_DIR, f"lunch_rush_{stamp}_{report['run']['git_revision'] or 'norev'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+
+    print(f'{"endpoint":<26}{"requests":>9}{"rps":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"errors":>9}')
+    for name, stats in list(report['endpoints'].items()) + [('TOTAL', report['total'])]:
+        print(f'{name:<26}{stats["requests"]:>9}{stats["rps"]:>9.1f}{stats["p50_ms"]:>9.1f}'
+              f'{stats["p95_ms"]:>9.1f}{stats["p99_ms"]:>9.1f}{stats["error_rate"]:>8.1%}')
+    print(f'results written to {args.output} (server log and database in {workdir})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark cook menu publishing (cook_dashboard POST) for large menus.
+
+Publishes menus of increasing size against a scratch SQLite database and
+reports the SQL statements and wall time per publish, next to the previous
+row-by-row implementation (reproduced below) for comparison.
+
+    python benchmarks/menu_publish_bench.py --sizes 40 200 1000 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_publish(db, Menu, cook_id, dish_ids, quantities):
+    """The former cook_dashboard POST body: delete, then one lookup and insert per dish."""
+    today = date.today()
+    Menu.query.filter_by(cook_id=cook_id, date=today).delete()
+    for dish_id, quantity in zip(dish_ids, quantities):
+        quantity = int(quantity)
+        if quantity <= 0:
+            continue
+        existing_item = Menu.query.filter_by(dish_id=int(dish_id), date=today).first()
+        if existing_item and existing_item.cook_id == cook_id:
+            existing_item.quantity = quantity
+        elif not existing_item:
+            db.session.add(Menu(cook_id=cook_id, dish_id=int(dish_id), date=today, quantity=quantity))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[40, 200, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='parrot_menu_bench_')
+    os.environ['PARROT_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from sqlalchemy import event
+    from app import app
+    from models import db, User, Cook, Dish, Menu
+
+    statements = [0]
+
+    with app.app_context():
+        db.create_all()
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+        user = User(username='bench_cook', password='-', email='cook@bench.test', telephone='0')
+        db.session.add(user)
+        db.session.flush()
+        cook = Cook(user_id=user.user_id, category='Hot Dishes')
+        db.session.add(cook)
+        db.session.flush()
+        db.session.add_all([
+            Dish(dish_name=f'dish {i}', category='Hot Dishes', price='10', description='')
+            for i in range(max(args.sizes))
+        ])
+        db.session.commit()
+        cook_id, cook_session = cook.cook_id, {'username': user.username, 'role': 'Cook', 'user_id': user.user_id}
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = cook_session
+        sess['user_id'] = cook_session['user_id']
+
+    print(f'{"dishes":>7} {"impl":>8} {"statements":>11} {"ms/publish":>11}')
+    for size in args.sizes:
+        dish_ids = [str(i) for i in range(1, size + 1)]
+        for impl in ('legacy', 'current'):
+            elapsed = 0.0
+            statements[0] = 0
+            for run in range(args.repeat):
+                # Alternate quantities so every publish really changes rows
+                quantities = [str(5 + (run + i) % 3) for i in range(size)]
+                started = time.perf_counter()
+                if impl == 'current':
+                    response = client.post('/cook_dashboard', data={'dish_ids[]': dish_ids, 'quantities[]': quantities})
+                    assert response.status_code == 200, response.get_json()
+                else:
+                    with app.app_context():
+                        legacy_publish(db, Menu, cook_id, dish_ids, quantities)
+                elapsed += time.perf_counter() - started
+            # The current implementation's count includes the route's session/cook lookup
+            print(f'{size:>7} {impl:>8} {statements[0] / args.repeat:>11.0f} {elapsed / args.repeat * 1000:>11.1f}')
+
+    with app.app_context():
+        published = Menu.query.filter_by(cook_id=cook_id, date=date.today()).count()
+    print(f'menu rows after last publish: {published}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Order admission benchmark: per-request transactions vs micro-batches.
+
+Fills many customers' carts with more demand than today's menu can supply,
+then submits all orders at once from a pool of threads, once with
+ORDER_ADMISSION='direct' (one transaction per request) and once with
+'batched' (one transaction per micro-batch), on the same scratch SQLite
+database reset between runs. Reports throughput, p50/p95/p99 latency and
+outcomes per mode, and verifies that no dish was oversold.
+
+    python benchmarks/order_admission_bench.py --customers 400 --threads 32 --window-ms 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--dishes', type=int, default=10)
+    parser.add_argument('--stock', type=int, default=200, help='initial quantity of each dish')
+    parser.add_argument('--window-ms', type=float, default=5, help='ORDER_BATCH_WINDOW_MS for the batched run')
+    parser.add_argument('--max-batch', type=int, default=100, help='ORDER_BATCH_MAX for the batched run')
+    parser.add_argument('--busy-timeout-ms', type=int, default=5000, help='SQLITE_BUSY_TIMEOUT_MS')
+    parser.add_argument('--modes', default='direct,batched')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='parrot_admission_')
+    os.environ['PARROT_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'admission.db')
+
+    from app import app
+    from models import db, User, Customer, Cook, Dish, Menu, ShoppingCartItem, Order, OrderItem, \
+        DishDailySales, CookDailySales, CategoryDailySales
+
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = args.busy_timeout_ms
+    app.config['ORDER_BATCH_WINDOW_MS'] = args.window_ms
+    app.config['ORDER_BATCH_MAX'] = args.max_batch
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.create_all()
+        cook_user = User(username='bench_cook', password='-', email='cook@bench.test', telephone='0')
+        db.session.add(cook_user)
+        db.session.flush()
+        cook = Cook(user_id=cook_user.user_id, category='Hot Dishes')
+        db.session.add(cook)
+        db.session.flush()
+
+        dish_ids = []
+        for i in range(args.dishes):
+            dish = Dish(dish_name=f'dish {i}', category='Hot Dishes', price='10', description='')
+            db.session.add(dish)
+            db.session.flush()
+            db.session.add(Menu(cook_id=cook.cook_id, dish_id=dish.dish_id, date=date.today(), quantity=args.stock))
+            dish_ids.append(dish.dish_id)
+
+        sessions = []
+        carts = []
+        for i in range(args.customers):
+            user = User(username=f'bench_{i}', password='-', email=f'{i}@bench.test', telephone='0')
+            db.session.add(user)
+            db.session.flush()
+            customer = Customer(user_id=user.user_id)
+            db.session.add(customer)
+            db.session.flush()
+            for dish_id in rng.sample(dish_ids, rng.randint(1, min(3, len(dish_ids)))):
+                carts.append({'customer_id': customer.customer_id, 'dish_id': dish_id, 'quantity': rng.randint(1, 3)})
+            sessions.append({'username': user.username, 'role': 'Customer', 'user_id': user.user_id})
+        db.session.commit()
+
+    def reset():
+        with app.app_context():
+            for model in (OrderItem, Order, ShoppingCartItem, DishDailySales, CookDailySales, CategoryDailySales):
+                db.session.query(model).delete()
+            Menu.query.update({Menu.quantity: args.stock})
+            db.session.execute(ShoppingCartItem.__table__.insert(), carts)
+            db.session.commit()
+
+    def submit(user):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user'] = user
+            sess['user_id'] = user['user_id']
+        started = time.perf_counter()
+        response = client.post('/submit_order')
+        return response.status_code, response.get_json(), time.perf_counter() - started
+
+    def check_stock():
+        oversold = []
+        with app.app_context():
+            for dish_id in dish_ids:
+                remaining = Menu.query.filter_by(dish_id=dish_id, date=date.today()).first().quantity
+                sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter(
+                    OrderItem.dish_id == dish_id
+                ).scalar()
+                if remaining < 0 or sold + remaining != args.stock:
+                    oversold.append((dish_id, sold, remaining))
+        return oversold
+
+    print(f'customers={args.customers} threads={args.threads} dishes={args.dishes} stock={args.stock} '
+          f'window={args.window_ms}ms max_batch={args.max_batch}')
+    report = {}
+    failed = False
+    for mode in args.modes.split(','):
+        reset()
+        app.config['ORDER_ADMISSION'] = mode
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(submit, sessions))
+        elapsed = time.perf_counter() - started
+
+        outcomes = Counter()
+        for status, body, _ in results:
+            if body and body.get('success'):
+                outcomes['accepted'] += 1
+            elif body and 'insufficient' in body.get('message', ''):
+                outcomes['sold_out'] += 1
+            elif body and 'locked' in body.get('message', ''):
+                outcomes['locked'] += 1
+            else:
+                outcomes['error'] += 1
+        latencies = sorted(latency for _, _, latency in results)
+        oversold = check_stock()
+        failed = failed or bool(oversold)
+
+        report[mode] = {
+            'elapsed_s': round(elapsed, 3),
+            'orders_per_s': round(len(results) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+            'outcomes': dict(outcomes),
+            'oversold': oversold,
+        }
+        r = report[mode]
+        print(f'{mode:8} {r["orders_per_s"]:8.1f} orders/s  p50={r["p50_ms"]:.1f}ms  p95={r["p95_ms"]:.1f}ms  '
+              f'p99={r["p99_ms"]:.1f}ms  max={r["max_ms"]:.1f}ms  '
+              + ' '.join(f'{key}={value}' for key, value in sorted(outcomes.items())))
+        if oversold:
+            print(f'{mode:8} OVERSOLD (dish_id, sold, remaining): {oversold}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': report}, f, indent=2)
+    if failed:
+        sys.exit(1)
+    print('no oversell: sold + remaining == stock for every dish in every mode')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Concurrent submit_order stress test.
+
+Fills many customers' carts with more demand than today's menu can supply,
+then submits all orders at once from a pool of threads against a scratch
+SQLite database. Verifies that no dish was oversold and reports orders/sec.
+
+    python benchmarks/submit_order_stress.py --customers 400 --threads 16
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--dishes', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=150, help='initial quantity of each dish')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='parrot_stress_')
+    os.environ['PARROT_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'stress.db')
+
+    from app import app
+    from models import db, User, Customer, Cook, Dish, Menu, ShoppingCartItem, OrderItem
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.create_all()
+        cook_user = User(username='stress_cook', password='-', email='cook@stress.test', telephone='0')
+        db.session.add(cook_user)
+        db.session.flush()
+        cook = Cook(user_id=cook_user.user_id, category='Hot Dishes')
+        db.session.add(cook)
+        db.session.flush()
+
+        dish_ids = []
+        for i in range(args.dishes):
+            dish = Dish(dish_name=f'dish {i}', category='Hot Dishes', price='10', description='')
+            db.session.add(dish)
+            db.session.flush()
+            db.session.add(Menu(cook_id=cook.cook_id, dish_id=dish.dish_id, date=date.today(), quantity=args.stock))
+            dish_ids.append(dish.dish_id)
+
+        sessions = []
+        for i in range(args.customers):
+            user = User(username=f'stress_{i}', password='-', email=f'{i}@stress.test', telephone='0')
+            db.session.add(user)
+            db.session.flush()
+            customer = Customer(user_id=user.user_id)
+            db.session.add(customer)
+            db.session.flush()
+            for dish_id in rng.sample(dish_ids, rng.randint(1, min(3, len(dish_ids)))):
+                db.session.add(ShoppingCartItem(customer_id=customer.customer_id, dish_id=dish_id,
+                                                quantity=rng.randint(1, 3)))
+            sessions.append({'username': user.username, 'role': 'Customer', 'user_id': user.user_id})
+        db.session.commit()
+
+    def submit(user):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user'] = user
+            sess['user_id'] = user['user_id']
+        started = time.perf_counter()
+        response = client.post('/submit_order')
+        return response.status_code, response.get_json(), time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(submit, sessions))
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter()
+    for status, body, _ in results:
+        if body and body.get('success'):
+            outcomes['accepted'] += 1
+        elif body and 'insufficient' in body.get('message', ''):
+            outcomes['sold out'] += 1
+        else:
+            outcomes['error'] += 1
+    latencies = sorted(latency for _, _, latency in results)
+
+    oversold = []
+    with app.app_context():
+        for dish_id in dish_ids:
+            remaining = Menu.query.filter_by(dish_id=dish_id, date=date.today()).first().quantity
+            sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter(
+                OrderItem.dish_id == dish_id
+            ).scalar()
+            if remaining < 0 or sold + remaining != args.stock:
+                oversold.append((dish_id, sold, remaining))
+
+    print(f'customers={args.customers} threads={args.threads} dishes={args.dishes} stock={args.stock}')
+    print(f'accepted={outcomes["accepted"]} sold_out={outcomes["sold out"]} errors={outcomes["error"]}')
+    print(f'elapsed={elapsed:.2f}s  throughput={len(results) / elapsed:.1f} orders/s  '
+          f'p50={latencies[len(latencies) // 2] * 1000:.1f}ms  p99={latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms')
+    if oversold:
+        print('OVERSOLD (dish_id, sold, remaining):', oversold)
+        sys.exit(1)
+    print('no oversell: sold + remaining == stock for every dish')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Closed (deleted) accounts.
+
+``delete_account`` disables a user and later purges the user row, but a
+session opened before that still carries the user's ids. Each closure is
+recorded in the ``closed_account`` table, which outlives the purge, and
+``is_closed_session`` rejects sessions of a closed account that were opened
+before it was closed (a later account that reuses the user id is not
+affected). As with bans (see ban_registry.py), each worker keeps the closures
+in memory and trusts them for ``CLOSED_CACHE_TTL`` seconds before checking the
+``accounts`` counter in ``content_version``.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+from models import db, ClosedAccount, ContentVersion
+
+ACCOUNTS_VERSION = 'accounts'
+CLOSED_CACHE_TTL = 5.0  # Seconds a worker trusts its cached closures without checking the version
+
+_lock = threading.Lock()
+_cache = None  # (checked_at, version, {user_id: closed_at as a Unix timestamp})
+
+
+def _load():
+    global _cache
+    (version,) = ContentVersion.current(ACCOUNTS_VERSION)
+    cache = _cache
+    if cache is not None and cache[1] == version:
+        closed = cache[2]
+    else:
+        closed = {
+            user_id: closed_at.replace(tzinfo=timezone.utc).timestamp()
+            for user_id, closed_at in db.session.query(ClosedAccount.user_id, ClosedAccount.closed_at)
+        }
+    with _lock:
+        _cache = (time.monotonic(), version, closed)
+    return closed
+
+
+def closed_accounts():
+    cache = _cache
+    if cache is not None and time.monotonic() - cache[0] < CLOSED_CACHE_TTL:
+        return cache[2]
+    return _load()
+
+
+def is_closed_session(user_id, login_at):
+    """Whether a session of ``user_id`` opened at ``login_at`` (Unix time, None if unknown) belongs to a closed account."""
+    closed_at = closed_accounts().get(user_id)
+    return closed_at is not None and (login_at is None or login_at <= closed_at)
+
+
+def close_account(user_id):
+    """Record the closure in the current transaction; the caller commits, then calls ``refresh``."""
+    closure = db.session.get(ClosedAccount, user_id)
+    if closure is None:
+        db.session.add(ClosedAccount(user_id=user_id, closed_at=datetime.utcnow()))
+    else:
+        closure.closed_at = datetime.utcnow()
+    ContentVersion.bump(ACCOUNTS_VERSION)
+
+
+def refresh():
+    _load()  # This worker sees the change immediately
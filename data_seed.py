@@ -0,0 +1,269 @@
+"""
+Synthetic data for benchmarking (``flask seed``).
+
+Generates users of every role, dishes per category, a daily menu history,
+orders whose dishes follow a Zipf popularity, reviews with chef replies,
+friendships, cart items and messages with their conversation rows. Primary
+keys are assigned here (after the current maximum of each table), so rows
+reference each other without reading anything back, and every table is
+written with ``executemany`` in batches of ``batch_size`` rows, one
+transaction per batch.
+
+The same ``seed`` on the same starting database produces the same data.
+Every account's password is ``SEED_PASSWORD``.
+"""
+
+import itertools
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from models import (
+    db, User, Customer, Cook, Administrator, Dish, Menu, ShoppingCartItem, Order, OrderItem,
+    DishReview, ChefReply, Friendship, Message, Conversation
+)
+from dish_search import rebuild_dish_index
+from menu_cache import bump_menu_version, bump_dish_version
+from sales_rollup import rebuild_sales_rollups
+
+SEED_PASSWORD = 'password123'
+CATEGORIES = ['Desserts', 'Fast Food', 'Beverages', 'Hot Dishes', 'Vegetarian']
+DISH_WORDS = ['Spicy', 'Crispy', 'Braised', 'Steamed', 'Sweet', 'Sour', 'Grilled', 'Golden', 'Smoked', 'Fresh']
+DISH_NOUNS = {
+    'Desserts': ['Pudding', 'Cake', 'Tart', 'Mochi', 'Sundae'],
+    'Fast Food': ['Burger', 'Wrap', 'Fries', 'Nuggets', 'Hot Dog'],
+    'Beverages': ['Tea', 'Latte', 'Smoothie', 'Lemonade', 'Soy Milk'],
+    'Hot Dishes': ['Pork', 'Chicken', 'Tofu', 'Beef', 'Noodles'],
+    'Vegetarian': ['Salad', 'Greens', 'Mushrooms', 'Eggplant', 'Bean Curd'],
+}
+REVIEW_TEXTS = ['Delicious!', 'A bit too salty.', 'Great portion for the price.', 'Would order again.',
+                'Arrived cold.', 'Best thing on the menu today.', 'Not my favourite.', 'Perfectly cooked.']
+REPLY_TEXTS = ['Thank you!', 'Thanks for the feedback, we will adjust the seasoning.', 'Glad you enjoyed it!',
+               'Sorry about that, please try it again.']
+MESSAGE_TEXTS = ['Lunch today?', 'Have you tried the new dessert?', 'See you at the canteen.', 'Sure!',
+                 'The noodles are great today.', 'Running late, order for me?', 'Thanks!', 'OK']
+LUNCH_START, LUNCH_HOURS = 11, 3  # Orders are placed between 11:00 and 14:00
+
+
+class Loader:
+    """Batched ``executemany`` inserts with progress counts."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.counts = {}
+
+    def insert(self, model, rows):
+        """Insert the dicts from iterable ``rows`` into ``model``'s table, committing every batch."""
+        table = model.__table__
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(batch)
+
+
+def next_id(column):
+    return (db.session.query(db.func.max(column)).scalar() or 0) + 1
+
+
+def zipf_weights(n, exponent, rng):
+    """Zipf weights for ``n`` items, with ranks shuffled so popularity is not id order."""
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return [1.0 / rank ** exponent for rank in ranks]
+
+
+def seed_database(customers=10000, cooks=30, admins=3, dishes=300, days=60, orders=150000,
+                  messages=300000, friends_per_customer=8, review_rate=0.1, reply_rate=0.4,
+                  zipf_exponent=1.1, batch_size=10000, seed=1, log=print):
+    """Bulk-load synthetic data; return ``{table name: rows inserted}``."""
+    rng = random.Random(seed)
+    loader = Loader(batch_size)
+    started = time.perf_counter()
+    today = date.today()
+    first_day = today - timedelta(days=days - 1)
+    day_starts = [datetime.combine(first_day + timedelta(days=i), datetime.min.time()) for i in range(days)]
+
+    def step(name):
+        log(f'{name}... ({time.perf_counter() - started:.1f}s)')
+
+    # Users and roles
+    step('users')
+    user_id, customer_id = next_id(User.user_id), next_id(Customer.customer_id)
+    cook_id, admin_id = next_id(Cook.cook_id), next_id(Administrator.admin_id)
+    password = generate_password_hash(SEED_PASSWORD)  # Hashing is slow; every account shares one hash
+    roles = [('customer', customers), ('cook', cooks), ('admin', admins)]
+    users = list(zip((role for role, count in roles for _ in range(count)), itertools.count(user_id)))
+    loader.insert(User, ({
+        'user_id': uid, 'username': f'{role}_{uid}', 'password': password, 'email': f'{role}_{uid}@seed.test',
+        'telephone': f'1{uid:010d}', 'introduction': None, 'is_disabled': False,
+    } for role, uid in users))
+    customer_ids = list(range(customer_id, customer_id + customers))
+    cook_ids = list(range(cook_id, cook_id + cooks))
+    cook_categories = {cid: CATEGORIES[i % len(CATEGORIES)] for i, cid in enumerate(cook_ids)}
+    role_users = {role: [uid for r, uid in users if r == role] for role, _ in roles}
+    loader.insert(Customer, ({'customer_id': cid, 'user_id': uid}
+                             for cid, uid in zip(customer_ids, role_users['customer'])))
+    loader.insert(Cook, ({'cook_id': cid, 'user_id': uid, 'category': cook_categories[cid]}
+                         for cid, uid in zip(cook_ids, role_users['cook'])))
+    loader.insert(Administrator, ({'admin_id': admin_id + i, 'user_id': uid}
+                                  for i, uid in enumerate(role_users['admin'])))
+
+    # Dishes, evenly split over the categories
+    step('dishes')
+    dish_id = next_id(Dish.dish_id)
+    dish_rows = []
+    for i in range(dishes):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        dish_rows.append({
+            'dish_id': dish_id + i, 'category': category, 'price_cents': rng.randrange(600, 4550, 50),
+            'dish_name': f'{rng.choice(DISH_WORDS)} {rng.choice(DISH_NOUNS[category])} #{dish_id + i}',
+            'description': f'House {category.lower()} made fresh every day.', 'image_url': None,
+        })
+    loader.insert(Dish, dish_rows)
+    prices = {row['dish_id']: row['price_cents'] for row in dish_rows}
+    popularity = dict(zip((row['dish_id'] for row in dish_rows), zipf_weights(dishes, zipf_exponent, rng)))
+
+    # Daily menus: each day a cook of the dish's category offers about two thirds of the dishes
+    step('menus')
+    cooks_by_category = {}
+    for cid, category in cook_categories.items():
+        cooks_by_category.setdefault(category, []).append(cid)
+    daily_menus = []  # Per day: [(dish_id, cook_id)]
+    menu_rows = []
+    for day in range(days):
+        offered = [
+            (row['dish_id'], rng.choice(cooks_by_category[row['category']]))
+            for row in dish_rows if row['category'] in cooks_by_category and rng.random() < 0.67
+        ]
+        daily_menus.append(offered)
+        menu_rows.extend({
+            'cook_id': cid, 'dish_id': did, 'date': first_day + timedelta(days=day),
+            'quantity': rng.randint(20, 200) if day == days - 1 else rng.randint(0, 20)
+        } for did, cid in offered)
+    loader.insert(Menu, menu_rows)
+
+    # Orders and items; a dish's share of orders follows its Zipf weight
+    step('orders')
+    order_id, item_id = next_id(Order.order_id), next_id(OrderItem.order_item_id)
+    # Cumulative popularity of the dishes offered each day, for bisect sampling
+    menu_weights = [list(itertools.accumulate(popularity[did] for did, _ in offered)) for offered in daily_menus]
+
+    order_rows, item_rows, reviewed = [], [], []
+    active_days = [day for day in range(days) if daily_menus[day]]
+    for n in range(orders if active_days else 0):
+        day = rng.choice(active_days)
+        offered, cum = daily_menus[day], menu_weights[day]
+        placed_at = day_starts[day] + timedelta(seconds=rng.randrange(LUNCH_START * 3600, (LUNCH_START + LUNCH_HOURS) * 3600))
+        oid = order_id + n
+        customer = rng.choice(customer_ids)
+        total = 0
+        for did, cid in {offered[bisect(cum, rng.random() * cum[-1])] for _ in range(rng.randint(1, 4))}:
+            quantity = rng.randint(1, 3)
+            total += prices[did] * quantity
+            item_rows.append({'order_item_id': item_id, 'order_id': oid, 'dish_id': did, 'cook_id': cid,
+                              'quantity': quantity, 'unit_price_cents': prices[did]})
+            if rng.random() < review_rate:
+                reviewed.append((item_id, customer, cid, did, placed_at))
+            item_id += 1
+        order_rows.append({'order_id': oid, 'customer_id': customer, 'date': placed_at, 'total_cents': total})
+        if len(order_rows) >= batch_size:
+            loader.insert(Order, order_rows)
+            loader.insert(OrderItem, item_rows)
+            order_rows, item_rows = [], []
+    loader.insert(Order, order_rows)
+    loader.insert(OrderItem, item_rows)
+
+    # Reviews and chef replies
+    step('reviews')
+    review_id = next_id(DishReview.review_id)
+    replies = []
+    review_rows = []
+    for n, (oiid, customer, cid, did, placed_at) in enumerate(reviewed):
+        created_at = placed_at + timedelta(hours=rng.randint(1, 48))
+        review_rows.append({'review_id': review_id + n, 'order_item_id': oiid, 'customer_id': customer,
+                            'cook_id': cid, 'dish_id': did, 'comment_text': rng.choice(REVIEW_TEXTS),
+                            'created_at': created_at})
+        if rng.random() < reply_rate:
+            replies.append({'review_id': review_id + n, 'cook_id': cid, 'reply_text': rng.choice(REPLY_TEXTS),
+                            'created_at': created_at + timedelta(hours=rng.randint(1, 24))})
+    loader.insert(DishReview, review_rows)
+    loader.insert(ChefReply, replies)
+
+    # Friendships: mostly accepted, some pending; each unordered pair at most once
+    step('friendships')
+    pairs = set()
+    friendship_rows = []
+    if customers > 1:
+        for customer in customer_ids:
+            for _ in range(rng.randint(0, 2 * friends_per_customer) // 2):
+                friend = rng.choice(customer_ids)
+                pair = (min(customer, friend), max(customer, friend))
+                if friend == customer or pair in pairs:
+                    continue
+                pairs.add(pair)
+                friendship_rows.append({
+                    'customer_id': customer, 'friend_id': friend,
+                    'status': 'Accepted' if rng.random() < 0.85 else 'Pending',
+                    'created_at': day_starts[0] + timedelta(seconds=rng.randrange(days * 86400)),
+                })
+    loader.insert(Friendship, friendship_rows)
+
+    # Messages between friends in time order, and one conversation row per pair that talked
+    step('messages')
+    accepted = [(row['customer_id'], row['friend_id']) for row in friendship_rows if row['status'] == 'Accepted']
+    conversations = {}
+    if accepted and messages:
+        message_id = next_id(Message.message_id)
+        span = days * 86400
+        talk_weights = list(itertools.accumulate(zipf_weights(len(accepted), zipf_exponent, rng)))  # A few pairs chat a lot
+        unread_from = span - 86400  # Messages of the last day are still unread
+
+        def message_rows():
+            for n, second in enumerate(sorted(rng.randrange(span) for _ in range(messages))):
+                a, b = accepted[bisect(talk_weights, rng.random() * talk_weights[-1])]
+                sender, receiver = (a, b) if rng.random() < 0.5 else (b, a)
+                content = rng.choice(MESSAGE_TEXTS)
+                created_at = day_starts[0] + timedelta(seconds=second)
+                is_read = second < unread_from
+                low, high = min(a, b), max(a, b)
+                conversation = conversations.setdefault((low, high), [None, None, None, 0, 0])
+                conversation[:3] = message_id + n, content, created_at
+                if not is_read:
+                    conversation[3 if receiver == low else 4] += 1
+                yield {'message_id': message_id + n, 'sender_id': sender, 'receiver_id': receiver,
+                       'content': content, 'is_read': is_read, 'created_at': created_at}
+
+        loader.insert(Message, message_rows())
+    loader.insert(Conversation, ({
+        'customer_low_id': low, 'customer_high_id': high, 'last_message_id': last_id,
+        'last_message_preview': content[:50] + ('...' if len(content) > 50 else ''), 'last_message_at': created_at,
+        'low_unread_count': low_unread, 'high_unread_count': high_unread,
+    } for (low, high), (last_id, content, created_at, low_unread, high_unread) in conversations.items()))
+
+    # A few customers have something in their cart from today's menu
+    todays_dishes = [did for did, _ in daily_menus[-1]] if daily_menus else []
+    if todays_dishes:
+        loader.insert(ShoppingCartItem, (
+            {'customer_id': customer, 'dish_id': did, 'quantity': rng.randint(1, 2)}
+            for customer in customer_ids if rng.random() < 0.05
+            for did in rng.sample(todays_dishes, min(len(todays_dishes), rng.randint(1, 3)))
+        ))
+
+    step('sales rollups')
+    loader.counts.update(rebuild_sales_rollups(day_starts[0].date() if orders else None))
+
+    # Search index and cache counters, so running servers pick up the new menu and dishes
+    step('search index')
+    rebuild_dish_index()
+    bump_menu_version()
+    bump_dish_version()
+    db.session.commit()
+    log(f'done ({time.perf_counter() - started:.1f}s)')
+    return loader.counts
@@ -0,0 +1,138 @@
+"""
+Full-text dish search.
+
+Dishes are indexed in an SQLite FTS5 table (``dish_fts``, rowid = dish_id)
+over name, description and category, ranked with bm25. The table is part of
+the schema: migration c6a1e8f0d2b4 creates and fills it, and so does
+``db.create_all()`` (after the ``dish`` table). ``add_dish``, ``update_dish``
+and ``delete_dish`` keep it in sync inside their own transactions. Where the
+table is missing (SQLite built without FTS5) every call falls back to LIKE
+matching with a simple column-weighted score, so search keeps working, only
+slower.
+"""
+
+import re
+from datetime import date
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Dish, Menu
+
+FTS_TABLE = 'dish_fts'
+# bm25 column weights, in column order: dish_name, description, category
+NAME_WEIGHT, DESCRIPTION_WEIGHT, CATEGORY_WEIGHT = 10.0, 1.0, 4.0
+
+CREATE_FTS_TABLE = f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(dish_name, description, category)'
+FILL_FTS_TABLE = (
+    f'INSERT INTO {FTS_TABLE} (rowid, dish_name, description, category) '
+    f"SELECT dish_id, dish_name, coalesce(description, ''), category FROM dish"
+)
+
+_fts_available = None  # Unknown until the first call
+
+
+def search_tokens(query):
+    return re.findall(r'\w+', query or '')
+
+
+@event.listens_for(Dish.__table__, 'after_create')
+def _create_fts_table(target, connection, **kw):
+    # db.create_all() builds the same schema as the migrations, index table included
+    if connection.dialect.name != 'sqlite':
+        return
+    try:
+        connection.execute(text(CREATE_FTS_TABLE))
+    except OperationalError:
+        pass  # SQLite compiled without FTS5
+
+
+def dish_index_available():
+    """Whether the FTS table exists; checked once per process, the schema only changes on migration."""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+        ).first() is not None
+    return _fts_available
+
+
+def rebuild_dish_index():
+    """Re-index every dish, e.g. after bulk-loading dishes outside the routes."""
+    if not dish_index_available():
+        return False
+    db.session.execute(text(f'DELETE FROM {FTS_TABLE}'))
+    db.session.execute(text(FILL_FTS_TABLE))
+    return True
+
+
+def index_dish(dish):
+    """Add or refresh one dish in the index; the caller commits."""
+    if not dish_index_available():
+        return
+    db.session.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :dish_id'), {'dish_id': dish.dish_id})
+    db.session.execute(text(
+        f'INSERT INTO {FTS_TABLE} (rowid, dish_name, description, category) '
+        'VALUES (:dish_id, :dish_name, :description, :category)'
+    ), {
+        'dish_id': dish.dish_id,
+        'dish_name': dish.dish_name,
+        'description': dish.description or '',
+        'category': dish.category
+    })
+
+
+def unindex_dish(dish_id):
+    """Remove one dish from the index; the caller commits."""
+    if not dish_index_available():
+        return
+    db.session.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :dish_id'), {'dish_id': dish_id})
+
+
+def _fts_search(tokens, limit, offset, today_only):
+    # Every token must match, each as a quoted prefix so user input cannot inject FTS syntax
+    match = ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+    menu_join = 'JOIN menu ON menu.dish_id = dish.dish_id AND menu.date = :today' if today_only else ''
+    quantity = 'menu.quantity' if today_only else 'NULL'
+    rows = db.session.execute(text(f'''
+        SELECT dish.dish_id, dish.dish_name, dish.image_url, dish.category, dish.price_cents, dish.description,
+               {quantity} AS quantity
+        FROM {FTS_TABLE}
+        JOIN dish ON dish.dish_id = {FTS_TABLE}.rowid
+        {menu_join}
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}, {CATEGORY_WEIGHT}), dish.dish_id
+        LIMIT :limit OFFSET :offset
+    '''), {'match': match, 'today': date.today().isoformat(), 'limit': limit, 'offset': offset})
+    return rows.all()
+
+
+def _like_search(tokens, limit, offset, today_only):
+    columns = ((Dish.dish_name, NAME_WEIGHT), (Dish.description, DESCRIPTION_WEIGHT), (Dish.category, CATEGORY_WEIGHT))
+    conditions = []
+    score = 0
+    for token in tokens:
+        pattern = '%' + token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        matches = [column.ilike(pattern, escape='\\') for column, _ in columns]
+        conditions.append(db.or_(*matches))
+        for match, (_, weight) in zip(matches, columns):
+            score = score + db.case((match, weight), else_=0)
+
+    quantity = Menu.quantity if today_only else db.null()
+    query = db.session.query(
+        Dish.dish_id, Dish.dish_name, Dish.image_url, Dish.category, Dish.price_cents, Dish.description,
+        quantity.label('quantity')
+    )
+    if today_only:
+        query = query.join(Menu, (Menu.dish_id == Dish.dish_id) & (Menu.date == date.today()))
+    return query.filter(*conditions).order_by(score.desc(), Dish.dish_id).limit(limit).offset(offset).all()
+
+
+def search_dishes(query, limit=20, offset=0, today_only=False):
+    """Return ``(rows, engine)`` for a free-text query, best matches first."""
+    tokens = search_tokens(query)
+    if not tokens:
+        return [], None
+    if dish_index_available():
+        return _fts_search(tokens, limit, offset, today_only), 'fts5'
+    return _like_search(tokens, limit, offset, today_only), 'like'
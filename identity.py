@@ -0,0 +1,130 @@
+"""
+Request identity.
+
+At login, ``login_identity`` stores more than the user id, username and role
+in the session: it also stores the id of the user's role row (``customer_id``,
+``cook_id`` or ``admin_id``). Routes check the role with
+``@role_required(...)``, which sets ``g.identity`` without a query. They then
+use ``g.identity.customer_id`` where they used to run
+``Customer.query.filter_by(user_id=...)``.
+
+Rows a route really needs (the user for a profile page, the cook for its
+category) come from ``current_user()`` and ``current_cook()``. These load a
+row at most once per request, and everything the request calls shares it
+(``request_memo``).
+
+The ids in the session are only as fresh as the login: a session of a
+deleted account is rejected here too (see closed_accounts.py), and routes
+that write rows owned by the role (cart items, orders, replies) still load
+the role row with ``current_customer()``/``current_cook()`` and answer 404 if
+it is gone, so a purge that another worker has not noticed yet cannot leave
+orphan rows behind.
+
+A session opened before role ids were stored is completed on its first
+request with one query, so an upgrade logs nobody out.
+"""
+
+from functools import wraps
+
+from flask import g, redirect, session, url_for
+
+from models import db, User, Customer, Cook, Administrator
+from closed_accounts import is_closed_session
+
+# Role -> (role model, session key of its id)
+ROLE_KEYS = {
+    'Customer': (Customer, 'customer_id'),
+    'Cook': (Cook, 'cook_id'),
+    'Administrator': (Administrator, 'admin_id'),
+}
+
+
+class Identity:
+    """The logged-in user as stored in the session; ids of other roles are None."""
+    __slots__ = ('user_id', 'username', 'role', 'customer_id', 'cook_id', 'admin_id')
+
+    def __init__(self, data):
+        self.user_id = data['user_id']
+        self.username = data['username']
+        self.role = data['role']
+        self.customer_id = data.get('customer_id')
+        self.cook_id = data.get('cook_id')
+        self.admin_id = data.get('admin_id')
+
+
+def login_identity(user):
+    """Session entry for ``user`` at login, with the id of its customer, cook or administrator row."""
+    data = {"username": user.username, "role": None, "user_id": user.user_id}
+    for role, (model, key) in ROLE_KEYS.items():
+        row = getattr(user, model.__name__.lower())
+        if row is not None:
+            data['role'] = role
+            data[key] = getattr(row, key)
+            break
+    return data
+
+
+def current_identity():
+    """The ``Identity`` of this request's user, or None if nobody is logged in (or their account was deleted)."""
+    if 'identity' not in g:
+        data = session.get('user')
+        if data is not None and is_closed_session(data['user_id'], session.get('login_at')):
+            # The account was deleted after this session was opened
+            for key in ('user', 'user_id', 'login_at'):
+                session.pop(key, None)
+            data = None
+        if data is not None and data['role'] in ROLE_KEYS:
+            model, key = ROLE_KEYS[data['role']]
+            if key not in data:
+                # Session from before role ids were stored: look the id up once and keep it
+                data = dict(data)
+                data[key] = db.session.query(getattr(model, key)).filter(model.user_id == data['user_id']).scalar()
+                session['user'] = data
+        g.identity = Identity(data) if data is not None else None
+    return g.identity
+
+
+def role_required(*roles, denied=None):
+    """Let only logged-in users with one of ``roles`` (any role if none is given) reach the view.
+
+    Sets ``g.identity``; the session of a deleted account is cleared and
+    counts as logged out. Anyone else gets ``denied`` (any view return value,
+    e.g. ``({"message": "Unauthorized"}, 403)``), or by default a redirect to
+    the login page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            identity = current_identity()
+            if identity is None or (roles and identity.role not in roles):
+                return denied if denied is not None else redirect(url_for('login_page'))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_memo(key, load):
+    """``load()``, computed at most once per request for ``key``."""
+    memo = g.setdefault('request_memo', {})
+    if key not in memo:
+        memo[key] = load()
+    return memo[key]
+
+
+def current_user():
+    """The logged-in ``User`` row (None if it no longer exists)."""
+    user_id = current_identity().user_id
+    return request_memo(('user', user_id), lambda: db.session.get(User, user_id))
+
+
+def current_customer():
+    """The logged-in customer's ``Customer`` row, to check it still exists before writing (None if it does not)."""
+    customer_id = current_identity().customer_id
+    return request_memo(('customer', customer_id),
+                        lambda: db.session.get(Customer, customer_id) if customer_id else None)
+
+
+def current_cook():
+    """The logged-in cook's ``Cook`` row, e.g. for its category (None if it no longer exists)."""
+    cook_id = current_identity().cook_id
+    return request_memo(('cook', cook_id), lambda: db.session.get(Cook, cook_id) if cook_id else None)
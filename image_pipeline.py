@@ -0,0 +1,195 @@
+"""
+Responsive image variants for dish photos and avatars.
+
+After an upload is saved, ``submit_dish_image`` / ``submit_avatar`` hand the
+file to a small process pool that renders thumbnail, card and full-size
+variants in WebP and JPEG next to the original. When a job finishes, the
+variant URLs are stored on the row (``Dish.image_variants`` /
+``User.avatar_variants``) unless the image was replaced in the meantime;
+until then pages keep serving the original. Re-uploads of a stored image
+reuse its variants (``stored_variants``). ``picture`` turns a row's
+variants into a ``<picture>`` element with ``srcset``.
+
+Pillow is optional: without it uploads are served as-is.
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow not installed
+    Image = None
+
+from models import db, Dish, User
+from menu_cache import bump_dish_version
+
+# (variant name, max width in px), smallest first
+DISH_SIZES = (('thumb', 160), ('card', 480), ('full', 1280))
+AVATAR_SIZES = (('thumb', 64), ('card', 160), ('full', 512))
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None  # Bounds the number of queued jobs
+
+
+def images_available():
+    return Image is not None
+
+
+def render_variants(source_path, sizes):
+    """Write the resized variants of ``source_path`` next to it; return ``{name: {width, webp, jpeg}}`` of filenames.
+
+    Runs in a worker process, so it only touches the filesystem.
+    """
+    directory = os.path.dirname(source_path)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    variants = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        for name, max_width in sizes:
+            width = min(max_width, image.width)
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+
+            webp_name = f'{stem}.{name}.webp'
+            resized.save(os.path.join(directory, webp_name), 'WEBP', quality=WEBP_QUALITY, method=4)
+
+            # JPEG has no alpha channel: flatten onto white
+            if has_alpha:
+                flat = Image.new('RGB', resized.size, (255, 255, 255))
+                flat.paste(resized, mask=resized.getchannel('A'))
+            else:
+                flat = resized
+            jpeg_name = f'{stem}.{name}.jpg'
+            flat.save(os.path.join(directory, jpeg_name), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+            variants[name] = {'width': width, 'webp': webp_name, 'jpeg': jpeg_name}
+    return variants
+
+
+def _get_executor(app):
+    """The process pool and the semaphore bounding its queue, created on first use."""
+    global _executor, _pending
+    with _executor_lock:
+        if _executor is None:
+            workers = app.config.get('IMAGE_PIPELINE_WORKERS', 2)
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _pending = threading.BoundedSemaphore(workers * app.config.get('IMAGE_PIPELINE_QUEUE_PER_WORKER', 8))
+        return _executor, _pending
+
+
+def _discard_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def variant_urls(variants, image_url):
+    """Turn the filenames returned by ``render_variants`` into URLs next to ``image_url``."""
+    base = image_url.rsplit('/', 1)[0]
+    return {
+        name: {'width': variant['width'], 'webp': f"{base}/{variant['webp']}", 'jpeg': f"{base}/{variant['jpeg']}"}
+        for name, variant in variants.items()
+    }
+
+
+def _store_variants(app, model, key, row_id, url_column, variants_column, image_url, variants, bump_version):
+    with app.app_context():
+        # Only attach the variants if the row still shows the image they were made from
+        result = db.session.execute(
+            db.update(model)
+            .where(key == row_id, url_column == image_url)
+            .values({variants_column: variant_urls(variants, image_url)})
+        )
+        if result.rowcount and bump_version:
+            bump_version()
+        db.session.commit()
+
+
+def _submit(app, path, sizes, store):
+    """Queue ``path`` for processing; return False if Pillow is missing, the queue is full or the pool failed."""
+    if not images_available():
+        return False
+    # The slot goes back to this semaphore even if the pool is replaced meanwhile
+    executor, pending = _get_executor(app)
+    if not pending.acquire(blocking=False):
+        # Don't let uploads pile up behind a slow pool; `flask build-image-variants` catches up later
+        app.logger.warning('Image pipeline queue full, serving %s without variants', path)
+        return False
+
+    def done(future):
+        try:
+            store(future.result())
+        except Exception:
+            app.logger.exception('Could not build image variants for %s', path)
+        finally:
+            pending.release()
+
+    try:
+        future = executor.submit(render_variants, path, sizes)
+    except Exception as e:
+        # Without a job, `done` never runs: give the slot back here or it is lost for good
+        pending.release()
+        if isinstance(e, BrokenProcessPool):
+            _discard_executor(executor)  # A worker process died; the next upload starts a fresh pool
+        app.logger.exception('Could not queue image variants for %s', path)
+        return False
+    future.add_done_callback(done)
+    return True
+
+
+def submit_dish_image(app, dish_id, image_url, path):
+    return _submit(app, path, DISH_SIZES, lambda variants: _store_variants(
+        app, Dish, Dish.dish_id, dish_id, Dish.image_url, Dish.image_variants, image_url, variants, bump_dish_version
+    ))
+
+
+def submit_avatar(app, user_id, avatar_url, path):
+    return _submit(app, path, AVATAR_SIZES, lambda variants: _store_variants(
+        app, User, User.user_id, user_id, User.avatar_url, User.avatar_variants, avatar_url, variants, None
+    ))
+
+
+def stored_variants(url_column, variants_column, url):
+    """Variants already built for ``url`` (uploads are deduplicated, so several rows may share one file)."""
+    return db.session.scalar(
+        db.select(variants_column).where(url_column == url, variants_column.isnot(None)).limit(1)
+    )
+
+
+def srcset(variants, image_format):
+    """``srcset`` value for one format; variants of equal width (small originals) are listed once."""
+    entries = {}
+    for variant in variants.values():
+        entries.setdefault(variant['width'], variant[image_format])
+    return ', '.join(f'{url} {width}w' for width, url in sorted(entries.items()))
+
+
+def picture(url, variants, alt='', sizes='(max-width: 600px) 100vw, 320px', fallback='card', **attrs):
+    """Render an ``<img>``, wrapped in ``<picture>`` with WebP/JPEG ``srcset`` once variants exist.
+
+    Extra keyword arguments become attributes of the ``<img>`` (``class_`` for ``class``).
+    """
+    img_attrs = ''.join(f' {name.rstrip("_")}="{escape(value)}"' for name, value in attrs.items())
+    if not variants:
+        return Markup(f'<img src="{escape(url or "")}" alt="{escape(alt)}"{img_attrs}>')
+    src = variants.get(fallback, next(iter(variants.values())))['jpeg']
+    return Markup(
+        f'<picture>'
+        f'<source type="image/webp" srcset="{escape(srcset(variants, "webp"))}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(src)}" srcset="{escape(srcset(variants, "jpeg"))}" sizes="{escape(sizes)}"'
+        f' alt="{escape(alt)}"{img_attrs}>'
+        f'</picture>'
+    )
@@ -0,0 +1,154 @@
+"""
+Today's menu read model.
+
+All public menu pages render the same data: today's Menu rows together with
+their Dish and the cook's username. Instead of looking those up row by row,
+the snapshot is built by one joined query and kept in process memory.
+
+Staleness is detected with two counters in the ``content_version`` table:
+``menu`` (Menu rows, cook names) and ``dishes`` (Dish rows). Every write
+bumps the relevant one inside its own transaction (``bump_menu_version`` /
+``bump_dish_version``); readers compare ``content_versions()`` - a single
+primary-key lookup - with the versions the snapshot was built from. The same
+counters give the menu APIs their ETags, and they work across several
+worker processes.
+"""
+
+import threading
+from datetime import date
+
+from models import db, User, Cook, Dish, Menu, ContentVersion, cents_to_price
+
+MENU_VERSION = 'menu'
+DISH_VERSION = 'dishes'
+
+_lock = threading.Lock()
+_snapshot = None  # (date, versions, rows)
+
+
+def bump_menu_version():
+    """Mark today's menu as changed; call inside the transaction that changes Menu rows."""
+    ContentVersion.bump(MENU_VERSION)
+
+
+def bump_dish_version():
+    """Mark dishes as changed; call inside the transaction that changes Dish rows."""
+    ContentVersion.bump(DISH_VERSION)
+
+
+def content_versions():
+    """Return ``(menu_version, dish_version)``."""
+    return ContentVersion.current(MENU_VERSION, DISH_VERSION)
+
+
+def _load_rows(today):
+    query = db.session.query(
+        Menu.menu_id,
+        Menu.cook_id,
+        Menu.quantity,
+        Dish.dish_id,
+        Dish.dish_name,
+        Dish.image_url,
+        Dish.image_variants,
+        Dish.category,
+        Dish.price_cents,
+        Dish.description,
+        User.username.label('cook_name'),
+    ).join(
+        Dish, Menu.dish_id == Dish.dish_id
+    ).join(
+        Cook, Menu.cook_id == Cook.cook_id
+    ).join(
+        User, Cook.user_id == User.user_id
+    ).filter(
+        Menu.date == today
+    ).order_by(Menu.menu_id)
+
+    rows = []
+    for row in query.all():
+        row = row._asdict()
+        row['price'] = cents_to_price(row.pop('price_cents'))
+        rows.append(row)
+    return tuple(rows)
+
+
+def today_menu_rows():
+    """Return today's menu rows, querying the menu tables only when a version changed."""
+    global _snapshot
+    today = date.today()
+    versions = content_versions()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot[0] == today and snapshot[1] == versions:
+        return snapshot[2]
+
+    rows = _load_rows(today)
+    with _lock:
+        _snapshot = (today, versions, rows)
+    return rows
+
+
+def dishes_for_today():
+    """Today's dishes with their total available quantity, one entry per dish."""
+    dish_quantities = {}
+    for row in today_menu_rows():
+        dish_id = row['dish_id']
+        if dish_id in dish_quantities:
+            dish_quantities[dish_id]['quantity'] += row['quantity']
+        else:
+            dish_quantities[dish_id] = {
+                'dish_id': dish_id,
+                'name': row['dish_name'],
+                'image_url': row['image_url'],
+                'image_variants': row['image_variants'],
+                'category': row['category'],
+                'price': row['price'],
+                'description': row['description'],
+                'quantity': row['quantity']
+            }
+    return list(dish_quantities.values())
+
+
+def dishes_for_today_with_cooks():
+    """Today's dishes keyed by (dish, cook), including the menu id and cook name."""
+    dish_quantities = {}
+    for row in today_menu_rows():
+        key = (row['dish_id'], row['cook_id'])
+        if key in dish_quantities:
+            dish_quantities[key]['quantity'] += row['quantity']
+        else:
+            dish_quantities[key] = {
+                'menu_id': row['menu_id'],
+                'dish_id': row['dish_id'],
+                'name': row['dish_name'],
+                'image_url': row['image_url'],
+                'image_variants': row['image_variants'],
+                'category': row['category'],
+                'price': row['price'],
+                'description': row['description'],
+                'quantity': row['quantity'],
+                'cook_name': row['cook_name']
+            }
+    return list(dish_quantities.values())
+
+
+def menu_grouped_by_cook():
+    """Today's menu grouped by cook username, in the shape used by /api/customer_menu."""
+    cook_dishes_map = {}
+    for row in today_menu_rows():
+        cook = row['cook_name']
+        cook_dishes_map.setdefault(cook, []).append({
+            'dish_id': row['dish_id'],
+            'dish_name': row['dish_name'],
+            'image_url': row['image_url'],
+            'image_variants': row['image_variants'],
+            'category': row['category'],
+            'price': row['price'],
+            'description': row['description'],
+            'quantity': row['quantity'],
+            'cook_name': cook
+        })
+
+    return [
+        {'cook_name': cook_name, 'dishes': dishes}
+        for cook_name, dishes in cook_dishes_map.items()
+    ]
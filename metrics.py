@@ -0,0 +1,148 @@
+"""
+Per-endpoint request metrics.
+
+Records, for every Flask endpoint, a request latency histogram, the number of
+SQL statements executed and the time spent in the database, and exposes them
+in Prometheus text format at ``/metrics``.
+
+Nothing is registered unless ``METRICS_ENABLED`` is set, so a disabled
+instance pays no per-request or per-query cost at all. Counters live in
+process memory: with several workers, each worker reports its own numbers.
+"""
+
+import threading
+import time
+
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class EndpointStats:
+    __slots__ = ('bucket_counts', 'count', 'latency_sum', 'queries', 'db_time')
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, latency, queries, db_time):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats.bucket_counts[i] += 1
+                    break
+            stats.count += 1
+            stats.latency_sum += latency
+            stats.queries += queries
+            stats.db_time += db_time
+
+    def render(self):
+        """Return all metrics in Prometheus text exposition format."""
+        with self._lock:
+            snapshot = sorted(self._endpoints.items())
+            lines = [
+                '# HELP parrot_request_duration_seconds Request latency per endpoint.',
+                '# TYPE parrot_request_duration_seconds histogram',
+            ]
+            for endpoint, stats in snapshot:
+                label = _escape(endpoint)
+                cumulative = 0
+                for bound, bucket in zip(LATENCY_BUCKETS, stats.bucket_counts):
+                    cumulative += bucket
+                    lines.append(f'parrot_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'parrot_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {stats.count}')
+                lines.append(f'parrot_request_duration_seconds_sum{{endpoint="{label}"}} {stats.latency_sum:.6f}')
+                lines.append(f'parrot_request_duration_seconds_count{{endpoint="{label}"}} {stats.count}')
+
+            lines += [
+                '# HELP parrot_db_queries_total SQL statements executed per endpoint.',
+                '# TYPE parrot_db_queries_total counter',
+            ]
+            for endpoint, stats in snapshot:
+                lines.append(f'parrot_db_queries_total{{endpoint="{_escape(endpoint)}"}} {stats.queries}')
+
+            lines += [
+                '# HELP parrot_db_duration_seconds_total Time spent executing SQL per endpoint.',
+                '# TYPE parrot_db_duration_seconds_total counter',
+            ]
+            for endpoint, stats in snapshot:
+                lines.append(f'parrot_db_duration_seconds_total{{endpoint="{_escape(endpoint)}"}} {stats.db_time:.6f}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_query_start'].pop()
+    # Statements run outside a request (CLI commands, startup) are not attributed
+    if has_app_context() and 'metrics_started' in g:
+        g.metrics_queries += 1
+        g.metrics_db_time += time.perf_counter() - started
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    stack = exception_context.connection.info.get('metrics_query_start') if exception_context.connection else None
+    if stack:
+        stack.pop()
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_db_time = 0.0
+
+
+def _finish_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    registry.observe(
+        request.endpoint or 'unmatched',
+        time.perf_counter() - started,
+        g.pop('metrics_queries', 0),
+        g.pop('metrics_db_time', 0.0)
+    )
+
+
+def init_metrics(app, db):
+    """Install the request/engine hooks and the /metrics endpoint if enabled."""
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,27 @@
+"""Add case-insensitive user search indexes
+
+Revision ID: 3ffea1367bf2
+Revises: 567941cec0f7
+Create Date: 2026-10-18 07:09:48.632054
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ffea1367bf2'
+down_revision = '567941cec0f7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Expression indexes are not picked up by autogenerate on SQLite
+    op.create_index('ix_user_username_lower', 'user', [sa.text('lower(username)')], unique=False)
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
+    op.drop_index('ix_user_username_lower', table_name='user')
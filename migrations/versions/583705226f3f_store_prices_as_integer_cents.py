@@ -0,0 +1,60 @@
+"""Store prices as integer cents
+
+Revision ID: 583705226f3f
+Revises: 74c4e9b25aa4
+Create Date: 2026-10-18 07:37:48.730473
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '583705226f3f'
+down_revision = '74c4e9b25aa4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('dish', sa.Column('price_cents', sa.Integer(), nullable=True))
+    op.add_column('order', sa.Column('total_cents', sa.Integer(), nullable=True))
+    op.add_column('order_item', sa.Column('unit_price_cents', sa.Integer(), nullable=True))
+
+    # Prices were free-form strings; anything SQLite cannot read as a number becomes 0.
+    # Earlier orders kept no unit price, so their items get the dish's current price.
+    op.execute('UPDATE dish SET price_cents = CAST(round(CAST(price AS REAL) * 100) AS INTEGER)')
+    op.execute('UPDATE "order" SET total_cents = CAST(round(total_price * 100) AS INTEGER)')
+    op.execute("""
+        UPDATE order_item SET unit_price_cents = coalesce(
+            (SELECT dish.price_cents FROM dish WHERE dish.dish_id = order_item.dish_id), 0
+        )
+    """)
+
+    with op.batch_alter_table('dish', schema=None) as batch_op:
+        batch_op.alter_column('price_cents', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('price')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.alter_column('total_cents', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('total_price')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.alter_column('unit_price_cents', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('unit_price_cents')
+
+    op.add_column('order', sa.Column('total_price', sa.FLOAT(), nullable=True))
+    op.execute('UPDATE "order" SET total_price = total_cents / 100.0')
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.alter_column('total_price', existing_type=sa.FLOAT(), nullable=False)
+        batch_op.drop_column('total_cents')
+
+    op.add_column('dish', sa.Column('price', sa.VARCHAR(length=50), nullable=True))
+    op.execute("UPDATE dish SET price = printf('%d.%02d', price_cents / 100, price_cents % 100)")
+    with op.batch_alter_table('dish', schema=None) as batch_op:
+        batch_op.alter_column('price', existing_type=sa.VARCHAR(length=50), nullable=False)
+        batch_op.drop_column('price_cents')
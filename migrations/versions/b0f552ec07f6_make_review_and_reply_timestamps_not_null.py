@@ -0,0 +1,48 @@
+"""Make review and reply timestamps not null
+
+Revision ID: b0f552ec07f6
+Revises: 8853b322367e
+Create Date: 2026-10-18 08:10:29.049026
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b0f552ec07f6'
+down_revision = '8853b322367e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows from before the column had a default: a review gets the time of its order,
+    # a reply the time of its review (the review feeds page on these timestamps)
+    op.execute("""
+        UPDATE dish_review SET created_at = coalesce(
+            (SELECT "order".date FROM order_item JOIN "order" ON "order".order_id = order_item.order_id
+             WHERE order_item.order_item_id = dish_review.order_item_id),
+            CURRENT_TIMESTAMP
+        ) WHERE created_at IS NULL
+    """)
+    op.execute("""
+        UPDATE chef_reply SET created_at = coalesce(
+            (SELECT dish_review.created_at FROM dish_review WHERE dish_review.review_id = chef_reply.review_id),
+            CURRENT_TIMESTAMP
+        ) WHERE created_at IS NULL
+    """)
+
+    with op.batch_alter_table('chef_reply', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DATETIME(), nullable=False)
+
+    with op.batch_alter_table('dish_review', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DATETIME(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('dish_review', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DATETIME(), nullable=True)
+
+    with op.batch_alter_table('chef_reply', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DATETIME(), nullable=True)
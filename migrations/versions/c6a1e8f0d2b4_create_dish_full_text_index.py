@@ -0,0 +1,34 @@
+"""Create the dish full-text index
+
+Revision ID: c6a1e8f0d2b4
+Revises: b0f552ec07f6
+Create Date: 2026-10-18 08:11:34.879646
+
+"""
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a1e8f0d2b4'
+down_revision = 'b0f552ec07f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that served a search before this revision already have the table
+    # (it used to be created at request time): create it if missing, then refill it
+    try:
+        op.execute('CREATE VIRTUAL TABLE IF NOT EXISTS dish_fts USING fts5(dish_name, description, category)')
+    except OperationalError:
+        return  # SQLite compiled without FTS5: dish search falls back to LIKE matching
+    op.execute('DELETE FROM dish_fts')
+    op.execute(
+        'INSERT INTO dish_fts (rowid, dish_name, description, category) '
+        "SELECT dish_id, dish_name, coalesce(description, ''), category FROM dish"
+    )
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS dish_fts')
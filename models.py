@@ -2,10 +2,44 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from datetime import date
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 from sqlalchemy import UniqueConstraint
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+def include_name(name, type_, parent_names):
+    # The dish_fts full-text tables (see dish_search.py) are created by a migration, not modeled:
+    # keep autogenerate from proposing to drop them
+    return not (type_ == 'table' and name.startswith('dish_fts'))
+
 
 db = SQLAlchemy()
-migrate = Migrate()
+migrate = Migrate(include_name=include_name)
+
+
+# Prices are stored as integer cents; these convert to and from the '12.50' form used by forms and APIs
+MAX_PRICE_CENTS = 2 ** 63 - 1  # Largest SQLite INTEGER
+
+
+def price_to_cents(value):
+    """Parse a price such as '12', '12.5' or 12.5 into cents; raise ValueError if it is not a valid price.
+
+    NaN, infinities, negative prices and fractions of a cent ('12.345') are rejected, not rounded.
+    """
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid price: {value!r}')
+    if not amount.is_finite() or amount < 0:
+        raise ValueError(f'Invalid price: {value!r}')
+    cents = amount * 100
+    if cents != cents.to_integral_value() or cents > MAX_PRICE_CENTS:
+        raise ValueError(f'Invalid price: {value!r}')
+    return int(cents)
+
+
+def cents_to_price(cents):
+    return f'{cents // 100}.{cents % 100:02d}'
 
 # Define User model
 class User(db.Model):
@@ -16,6 +50,15 @@ class User(db.Model):
     telephone = db.Column(db.String(20), nullable=False)
     introduction = db.Column(db.Text, nullable=True)
     avatar_url = db.Column(db.String(255), nullable=True)
+    avatar_variants = db.Column(db.JSON, nullable=True)  # See image_pipeline.py
+    # Set when the account is deleted; the rows are purged afterwards (see account_purge.py)
+    is_disabled = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+
+    # Case-insensitive prefix search on username/email (see /api/admin_accounts)
+    __table_args__ = (
+        db.Index('ix_user_username_lower', db.func.lower(username)),
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
 
     customer = db.relationship('Customer', back_populates='user', cascade='all, delete', uselist=False)
     cook = db.relationship('Cook', back_populates='user', cascade='all, delete', uselist=False)
@@ -28,7 +71,8 @@ class Customer(db.Model):
     user_id = db.Column(
         db.Integer,
         db.ForeignKey('user.user_id', ondelete='CASCADE', name='fk_customer_user_id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     user = db.relationship('User', back_populates='customer')
 
@@ -39,7 +83,8 @@ class Cook(db.Model):
     user_id = db.Column(
         db.Integer,
         db.ForeignKey('user.user_id', ondelete='CASCADE', name='fk_cook_user_id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     category = db.Column(db.String(50), nullable=False, default='')
     user = db.relationship('User', back_populates='cook')
@@ -51,7 +96,8 @@ class Administrator(db.Model):
     user_id = db.Column(
         db.Integer,
         db.ForeignKey('user.user_id', ondelete='CASCADE', name='fk_admin_user_id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     user = db.relationship('User', back_populates='administrator')
 
@@ -61,10 +107,20 @@ class Dish(db.Model):
     dish_id = db.Column(db.Integer, primary_key=True)
     dish_name = db.Column(db.String(100), nullable=False)
     image_url = db.Column(db.String(255), nullable=True)
+    # Resized WebP/JPEG variants of image_url, filled in by image_pipeline.py
+    image_variants = db.Column(db.JSON, nullable=True)
     category = db.Column(db.String(50), nullable=False)
-    price = db.Column(db.String(50), nullable=False)
+    price_cents = db.Column(db.Integer, nullable=False)
     description = db.Column(db.Text, nullable=True)
 
+    @property
+    def price(self):
+        return cents_to_price(self.price_cents)
+
+    @price.setter
+    def price(self, value):
+        self.price_cents = price_to_cents(value)
+
 class Menu(db.Model):
     __tablename__ = 'menu'
     menu_id = db.Column(db.Integer, primary_key=True)
@@ -73,7 +129,10 @@ class Menu(db.Model):
     date = db.Column(db.Date, nullable=False, default=date.today)
     quantity = db.Column(db.Integer, nullable=False, default=1)
 
-    __table_args__ = (UniqueConstraint('dish_id', 'date', name='_dish_date_uc'),)
+    __table_args__ = (
+        UniqueConstraint('dish_id', 'date', name='_dish_date_uc'),
+        db.Index('ix_menu_date_cook_id', 'date', 'cook_id'),
+    )
 
     cook = db.relationship('Cook', backref=db.backref('menus', lazy=True))
     dish = db.relationship('Dish', backref=db.backref('menus', lazy=True))
@@ -84,6 +143,8 @@ class ShoppingCartItem(db.Model):
     dish_id = db.Column(db.Integer, db.ForeignKey('dish.dish_id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
 
+    __table_args__ = (db.Index('ix_shopping_cart_item_customer_id_dish_id', 'customer_id', 'dish_id'),)
+
     dish = db.relationship('Dish')
     customer = db.relationship('Customer', backref=db.backref('cart_items', lazy=True))
 
@@ -93,17 +154,25 @@ class Order(db.Model):
     order_id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.customer_id'), nullable=False)
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    total_price = db.Column(db.Float, nullable=False)
+    total_cents = db.Column(db.Integer, nullable=False)  # SUM of the items' unit_price_cents * quantity
+
+    __table_args__ = (db.Index('ix_order_customer_id_date', 'customer_id', 'date'),)
+
+    @property
+    def total_price(self):
+        return self.total_cents / 100
+
     # Relationships
     customer = db.relationship('Customer', backref=db.backref('orders', lazy=True))
 
 
 class OrderItem(db.Model):
     order_item_id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.order_id'), nullable=False, index=True)
     dish_id = db.Column(db.Integer, db.ForeignKey('dish.dish_id'), nullable=False)
     cook_id = db.Column(db.Integer, db.ForeignKey('cook.cook_id'), nullable=False)  # New
     quantity = db.Column(db.Integer, nullable=False)
+    unit_price_cents = db.Column(db.Integer, nullable=False)  # Dish price when the order was placed
 
     order = db.relationship('Order', backref=db.backref('order_items', lazy=True))
     dish = db.relationship('Dish')
@@ -117,7 +186,12 @@ class DishReview(db.Model):
     cook_id = db.Column(db.Integer, db.ForeignKey('cook.cook_id'), nullable=False)
     dish_id = db.Column(db.Integer, db.ForeignKey('dish.dish_id'), nullable=False)
     comment_text = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_dish_review_dish_id_created_at', 'dish_id', 'created_at'),
+        db.Index('ix_dish_review_cook_id_created_at', 'cook_id', 'created_at'),
+    )
 
     order_item = db.relationship('OrderItem', backref=db.backref('review', uselist=False))
     customer = db.relationship('Customer', backref=db.backref('reviews', lazy=True))
@@ -133,6 +207,8 @@ class Friendship(db.Model):
     status = db.Column(db.String(20), nullable=False, default='Pending')  # 'Pending', 'Accepted', 'Rejected'
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (db.Index('ix_friendship_friend_id_status', 'friend_id', 'status'),)
+
     customer = db.relationship('Customer', foreign_keys=[customer_id], backref=db.backref('friend_requests', lazy=True))
     friend = db.relationship('Customer', foreign_keys=[friend_id], backref=db.backref('friends', lazy=True))
 
@@ -145,15 +221,106 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)  # Read or not
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (db.Index('ix_message_sender_id_receiver_id_created_at', 'sender_id', 'receiver_id', 'created_at'),)
+
     sender = db.relationship('Customer', foreign_keys=[sender_id], backref=db.backref('sent_messages', lazy=True))
     receiver = db.relationship('Customer', foreign_keys=[receiver_id], backref=db.backref('received_messages', lazy=True))
 
+# One row per pair of customers who have exchanged messages, used to serve the inbox.
+# The pair is stored ordered (customer_low_id < customer_high_id).
+class Conversation(db.Model):
+    conversation_id = db.Column(db.Integer, primary_key=True)
+    customer_low_id = db.Column(db.Integer, db.ForeignKey('customer.customer_id'), nullable=False)
+    customer_high_id = db.Column(db.Integer, db.ForeignKey('customer.customer_id'), nullable=False)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('message.message_id'), nullable=True)
+    last_message_preview = db.Column(db.String(60), nullable=False, default='')
+    last_message_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    low_unread_count = db.Column(db.Integer, nullable=False, default=0)  # Unread by customer_low_id
+    high_unread_count = db.Column(db.Integer, nullable=False, default=0)  # Unread by customer_high_id
+
+    __table_args__ = (
+        UniqueConstraint('customer_low_id', 'customer_high_id', name='_conversation_pair_uc'),
+        db.Index('ix_conversation_low_last_message_at', 'customer_low_id', 'last_message_at'),
+        db.Index('ix_conversation_high_last_message_at', 'customer_high_id', 'last_message_at'),
+    )
+
+    customer_low = db.relationship('Customer', foreign_keys=[customer_low_id])
+    customer_high = db.relationship('Customer', foreign_keys=[customer_high_id])
+    last_message = db.relationship('Message')
+
 class ChefReply(db.Model):
     reply_id = db.Column(db.Integer, primary_key=True)
     review_id = db.Column(db.Integer, db.ForeignKey('dish_review.review_id'), nullable=False)
     cook_id = db.Column(db.Integer, db.ForeignKey('cook.cook_id'), nullable=False)
     reply_text = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     review = db.relationship('DishReview', backref=db.backref('replies', lazy=True))
     cook = db.relationship('Cook', backref=db.backref('replies', lazy=True))
+
+
+# Change counters for cached read models and ETags (see menu_cache.py).
+# Writers bump a counter in the same transaction as the change they make.
+class ContentVersion(db.Model):
+    __tablename__ = 'content_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, name):
+        """Increment counter ``name`` in the current transaction; the caller commits."""
+        stmt = sqlite_insert(cls).values(name=name, version=1)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['name'], set_={'version': cls.version + 1}))
+
+    @classmethod
+    def current(cls, *names):
+        """Return the counters for ``names`` as a tuple, 0 for counters never bumped."""
+        versions = dict(db.session.query(cls.name, cls.version).filter(cls.name.in_(names)).all())
+        return tuple(versions.get(name, 0) for name in names)
+
+# Users banned by an administrator (see ban_registry.py)
+class UserBan(db.Model):
+    __tablename__ = 'user_ban'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), primary_key=True)
+    banned_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# Deleted accounts (see closed_accounts.py); kept after the user row is purged, so no foreign key
+class ClosedAccount(db.Model):
+    __tablename__ = 'closed_account'
+    user_id = db.Column(db.Integer, primary_key=True)
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# Daily sales rollups (see sales_rollup.py), kept up to date by submit_order
+class DishDailySales(db.Model):
+    __tablename__ = 'dish_daily_sales'
+    dish_id = db.Column(db.Integer, db.ForeignKey('dish.dish_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)  # Orders containing the dish
+
+    __table_args__ = (db.Index('ix_dish_daily_sales_day', 'day'),)
+
+
+class CookDailySales(db.Model):
+    __tablename__ = 'cook_daily_sales'
+    cook_id = db.Column(db.Integer, db.ForeignKey('cook.cook_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_cook_daily_sales_day', 'day'),)
+
+
+class CategoryDailySales(db.Model):
+    __tablename__ = 'category_daily_sales'
+    category = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.Integer, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_category_daily_sales_day', 'day'),)
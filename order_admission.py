@@ -0,0 +1,218 @@
+"""
+Order admission.
+
+At lunchtime many ``submit_order`` calls arrive together, and SQLite accepts
+one writer at a time: with one transaction per request, most of the time
+goes into waiting for the write lock (or failing with "database is locked"
+once ``busy_timeout`` runs out).
+
+``admit_orders`` admits the carts of several customers in ONE transaction:
+it takes the write lock first, reads today's stock for every dish in the
+batch once, reserves it in arrival order, writes all accepted orders, and
+commits once. Each customer still gets their own outcome (accepted, sold
+out, empty cart), the same status code and JSON as before.
+
+``OrderBatcher`` feeds it: request threads queue their customer and wait,
+and a single admission thread per process collects whatever arrives within
+``ORDER_BATCH_WINDOW_MS`` (at most ``ORDER_BATCH_MAX`` orders) into a batch.
+With ``ORDER_ADMISSION = 'direct'`` each request runs its own batch of one
+inside the request instead.
+"""
+
+import queue
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import joinedload
+
+from models import db, Menu, ShoppingCartItem, Order, OrderItem
+from menu_cache import bump_menu_version
+from sales_rollup import record_order_sales
+
+ORDER_SUBMITTED = (200, {"message": "Order submitted", "success": True})
+EMPTY_CART = (400, {"message": "Shopping cart is empty", "success": False})
+
+
+def _failure(error):
+    return 500, {"message": f"Order submission failure: {error}", "success": False}
+
+
+def admit_orders(customer_ids):
+    """Turn each customer's cart into an order, in one transaction.
+
+    Returns one ``(status_code, body)`` per entry of ``customer_ids``, in the
+    same order. Customers are served in that order when stock runs out; a
+    customer listed twice gets an empty cart the second time.
+    """
+    try:
+        return _admit(customer_ids)
+    except Exception as e:
+        db.session.rollback()
+        return [_failure(e)] * len(customer_ids)
+
+
+def _admit(customer_ids):
+    today = date.today()
+
+    # Writing first takes SQLite's write lock, so the stock read below cannot
+    # change under us before the commit
+    bump_menu_version()
+
+    carts = {}
+    for item in ShoppingCartItem.query.options(joinedload(ShoppingCartItem.dish)).filter(
+        ShoppingCartItem.customer_id.in_(set(customer_ids))
+    ).order_by(ShoppingCartItem.cart_item_id):
+        carts.setdefault(item.customer_id, []).append(item)
+
+    dish_ids = {item.dish_id for items in carts.values() for item in items}
+    menu_rows = {
+        row.dish_id: row for row in db.session.query(Menu.menu_id, Menu.dish_id, Menu.cook_id, Menu.quantity).filter(
+            Menu.dish_id.in_(dish_ids), Menu.date == today
+        )
+    }
+    available = {dish_id: row.quantity for dish_id, row in menu_rows.items()}
+
+    # Reserve stock in arrival order; a customer whose cart no longer fits is refused alone
+    outcomes = []
+    accepted = []
+    reserved = {}
+    for customer_id in customer_ids:
+        cart_items = carts.pop(customer_id, None)
+        if not cart_items:
+            outcomes.append(EMPTY_CART)
+            continue
+
+        requested = {}
+        for cart_item in cart_items:
+            requested[cart_item.dish_id] = requested.get(cart_item.dish_id, 0) + cart_item.quantity
+        error = None
+        for cart_item in cart_items:
+            if cart_item.dish_id not in menu_rows:
+                error = f"dish {cart_item.dish.dish_name} not available today"
+                break
+            if requested[cart_item.dish_id] > available[cart_item.dish_id]:
+                error = (f"dish {cart_item.dish.dish_name} The available quantity is insufficient. "
+                         f"Available quantity：{available[cart_item.dish_id]}")
+                break
+        if error:
+            outcomes.append(_failure(error))
+            continue
+
+        for dish_id, quantity in requested.items():
+            available[dish_id] -= quantity
+            reserved[dish_id] = reserved.get(dish_id, 0) + quantity
+        outcomes.append(ORDER_SUBMITTED)
+        accepted.append((customer_id, cart_items))
+
+    if not accepted:
+        db.session.rollback()
+        return outcomes
+
+    # One conditional decrement per dish for the whole batch; it only fails if the
+    # stock was changed outside this lock, and then the batch is refused as a whole
+    for dish_id, quantity in reserved.items():
+        result = db.session.execute(
+            update(Menu)
+            .where(Menu.menu_id == menu_rows[dish_id].menu_id, Menu.quantity >= quantity)
+            .values(quantity=Menu.quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise Exception(f"stock of dish {dish_id} changed during admission")
+
+    now = datetime.utcnow()
+    orders = [Order(customer_id=customer_id, date=now, total_cents=0) for customer_id, _ in accepted]
+    db.session.add_all(orders)
+    db.session.flush()
+
+    # cook_id comes from the menu row, the unit price is the dish price at order time
+    db.session.add_all([
+        OrderItem(
+            order_id=order.order_id,
+            dish_id=cart_item.dish_id,
+            quantity=cart_item.quantity,
+            cook_id=menu_rows[cart_item.dish_id].cook_id,
+            unit_price_cents=cart_item.dish.price_cents
+        ) for order, (_, cart_items) in zip(orders, accepted) for cart_item in cart_items
+    ])
+    db.session.flush()
+
+    order_ids = [order.order_id for order in orders]
+    db.session.execute(
+        update(Order)
+        .where(Order.order_id.in_(order_ids))
+        .values(total_cents=db.select(
+            db.func.coalesce(db.func.sum(OrderItem.unit_price_cents * OrderItem.quantity), 0)
+        ).where(OrderItem.order_id == Order.order_id).scalar_subquery())
+        .execution_options(synchronize_session=False)
+    )
+    record_order_sales(order_ids)
+
+    db.session.execute(delete(ShoppingCartItem).where(ShoppingCartItem.cart_item_id.in_(
+        [cart_item.cart_item_id for _, cart_items in accepted for cart_item in cart_items]
+    )))
+    db.session.commit()
+    return outcomes
+
+
+class _Pending:
+    __slots__ = ('customer_id', 'done', 'outcome')
+
+    def __init__(self, customer_id):
+        self.customer_id = customer_id
+        self.done = threading.Event()
+        self.outcome = None
+
+
+class OrderBatcher:
+    """Single background thread that admits queued orders in micro-batches."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, app, customer_id, timeout=30):
+        """Queue a customer's cart and block until its batch is committed; returns ``(status_code, body)``."""
+        with self._lock:
+            # Also restarts the thread in a freshly forked worker process
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, args=(app,), name='order-admission', daemon=True)
+                self._thread.start()
+        # Hand this thread's connection back to the pool while waiting: with every
+        # pooled connection held by a waiting request, the batch could never run
+        db.session.close()
+        pending = _Pending(customer_id)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            return 503, {"message": "Order submission timed out, please check your orders", "success": False}
+        return pending.outcome
+
+    def _collect(self, window, max_batch):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + window
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # Once the window is over, still take what is already queued
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, app):
+        while True:
+            batch = self._collect(app.config['ORDER_BATCH_WINDOW_MS'] / 1000, app.config['ORDER_BATCH_MAX'])
+            try:
+                with app.app_context():
+                    outcomes = admit_orders([pending.customer_id for pending in batch])
+            except Exception as e:
+                outcomes = [_failure(e)] * len(batch)
+            for pending, outcome in zip(batch, outcomes):
+                pending.outcome = outcome
+                pending.done.set()
+
+
+order_batcher = OrderBatcher()
@@ -0,0 +1,112 @@
+"""
+In-process publish/subscribe for pushing events to connected clients.
+
+Routes publish small JSON-able events to a channel (one per customer, see
+``customer_channel``) after their transaction commits; the ``/events``
+stream subscribes to the channel of the logged-in customer. Subscribers
+block on their own queue, so idle clients cost no database work.
+
+``InProcessBroker`` only reaches subscribers in the same process, which is
+why ``run.py --prod`` runs a single gunicorn worker while it is installed.
+To fan out across several workers, implement the same ``subscribe``/
+``unsubscribe``/``publish`` methods on top of a local broker and install it
+with ``set_broker``.
+
+Every open ``/events`` stream holds one server thread for its whole life
+(gunicorn's gthread workers have ``--threads`` of them per process), so
+streams are bounded twice: each one ends after ``EVENT_STREAM_MAX_SECONDS``
+and the browser's EventSource reconnects, and ``StreamSlots`` caps how many
+streams a worker serves at once (``EVENT_STREAM_LIMIT``); beyond that
+``/events`` answers 503 and the client retries later, so ordinary requests
+always find a free thread.
+"""
+
+import queue
+import threading
+
+
+def customer_channel(customer_id):
+    return f'customer:{int(customer_id)}'
+
+
+class Subscription:
+    def __init__(self, channel, maxsize=100):
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client must not block publishers; it re-syncs on reconnect
+            pass
+
+    def get(self, timeout=None):
+        """Return the next event, or None if nothing arrived within ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class StreamSlots:
+    """Counts the open event streams of this process against a limit."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = 0
+
+    def acquire(self, limit):
+        """Take a slot; False if ``limit`` streams are already open (0 means no limit)."""
+        with self._lock:
+            if limit and self._open >= limit:
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._open -= 1
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, event_type, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put((event_type, data))
+
+
+_broker = InProcessBroker()
+stream_slots = StreamSlots()
+
+
+def get_broker():
+    return _broker
+
+
+def set_broker(broker):
+    global _broker
+    _broker = broker
+
+
+def publish(channel, event_type, data):
+    _broker.publish(channel, event_type, data)
@@ -1,41 +1,136 @@
 #!/usr/bin/env python3
 """
 Parrot Ordering - 校园在线订餐系统启动脚本
+
+    python run.py                       # 开发模式：Flask 调试服务器
+    python run.py --prod                # 生产模式：gunicorn（1 个进程 × 多线程）
+    python run.py --prod --threads 16 --bind 0.0.0.0:8000
+
+生产模式以 preload 方式加载应用后 fork 出 worker（gthread），worker 每处理
+--max-requests 个请求后平滑重启。
+
+实时消息（/events）使用进程内的 InProcessBroker，只能送达同一进程内的订阅者，
+所以默认只启动 1 个 worker，并发靠 --threads；只有通过 pubsub.set_broker
+安装了跨进程的 broker 之后，--workers 才能大于 1。
+
+运行中可向主进程发送信号：
+    kill -HUP <pid>    平滑重启所有 worker（preload 下不会重新加载代码）
+    kill -USR2 <pid>   启动新的主进程加载新代码，确认无误后对旧主进程 kill -QUIT
 """
 
+import argparse
 import os
 import sys
-from app import app
+from app import app, db
+from pubsub import get_broker, InProcessBroker
 
-if __name__ == '__main__':
+
+def ensure_directories():
     # 检查数据库文件是否存在
     db_path = os.path.join('instance', 'users.db')
     if not os.path.exists(db_path):
         print("警告：数据库文件不存在，正在创建...")
         os.makedirs('instance', exist_ok=True)
-    
+
     # 检查uploads目录是否存在
     uploads_dirs = ['static/uploads/avatars', 'static/uploads/dishes']
     for upload_dir in uploads_dirs:
         if not os.path.exists(upload_dir):
             print(f"创建上传目录: {upload_dir}")
             os.makedirs(upload_dir, exist_ok=True)
-    
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parrot Ordering 启动脚本")
+    parser.add_argument('--prod', action='store_true', default=os.environ.get('PARROT_ENV') == 'production',
+                        help="生产模式（gunicorn），也可设置 PARROT_ENV=production")
+    parser.add_argument('--bind', default=os.environ.get('PARROT_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('PARROT_WORKERS', 1)),
+                        help="worker 进程数；使用进程内 broker（实时消息）时固定为 1")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('PARROT_THREADS', 8)))
+    parser.add_argument('--timeout', type=int, default=30, help="worker 无响应多少秒后被重启")
+    parser.add_argument('--graceful-timeout', type=int, default=30, help="重启时等待进行中请求的秒数")
+    parser.add_argument('--max-requests', type=int, default=1000, help="worker 处理多少请求后平滑重启，0 为不限")
+    return parser.parse_args()
+
+
+def print_banner(address):
     print("=" * 50)
     print("🦜 Parrot Ordering - 校园在线订餐系统")
     print("=" * 50)
     print("🚀 正在启动服务器...")
-    print("📱 访问地址: http://localhost:5000")
+    print(f"📱 访问地址: {address}")
     print("🔑 默认管理员账户: admin / admin123")
     print("👨‍🍳 默认厨师账户: cook1 / cook123")
     print("👤 默认顾客账户: customer1 / customer123")
     print("=" * 50)
     print("按 Ctrl+C 停止服务器")
     print("=" * 50)
-    
+
+
+def run_production(args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        # gunicorn 不支持 Windows：退回到单进程多线程服务器
+        print("⚠️ 未安装 gunicorn（或当前系统不支持），改用单进程多线程服务器")
+        host, _, port = args.bind.rpartition(':')
+        app.run(host=host or '0.0.0.0', port=int(port), debug=False, threaded=True)
+        return
+
+    # 每个 /events 连接占用一个线程：最多用一半线程保持连接，其余线程留给普通请求
+    if 'PARROT_EVENT_STREAMS' not in os.environ:
+        app.config['EVENT_STREAM_LIMIT'] = max(1, args.threads // 2)
+
+    def post_fork(server, worker):
+        # preload 时主进程可能已打开数据库连接，子进程不能共用同一个 SQLite 句柄
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            options = {
+                'bind': args.bind,
+                'workers': args.workers,
+                'threads': args.threads,
+                'worker_class': 'gthread',
+                'preload_app': True,
+                'timeout': args.timeout,
+                'graceful_timeout': args.graceful_timeout,
+                'max_requests': args.max_requests,
+                'max_requests_jitter': args.max_requests // 10,  # 避免所有 worker 同时重启
+                'post_fork': post_fork,
+                'accesslog': '-',
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    ProductionServer().run()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    ensure_directories()
+
+    if args.prod and args.workers > 1 and isinstance(get_broker(), InProcessBroker):
+        # 其他进程里的订阅者收不到本进程发布的事件：消息推送会随机丢失
+        print(f"⚠️ 实时消息使用进程内 broker，只支持 1 个 worker：忽略 --workers {args.workers}，请用 --threads 提高并发")
+        args.workers = 1
+
+    if args.prod:
+        print_banner(f"http://{args.bind}（{args.workers} 个进程 × {args.threads} 个线程）")
+    else:
+        print_banner("http://localhost:5000")
+
     try:
-        # 启动Flask应用
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        if args.prod:
+            run_production(args)
+        else:
+            # 启动Flask应用
+            app.run(debug=True, host='0.0.0.0', port=5000)
     except KeyboardInterrupt:
         print("\n👋 服务器已停止，感谢使用！")
     except Exception as e:
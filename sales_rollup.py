@@ -0,0 +1,133 @@
+"""
+Daily sales rollups.
+
+``dish_daily_sales``, ``cook_daily_sales`` and ``category_daily_sales`` hold,
+per key and day, the quantity sold, the revenue (from the order items' unit
+price snapshots) and the number of orders. Order admission (see
+``order_admission.py``) adds each batch of new orders with
+``record_order_sales`` in the same transaction; ``flask rebuild-sales-rollups``
+recomputes them from ``order_item`` (e.g. after loading data outside the
+routes). Reports then read a few hundred rollup rows instead of scanning the
+order tables.
+
+Days are UTC, like ``Order.date``. A dish counts in the category it had when
+it was sold (when rebuilding: its current category). Rollups are sales
+history: purging a customer does not subtract their orders, only a rebuild
+does; purging a cook removes the cook's own rows.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, distinct, func, select, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, User, Cook, Dish, Order, OrderItem, DishDailySales, CookDailySales, CategoryDailySales
+
+# Rollup model, its key column, and the expression the key is computed from
+ROLLUPS = {
+    'dish': (DishDailySales, DishDailySales.dish_id, OrderItem.dish_id),
+    'cook': (CookDailySales, CookDailySales.cook_id, OrderItem.cook_id),
+    'category': (CategoryDailySales, CategoryDailySales.category, Dish.category),
+}
+METRICS = ('revenue_cents', 'quantity', 'order_count')
+
+
+def _aggregate(key_expr, condition):
+    """SELECT key, day, quantity, revenue, orders FROM order_item ... WHERE condition GROUP BY key, day."""
+    day = func.date(Order.date)
+    query = select(
+        key_expr,
+        day,
+        func.sum(OrderItem.quantity),
+        func.sum(OrderItem.quantity * OrderItem.unit_price_cents),
+        func.count(distinct(OrderItem.order_id)),
+    ).select_from(OrderItem).join(Order, Order.order_id == OrderItem.order_id)
+    if key_expr is Dish.category:
+        query = query.join(Dish, Dish.dish_id == OrderItem.dish_id)
+    return query.where(condition).group_by(key_expr, day)
+
+
+def _columns(key_column):
+    return [key_column.key, 'day', 'quantity', 'revenue_cents', 'order_count']
+
+
+def record_order_sales(order_ids):
+    """Add flushed orders' items to every rollup in the current transaction; the caller commits."""
+    for model, key_column, key_expr in ROLLUPS.values():
+        stmt = sqlite_insert(model).from_select(
+            _columns(key_column), _aggregate(key_expr, OrderItem.order_id.in_(order_ids))
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key_column.key, 'day'],
+            set_={metric: getattr(model, metric) + getattr(stmt.excluded, metric) for metric in METRICS}
+        )
+        db.session.execute(stmt)
+
+
+def rebuild_sales_rollups(since=None):
+    """Recompute the rollups from the order items, for every day or from ``since`` (a date) on.
+
+    Returns the number of rows written per rollup table. Runs in one transaction.
+    """
+    counts = {}
+    for model, key_column, key_expr in ROLLUPS.values():
+        if since is None:
+            db.session.execute(delete(model))
+            condition = true()
+        else:
+            db.session.execute(delete(model).where(model.day >= since))
+            condition = Order.date >= datetime.combine(since, datetime.min.time())
+        result = db.session.execute(model.__table__.insert().from_select(
+            _columns(key_column), _aggregate(key_expr, condition)
+        ))
+        counts[model.__tablename__] = result.rowcount
+    db.session.commit()
+    return counts
+
+
+def sales_series(level, key, start, end):
+    """Daily totals of one dish, cook or category from ``start`` to ``end`` (inclusive), zero-filled."""
+    model, key_column, _ = ROLLUPS[level]
+    rows = {
+        row.day: row for row in db.session.query(
+            model.day, model.quantity, model.revenue_cents, model.order_count
+        ).filter(key_column == key, model.day >= start, model.day <= end)
+    }
+    series = []
+    day = start
+    while day <= end:
+        row = rows.get(day)
+        series.append({
+            'day': day.isoformat(),
+            'quantity': row.quantity if row else 0,
+            'revenue_cents': row.revenue_cents if row else 0,
+            'order_count': row.order_count if row else 0,
+        })
+        day += timedelta(days=1)
+    return series
+
+
+def top_sellers(level, start, end, metric='revenue_cents', limit=10):
+    """The ``limit`` dishes, cooks or categories with the highest ``metric`` between ``start`` and ``end``."""
+    model, key_column, _ = ROLLUPS[level]
+    totals = {name: func.sum(getattr(model, name)).label(name) for name in METRICS}
+    rows = db.session.query(key_column.label('key'), *totals.values()).filter(
+        model.day >= start, model.day <= end
+    ).group_by(key_column).order_by(totals[metric].desc(), key_column).limit(limit).all()
+
+    keys = [row.key for row in rows]
+    if level == 'dish':
+        names = dict(db.session.query(Dish.dish_id, Dish.dish_name).filter(Dish.dish_id.in_(keys)))
+    elif level == 'cook':
+        names = dict(db.session.query(Cook.cook_id, User.username).join(
+            User, User.user_id == Cook.user_id
+        ).filter(Cook.cook_id.in_(keys)))
+    else:
+        names = {key: key for key in keys}
+    return [{
+        'key': row.key,
+        'name': names.get(row.key),  # None for a dish or cook deleted since
+        'quantity': row.quantity,
+        'revenue_cents': row.revenue_cents,
+        'order_count': row.order_count,
+    } for row in rows]
@@ -77,10 +77,6 @@ def init_database():
         if run_command("flask db init", "初始化数据库迁移"):
             print("✅ 数据库迁移初始化完成")
     
-    # 创建迁移
-    if run_command("flask db migrate -m \"Initial migration\"", "创建数据库迁移"):
-        print("✅ 数据库迁移创建完成")
-    
     # 应用迁移
     if run_command("flask db upgrade", "应用数据库迁移"):
         print("✅ 数据库迁移应用完成")
@@ -5,8 +5,39 @@ document.addEventListener('DOMContentLoaded', function () {
     const clearButton = document.getElementById('clear-button'); // Clear button
     const userList = document.getElementById('user-list'); // Container for user list
 
-    // Fetch users from the backend and render them
-    function fetchUsers() {
+    // Sentinel below the list; when it scrolls into view the next page is loaded
+    const loadMoreSentinel = document.createElement('div');
+    loadMoreSentinel.id = 'user-list-sentinel';
+    userList.after(loadMoreSentinel);
+
+    const SENTINEL_MARGIN = 200; // px below the viewport at which the next page starts loading
+    let nextAfter = null; // Cursor for the next page (last user_id received)
+    let loading = false;
+    let requestId = 0; // Ignore responses from searches that were replaced
+
+    // Render one user card
+    function createUserCard(user) {
+        const userCard = document.createElement('div');
+        userCard.className = 'user-card';
+        userCard.innerHTML = `
+            <img src="${user.avatar_url || '/static/images/default_avatar.png'}" alt="Avatar">
+            <div class="user-info">
+                <p><strong>User Name:</strong> ${user.username}</p>
+                <p><strong>Email:</strong> ${user.email}</p>
+            </div>
+            <button class="view-details" data-user-id="${user.user_id}">View</button>
+        `;
+        userCard.querySelector('.view-details').addEventListener('click', function () {
+            viewUserDetails(this.getAttribute('data-user-id'));
+        });
+        return userCard;
+    }
+
+    // Fetch one page of users from the backend and render it
+    function fetchUsers(append = false) {
+        if (append && (loading || nextAfter === null)) {
+            return;
+        }
         const role = roleFilter.value; // Get selected role
         const search = searchBox.value.trim(); // Get search query
 
@@ -14,8 +45,13 @@ document.addEventListener('DOMContentLoaded', function () {
         const params = [];
         if (role) params.push(`role=${encodeURIComponent(role)}`);
         if (search) params.push(`search=${encodeURIComponent(search)}`);
+        if (append) params.push(`after=${nextAfter}`);
         if (params.length) query += `?${params.join('&')}`;
 
+        const currentRequest = ++requestId;
+        loading = true;
+        let rendered = false;
+
         // Fetch data from the server
         fetch(query)
             .then((response) => {
@@ -24,46 +60,56 @@ document.addEventListener('DOMContentLoaded', function () {
                 }
                 return response.json();
             })
-            .then((users) => {
-                // Clear the user list
-                userList.innerHTML = '';
+            .then((data) => {
+                if (currentRequest !== requestId) {
+                    return;
+                }
+                if (!append) {
+                    // Clear the user list
+                    userList.innerHTML = '';
+                }
+                nextAfter = data.next_after;
 
                 // Handle no users case
-                if (users.length === 0) {
+                if (!append && data.users.length === 0) {
                     userList.innerHTML = '<p>No users found.</p>';
                     return;
                 }
 
                 // Render each user card
-                users.forEach((user) => {
-                    const userCard = document.createElement('div');
-                    userCard.className = 'user-card';
-                    userCard.innerHTML = `
-                        <img src="${user.avatar_url || '/static/images/default_avatar.png'}" alt="Avatar">
-                        <div class="user-info">
-                            <p><strong>User Name:</strong> ${user.username}</p>
-                            <p><strong>Email:</strong> ${user.email}</p>
-                        </div>
-                        <button class="view-details" data-user-id="${user.user_id}">View</button>
-                    `;
-                    userList.appendChild(userCard);
-                });
-
-                // Add event listeners to "View" buttons
-                const viewButtons = document.querySelectorAll('.view-details');
-                viewButtons.forEach((button) => {
-                    button.addEventListener('click', function () {
-                        const userId = this.getAttribute('data-user-id');
-                        viewUserDetails(userId);
-                    });
-                });
+                data.users.forEach((user) => userList.appendChild(createUserCard(user)));
+                rendered = true;
             })
             .catch((error) => {
                 console.error('Error:', error);
-                userList.innerHTML = '<p>An error occurred while fetching users. Please try again later.</p>';
+                if (currentRequest === requestId) {
+                    userList.innerHTML = '<p>An error occurred while fetching users. Please try again later.</p>';
+                }
+            })
+            .finally(() => {
+                if (currentRequest === requestId) {
+                    loading = false;
+                    // The observer only fires when the sentinel crosses the edge: if this page
+                    // did not fill the screen, the sentinel is still in view and nothing would load
+                    if (rendered && sentinelNearViewport()) {
+                        fetchUsers(true);
+                    }
+                }
             });
     }
 
+    function sentinelNearViewport() {
+        return loadMoreSentinel.getBoundingClientRect().top <= window.innerHeight + SENTINEL_MARGIN;
+    }
+
+    // Infinite scroll
+    const observer = new IntersectionObserver((entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) {
+            fetchUsers(true);
+        }
+    }, { rootMargin: `${SENTINEL_MARGIN}px` });
+    observer.observe(loadMoreSentinel);
+
     // Redirect to user details page
     function viewUserDetails(userId) {
         window.location.href = `/admin_account/${userId}`;
@@ -77,8 +123,8 @@ document.addEventListener('DOMContentLoaded', function () {
     });
 
     // Event listeners for role filter and search button
-    searchButton.addEventListener('click', fetchUsers);
-    roleFilter.addEventListener('change', fetchUsers);
+    searchButton.addEventListener('click', () => fetchUsers());
+    roleFilter.addEventListener('change', () => fetchUsers());
 
     // Load all users on initial page load
     fetchUsers();
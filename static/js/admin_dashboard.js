@@ -26,7 +26,7 @@ function displayMenu(dishes) {
         const dishItem = document.createElement('div');
         dishItem.className = 'menu-item';
         dishItem.innerHTML = `    
-            <img src="${dish.image_url}" alt="${dish.dish_name}" />  
+            ${pictureHTML(dish.image_url, dish.image_variants, dish.dish_name)}  
             <h3>${dish.dish_name}</h3>  
             <p>Category: ${dish.category}</p>  
             <p>Price: $${dish.price}</p>  
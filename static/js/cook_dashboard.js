@@ -20,7 +20,7 @@ function loadDishes() {
                 const dishItem = document.createElement('div');
                 dishItem.className = 'menu-item';
                 dishItem.innerHTML = `  
-                    <img src="${dish.image_url}" alt="${dish.dish_name}" />  
+                    ${pictureHTML(dish.image_url, dish.image_variants, dish.dish_name)}  
                     <h3>${dish.dish_name}</h3>  
                     <p>Category: ${dish.category}</p>  
                     <p>Price: $${dish.price}</p>  
@@ -118,7 +118,7 @@ function loadTodayMenu() {
                     const dishItem = document.createElement('div');
                     dishItem.className = 'dish-item';
                     dishItem.innerHTML = `
-                        <img src="${dish.image_url}" alt="${dish.dish_name}" />
+                        ${pictureHTML(dish.image_url, dish.image_variants, dish.dish_name)}
                         <h3>${dish.dish_name}</h3>
                         <p>Category: ${dish.category}</p>
                         <p>Price: $${dish.price}</p>
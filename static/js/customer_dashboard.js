@@ -42,7 +42,7 @@ function loadDishesAjax() {
 
                     const dishInfo = `
                         <div class="dish-info">
-                            <img src="${dish.image_url}" alt="${dish.dish_name}">
+                            ${pictureHTML(dish.image_url, dish.image_variants, dish.dish_name)}
                             <h3>${dish.dish_name}</h3>
                             <p><strong>Category:</strong> ${dish.category}</p>
                             <p><strong>Price:</strong> $${dish.price}</p>
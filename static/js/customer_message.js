@@ -86,7 +86,7 @@ document.addEventListener('DOMContentLoaded', function () {
                             <img src="${msg.friend_avatar || '/static/images/default_avatar.png'}" alt="${msg.friend_username}">
                             <div class="message-content">
                                 <div class="text-content">
-                                    <p class="username">${msg.friend_username}</p>
+                                    <p class="username">${msg.friend_username}${msg.unread_count ? `<span class="unread-count">${msg.unread_count}</span>` : ''}</p>
                                     <p class="message-text">${msg.content}</p>
                                 </div>
                                 <small class="timestamp">${msg.created_at}</small>
@@ -103,53 +103,84 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
 
-    // Load message details
+    // Render one message of the conversation history
+    function createMessageItem(msg) {
+        const messageItem = document.createElement('div');
+        messageItem.className = 'message-item';
+        messageItem.innerHTML = `
+            <img src="${msg.sender_avatar || '/static/images/default_avatar.png'}" alt="${msg.sender_username}" class="message-avatar">
+            <div class="message-content">
+                <p class="username">${msg.sender_username}</p>
+                <p class="message-text">${msg.content}</p>
+                <small class="timestamp">${msg.created_at}</small>
+            </div>
+        `;
+        return messageItem;
+    }
+
+    // Show a "Load older messages" button at the top of the history when there are more pages
+    function updateLoadOlderButton(data) {
+        const existing = document.getElementById('load-older-btn');
+        if (existing) {
+            existing.remove();
+        }
+        if (!data.has_more) {
+            return;
+        }
+        const loadOlderBtn = document.createElement('button');
+        loadOlderBtn.id = 'load-older-btn';
+        loadOlderBtn.textContent = 'Load older messages';
+        loadOlderBtn.addEventListener('click', () => loadOlderMessages(data.next_before));
+        messageHistory.prepend(loadOlderBtn);
+    }
+
+    // Load message details (newest page)
     function loadMessageDetails(id) {
         friendId = id; // Set current chat object friendId
         fetch(`/message_details/${friendId}`)
             .then(response => response.json())
             .then(data => {
-                console.log('Response from server:', data); // Debugging output
                 if (data.empty) {
                     alert('No messages found');
                     return;
                 }
 
-                console.log('Switching to message details tab...');
-
                 // Hide message list and show message details
                 showTab(messageDetailsContainer);
 
-                // Check container class and style
-                console.log('Message Details Container Class:', messageDetailsContainer.classList);
-                console.log('Message Details Container Style:', messageDetailsContainer.style);
-
-
                 // Update friend info
                 friendUsername.textContent = data.friend_username;
 
                 // Load message history
                 messageHistory.innerHTML = '';
-                data.messages.forEach(msg => {
-                    console.log('Rendering message:', msg);
-
-                    const messageItem = document.createElement('div');
-                    messageItem.className = 'message-item';
-
-                    messageItem.innerHTML = `
-                        <img src="${msg.sender_avatar || '/static/images/default_avatar.png'}" alt="${msg.sender_username}" class="message-avatar">
-                        <div class="message-content">
-                            <p class="username">${msg.sender_username}</p>
-                            <p class="message-text">${msg.content}</p>
-                            <small class="timestamp">${msg.created_at}</small>
-                        </div>
-                    `;
-                    messageHistory.appendChild(messageItem);
-                });
+                data.messages.forEach(msg => messageHistory.appendChild(createMessageItem(msg)));
+                updateLoadOlderButton(data);
+                messageHistory.scrollTop = messageHistory.scrollHeight;
             })
             .catch(error => console.error('Error loading message details:', error));
     }
 
+    // Load the page of messages before the oldest one shown and prepend it
+    function loadOlderMessages(beforeId) {
+        fetch(`/message_details/${friendId}?before=${beforeId}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.empty) {
+                    updateLoadOlderButton({ has_more: false });
+                    return;
+                }
+                // Keep the current view in place while older messages are inserted above it
+                const previousHeight = messageHistory.scrollHeight;
+                const loadOlderBtn = document.getElementById('load-older-btn');
+                const fragment = document.createDocumentFragment();
+                data.messages.forEach(msg => fragment.appendChild(createMessageItem(msg)));
+                messageHistory.insertBefore(fragment, loadOlderBtn ? loadOlderBtn.nextSibling : messageHistory.firstChild);
+                updateLoadOlderButton(data);
+                messageHistory.scrollTop += messageHistory.scrollHeight - previousHeight;
+            })
+            .catch(error => console.error('Error loading older messages:', error));
+    }
+
     // Back to messages list
     backToMessagesBtn.addEventListener('click', () => {
         showTab(messagesList); // Show message list page
@@ -216,8 +247,9 @@ document.addEventListener('DOMContentLoaded', function () {
                 replyInput.value = '';
                 // Hide reply area
                 replySection.classList.remove('visible');
-                // Reload all message history
-                loadMessageDetails(friendId);
+                // Append the sent message; no need to re-fetch the history
+                messageHistory.appendChild(createMessageItem(data));
+                messageHistory.scrollTop = messageHistory.scrollHeight;
             } else {
                 alert('Failed to send message!');
             }
@@ -317,7 +349,7 @@ document.addEventListener('DOMContentLoaded', function () {
                         <div class="friend-item">
                             <img src="${data.avatar}" alt="${data.username}">
                             <p>${data.username}</p>
-                            <button onclick="addFriend(this, ${data.customer_id})">Add</button>
+                            <button data-customer-id="${data.customer_id}" onclick="addFriend(this, ${data.customer_id})">Add</button>
                         </div>
                     `;
                 } else {
@@ -356,8 +388,83 @@ document.addEventListener('DOMContentLoaded', function () {
             });
     };
 
+    // Receive new messages and friend requests pushed by the server
+    function isVisible(el) {
+        return !el.classList.contains('hidden');
+    }
+
+    const EVENTS_RETRY_MS = 30000; // The server refuses streams with 503 while its stream slots are full
+
+    function connectEvents() {
+        if (!window.EventSource) {
+            return;
+        }
+        const events = new EventSource('/events');
+        let opened = false;
+
+        events.addEventListener('open', () => {
+            // The server ends streams after a while and EventSource reconnects:
+            // reload what is on screen in case something arrived in between
+            if (opened) {
+                const atBottom = messageHistory.scrollHeight - messageHistory.scrollTop - messageHistory.clientHeight < 50;
+                if (isVisible(messageDetailsContainer) && friendId) {
+                    if (atBottom) { // Do not throw away older pages the user is reading
+                        loadMessageDetails(friendId);
+                    }
+                } else if (isVisible(messagesList)) {
+                    loadMessages();
+                }
+                if (isVisible(newFriendsList)) {
+                    loadNewFriends();
+                }
+            }
+            opened = true;
+        });
+
+        events.addEventListener('error', () => {
+            // EventSource gives up on a non-200 answer (e.g. 503): try again later ourselves
+            if (events.readyState === EventSource.CLOSED) {
+                setTimeout(connectEvents, EVENTS_RETRY_MS * (0.5 + Math.random()));
+            }
+        });
+
+        events.addEventListener('message', event => {
+            const msg = JSON.parse(event.data);
+            // Our own messages are already appended when sending
+            if (String(msg.sender_id) === String(customerId)) {
+                return;
+            }
+            if (isVisible(messageDetailsContainer) && String(msg.sender_id) === String(friendId)) {
+                messageHistory.appendChild(createMessageItem(msg));
+                messageHistory.scrollTop = messageHistory.scrollHeight;
+            } else if (isVisible(messagesList)) {
+                loadMessages();
+            }
+        });
+
+        events.addEventListener('friend_request', () => {
+            if (isVisible(newFriendsList)) {
+                loadNewFriends();
+            }
+        });
+
+        // Someone accepted our request: they now show up in the conversation list
+        events.addEventListener('friend_accepted', event => {
+            const data = JSON.parse(event.data);
+            const addButton = searchResult.querySelector(`button[data-customer-id="${data.friend_id}"]`);
+            if (addButton) {
+                addButton.disabled = true;
+                addButton.textContent = 'Friends';
+            }
+            if (isVisible(messagesList)) {
+                loadMessages();
+            }
+        });
+    }
+
     // Initialize
     loadMessages();
+    connectEvents();
 });
 
 window.onload = function () {
@@ -226,7 +226,13 @@ function openTab(evt, tabName) {
 
 // Initialize default tab
 document.addEventListener("DOMContentLoaded", function() {
-    document.getElementById("personal-info").style.display = "block";
+    // Reopen the orders tab when paging through the order history
+    const ordersButton = document.querySelector(".tab-button[onclick*='orders-history']");
+    if (window.location.hash === '#orders-history' && ordersButton) {
+        ordersButton.click();
+    } else {
+        document.getElementById("personal-info").style.display = "block";
+    }
 });
 
 window.onload = function () {
@@ -0,0 +1,28 @@
+// static/js/responsive_image.js
+// Client-side counterpart of picture() in image_pipeline.py: builds an <img>, or a
+// <picture> with WebP/JPEG srcset when the API returned image_variants.
+
+const DEFAULT_IMAGE_SIZES = '(max-width: 600px) 100vw, 320px';
+
+function variantSrcset(variants, format) {
+    const byWidth = new Map();
+    Object.values(variants)
+        .sort((a, b) => a.width - b.width)
+        .forEach(variant => {
+            if (!byWidth.has(variant.width)) {
+                byWidth.set(variant.width, variant[format]);
+            }
+        });
+    return Array.from(byWidth, ([width, url]) => `${url} ${width}w`).join(', ');
+}
+
+function pictureHTML(url, variants, alt, sizes = DEFAULT_IMAGE_SIZES) {
+    if (!variants) {
+        return `<img src="${url}" alt="${alt}" />`;
+    }
+    const fallback = (variants.card || Object.values(variants)[0]).jpeg;
+    return `<picture>
+        <source type="image/webp" srcset="${variantSrcset(variants, 'webp')}" sizes="${sizes}">
+        <img src="${fallback}" srcset="${variantSrcset(variants, 'jpeg')}" sizes="${sizes}" alt="${alt}" />
+    </picture>`;
+}
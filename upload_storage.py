@@ -0,0 +1,93 @@
+"""
+Content-addressed storage for uploaded images.
+
+``save_upload`` copies an upload to its folder in fixed-size chunks while
+hashing it, and gives up as soon as it exceeds ``MAX_UPLOAD_BYTES``. The
+file is named after its SHA-256 digest, so uploading the same image twice
+stores it once and both rows point at the same blob.
+
+Because blobs are shared, replacing an image never deletes the old file in
+the request; ``collect_garbage`` (``flask gc-uploads``) removes files that no
+``Dish.image_url`` / ``User.avatar_url`` (or their resized variants) refer to.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+
+from models import db, Dish, User
+
+CHUNK_SIZE = 64 * 1024
+GC_GRACE_SECONDS = 3600  # Files younger than this may belong to a request still in flight
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def save_upload(file_storage, folder, url_prefix, extension, max_bytes):
+    """Store an upload under its content hash; return ``(url, path)``.
+
+    Raises ``UploadTooLarge`` once more than ``max_bytes`` have been read.
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f'File exceeds the {max_bytes // (1024 * 1024)} MB limit')
+                digest.update(chunk)
+                out.write(chunk)
+
+        filename = f'{digest.hexdigest()}.{extension.lower()}'
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            # Same content already stored: reuse it, and refresh its mtime so GC leaves it alone
+            os.utime(path)
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return f'{url_prefix}/{filename}', path
+
+
+def _referenced_names(urls_and_variants):
+    names = set()
+    for url, variants in urls_and_variants:
+        if url:
+            names.add(url.rsplit('/', 1)[-1])
+        for variant in (variants or {}).values():
+            names.update(variant[fmt].rsplit('/', 1)[-1] for fmt in ('webp', 'jpeg'))
+    return names
+
+
+def collect_garbage(folders, grace_seconds=GC_GRACE_SECONDS, dry_run=False):
+    """Delete files in ``folders`` that no dish or user references; return the removed paths."""
+    referenced = _referenced_names(db.session.query(Dish.image_url, Dish.image_variants))
+    referenced |= _referenced_names(db.session.query(User.avatar_url, User.avatar_variants))
+
+    cutoff = time.time() - grace_seconds
+    removed = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            if not entry.is_file() or entry.name in referenced:
+                continue
+            if entry.stat().st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(entry.path)
+            removed.append(entry.path)
+    return removed